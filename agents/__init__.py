@@ -1,8 +1,33 @@
 # MathanGO Agents Package
+#
+# Exports are resolved on first access so that importing one submodule
+# (records, question_bank, ...) does not pull in every agent.
 
-from .reader_agent import ReaderAgent
-from .relevance_agent import RelevanceAgent  
-from .depth_agent import DepthAgent
-from .judge_agent import JudgeAgent
+import importlib
 
-__all__ = ['ReaderAgent', 'RelevanceAgent', 'DepthAgent', 'JudgeAgent']
+_EXPORTS = {
+    'ReaderAgent': '.reader_agent',
+    'RelevanceAgent': '.relevance_agent',
+    'DepthAgent': '.depth_agent',
+    'JudgeAgent': '.judge_agent',
+    'QuestionAnalysis': '.records',
+    'RelevanceScore': '.records',
+    'DepthScore': '.records',
+    'CompositeScore': '.records',
+    'QuestionBank': '.question_bank',
+    'ModelRouter': '.router',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
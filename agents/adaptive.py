@@ -0,0 +1,235 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Tuple
+import logging
+
+from .hedging import current_meter, metered
+from .records import RELEVANCE_CRITERIA, DEPTH_CRITERIA, _score
+
+logger = logging.getLogger(__name__)
+
+# Temperature for the extra samples. The single-shot score was drawn at
+# the agents' 0.1, so it is not mixed in: the first time a question is
+# resampled it gets two samples at this temperature, which replace it in
+# the mean and the variance.
+SAMPLING_TEMPERATURE = 0.7
+
+# Assumed spread (1-10 scale) of a single overall score before any
+# question has been sampled twice
+PRIOR_STD = 1.0
+
+# How many pseudo-observations the pooled variance is worth when blended
+# with a question's own sample variance
+PRIOR_WEIGHT = 2
+
+RELEVANCE = "relevance"
+DEPTH = "depth"
+
+_COMPONENTS = {
+    RELEVANCE: (RELEVANCE_CRITERIA, "overall_relevance_score"),
+    DEPTH: (DEPTH_CRITERIA, "overall_depth_score"),
+}
+
+
+def _mean_std(values: List[float]) -> Tuple[float, float]:
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return mean, 0.0
+    return mean, math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def aggregate_samples(samples: List[Dict[str, Any]], criteria: Tuple[str, ...],
+                      overall_key: str, base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Merge several agent results for one question into a single result.
+
+    Criterion and overall scores become sample means, each with a "std"
+    alongside; the justifications of `base` (default the first sample) are
+    kept. Adds "samples" and "score_std" (standard deviation of the
+    overall score).
+
+    Args:
+        samples: Relevance or Depth Agent results for the same question
+        criteria: Criterion keys to average
+        overall_key: Key of the overall score
+        base: Result whose justifications and other fields are kept
+
+    Returns:
+        Result dictionary in the agent's shape
+    """
+    result = dict(base if base is not None else samples[0])
+    for criterion in criteria:
+        mean, std = _mean_std([_score(s.get(criterion, {})) for s in samples])
+        entry = dict(result.get(criterion)) if isinstance(result.get(criterion), dict) else {}
+        entry["score"] = round(mean, 2)
+        entry["std"] = round(std, 2)
+        result[criterion] = entry
+
+    mean, std = _mean_std([_score(s.get(overall_key, 0)) for s in samples])
+    result[overall_key] = round(mean, 2)
+    result["samples"] = len(samples)
+    result["score_std"] = round(std, 3)
+    result["hedged"] = any(s.get("hedged", False) for s in samples + [result])
+    return result
+
+
+class AdaptiveSampler:
+    """
+    Spends extra scoring calls only where they can change the TOP K.
+
+    Starting from the single-shot scores, each round estimates every
+    question's composite score and its standard error, and places the
+    cutoff halfway between the K-th and (K+1)-th questions. Questions whose
+    composite lies within `z` standard errors of the cutoff are resampled,
+    closest first, on whichever of relevance or depth contributes more
+    uncertainty. Clear winners and clear losers are never resampled. This
+    stops when nothing is ambiguous or the call budget is spent.
+
+    The first resampling of a question's relevance or depth costs two calls:
+    both are drawn at the sampling agents' temperature and replace the
+    low-temperature single-shot score, so every mean and variance comes
+    from one distribution. The single-shot justifications are kept.
+    """
+
+    def __init__(self, relevance_agent, depth_agent, top_k: int = 3, budget: int = 20,
+                 max_samples: int = 5, z: float = 2.0, max_workers: int = 4):
+        self.agents = {RELEVANCE: relevance_agent, DEPTH: depth_agent}
+        self.top_k = top_k
+        self.budget = budget
+        self.max_samples = max_samples
+        self.z = z
+        self.max_workers = max_workers
+
+    def _pooled_variance(self, samples: Dict[Any, List[float]]) -> float:
+        variances = [_mean_std(v)[1] ** 2 for v in samples.values() if len(v) > 1]
+        return sum(variances) / len(variances) if variances else PRIOR_STD ** 2
+
+    @staticmethod
+    def _variance(values: List[float], pooled: float) -> float:
+        """Sample variance shrunk towards the pooled estimate."""
+        own = _mean_std(values)[1] ** 2
+        return (pooled * PRIOR_WEIGHT + own * (len(values) - 1)) / (PRIOR_WEIGHT + len(values) - 1)
+
+    def _next_requests(self, overall: Dict[str, Dict[Any, List[float]]], weights: Dict[str, float],
+                       exhausted: Set[Tuple[Any, str]], limit: int) -> List[Tuple[Any, str]]:
+        """Most ambiguous (question, component) pairs for the next round."""
+        pooled = {c: self._pooled_variance(overall[c]) for c in overall}
+        estimates = []
+        for question_id in overall[RELEVANCE]:
+            mean = 0.0
+            error_terms = {}
+            for component, samples in overall.items():
+                values = samples[question_id]
+                mean += weights[component] * sum(values) / len(values)
+                error_terms[component] = weights[component] ** 2 * self._variance(values, pooled[component]) / len(values)
+            estimates.append((question_id, mean, error_terms))
+
+        estimates.sort(key=lambda e: e[1], reverse=True)
+        cutoff = (estimates[self.top_k - 1][1] + estimates[self.top_k][1]) / 2
+
+        candidates = []
+        for question_id, mean, error_terms in estimates:
+            open_terms = {c: t for c, t in error_terms.items()
+                          if len(overall[c][question_id]) < self.max_samples
+                          and (question_id, c) not in exhausted}
+            if not open_terms:
+                continue
+            std_error = math.sqrt(sum(error_terms.values())) or 1e-9
+            ambiguity = abs(mean - cutoff) / std_error
+            if ambiguity < self.z:
+                candidates.append((ambiguity, question_id, max(open_terms, key=open_terms.get)))
+
+        candidates.sort(key=lambda c: c[0])
+        return [(question_id, component) for _, question_id, component in candidates[:limit]]
+
+    def refine(self, reader_analyses: List[Dict[str, Any]],
+               relevance_scores: List[Dict[str, Any]],
+               depth_scores: List[Dict[str, Any]],
+               relevance_weight: float,
+               depth_weight: float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Resample boundary questions and aggregate.
+
+        Args:
+            reader_analyses: Output from Reader Agent
+            relevance_scores: Single-shot output from Relevance Agent
+            depth_scores: Single-shot output from Depth Agent
+            relevance_weight: Weight for relevance in final score (0-1)
+            depth_weight: Weight for depth in final score (0-1)
+
+        Returns:
+            (relevance_scores, depth_scores, stats), the score lists in the
+            original order with resampled questions aggregated
+        """
+        results = {
+            RELEVANCE: {r["question_id"]: [r] for r in relevance_scores},
+            DEPTH: {d["question_id"]: [d] for d in depth_scores},
+        }
+        analyses = {a.get("original_question", {}).get("id"): a for a in reader_analyses}
+        question_ids = [q for q in results[RELEVANCE] if q in results[DEPTH] and q in analyses]
+        stats = {"extra_calls": 0, "rounds": 0, "resampled_questions": 0}
+        # (question, component) pairs whose single-shot score was replaced
+        redrawn: Set[Tuple[Any, str]] = set()
+
+        if len(question_ids) > self.top_k and self.budget > 0:
+            overall = {
+                c: {q: [_score(results[c][q][0].get(_COMPONENTS[c][1], 0))] for q in question_ids}
+                for c in results
+            }
+            weights = {RELEVANCE: relevance_weight, DEPTH: depth_weight}
+            # Questions whose Depth was skipped by the cascade are provably out
+            exhausted = {(q, c) for q in question_ids for c in overall if results[DEPTH][q][0].get("skipped")}
+
+            # Calls are charged to the caller's meter, if any, from the pool's threads too
+            charge = current_meter()
+
+            def resample(request: Tuple[Any, str]) -> Dict[str, Any]:
+                question_id, component = request
+                with metered(*(charge or (None,))):
+                    return self.agents[component].score_question(analyses[question_id])
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sampler") as executor:
+                while stats["extra_calls"] < self.budget:
+                    limit = min(self.max_workers, self.budget - stats["extra_calls"])
+                    calls = []
+                    for request in self._next_requests(overall, weights, exhausted, limit):
+                        count = 1 if request in redrawn else 2
+                        if stats["extra_calls"] + len(calls) + count > self.budget:
+                            break
+                        calls += [request] * count
+                    if not calls:
+                        break
+                    drawn: Dict[Tuple[Any, str], List[Dict[str, Any]]] = {}
+                    for request, sample in zip(calls, executor.map(resample, calls)):
+                        drawn.setdefault(request, []).append(sample)
+                    for (question_id, component), samples in drawn.items():
+                        stats["extra_calls"] += len(samples)
+                        if any(sample.get("degraded") for sample in samples):
+                            # A heuristic fallback says nothing about the model's
+                            # spread; stop asking for this one
+                            exhausted.add((question_id, component))
+                            continue
+                        scores = [_score(sample.get(_COMPONENTS[component][1], 0)) for sample in samples]
+                        if (question_id, component) in redrawn:
+                            results[component][question_id] += samples
+                            overall[component][question_id] += scores
+                        else:
+                            redrawn.add((question_id, component))
+                            results[component][question_id] = samples
+                            overall[component][question_id] = scores
+                    stats["rounds"] += 1
+
+        stats["resampled_questions"] = len({q for q, _ in redrawn})
+        logger.info(f"Adaptive sampling: {stats}")
+
+        def merged(component: str, originals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            criteria, overall_key = _COMPONENTS[component]
+            out = []
+            for original in originals:
+                samples = results[component].get(original["question_id"], [original])
+                out.append(original if samples[0] is original
+                           else aggregate_samples(samples, criteria, overall_key, base=original))
+            return out
+
+        return merged(RELEVANCE, relevance_scores), merged(DEPTH, depth_scores), stats
+
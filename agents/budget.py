@@ -0,0 +1,504 @@
+import json
+import os
+import threading
+from typing import Dict, List, Any, Callable, Optional, Set, Tuple
+import logging
+
+from .depth_agent import DepthAgent
+from .hedging import metered
+from .judge_agent import CANDIDATES, JudgeAgent
+from .prompts import (
+    TEMPLATES, READER, READER_FILL, RELEVANCE, RELEVANCE_TERSE, RELEVANCE_EXPLAIN,
+    DEPTH, DEPTH_TERSE, DEPTH_EXPLAIN, JUDGE, estimate_tokens, token_usage
+)
+from .reader_agent import ReaderAgent, TRUSTED_FIELDS, FILL_FIELDS
+from .records import _score
+from .relevance_agent import RelevanceAgent
+
+logger = logging.getLogger(__name__)
+
+# Typical response length of each prompt template, in tokens; BudgetPlanner
+# replaces these with what earlier runs actually used
+OUTPUT_TOKENS = {
+    "reader": 120,
+    "reader_fill": 30,
+    "relevance": 320,
+    "relevance_terse": 60,
+    "relevance_explain": 260,
+    "depth": 320,
+    "depth_terse": 60,
+    "depth_explain": 260,
+    "judge": 700,
+}
+
+# Share of the budget a plan leaves unused, for answers longer than expected
+HEADROOM = 0.1
+
+# A call is only made if an answer this many times the expected length still fits
+RESERVE_FACTOR = 2
+
+# Judge candidates under FEWER_CANDIDATES (the Judge still picks 3)
+MIN_CANDIDATES = 3
+
+# Questions explained after terse scoring (the TOP 3)
+EXPLAINED = 3
+
+# Label for the Adaptive Sampler's extra scoring calls
+DOUBLE_CHECK = "double_check"
+
+# Degraded strategies, in the order the planner applies them
+NO_DOUBLE_CHECK = "no_double_check"
+TERSE = "terse"
+FEWER_CANDIDATES = "fewer_candidates"
+RULES_READER = "rules_reader"
+NO_JUDGE = "no_judge"
+PREFILTER = "prefilter"
+
+PREFILTER_NOTE = "Estimated without the AI: outside the questions the budget allowed"
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised instead of an LLM call that would take a run past its budget."""
+
+
+def _usage(calls: int = 0, input_tokens: int = 0, output_tokens: int = 0, cost: float = 0.0) -> Dict[str, Any]:
+    return {"calls": calls, "input_tokens": input_tokens, "output_tokens": output_tokens, "cost": cost}
+
+
+def _add(total: Dict[str, Any], usage: Dict[str, Any]):
+    for key in total:
+        total[key] += usage[key]
+
+
+def _sum(stages: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    total = _usage()
+    for usage in stages.values():
+        _add(total, usage)
+    return total
+
+
+def _rounded(usage: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(usage, cost=round(usage["cost"], 6))
+
+
+class Budget:
+    """
+    Hard limit on what one run may spend: tokens (input plus output),
+    dollars, or both. Prices are dollars per 1k tokens.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                 cost_per_1k_input: float = 0.0, cost_per_1k_output: float = 0.0):
+        if max_tokens is None and max_cost is None:
+            raise ValueError("A budget needs max_tokens or max_cost")
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.cost_per_1k_input = cost_per_1k_input
+        self.cost_per_1k_output = cost_per_1k_output
+
+    @classmethod
+    def from_env(cls) -> Optional["Budget"]:
+        """
+        Budget from JEE_BUDGET_TOKENS and/or JEE_BUDGET_COST, priced with
+        JEE_COST_PER_1K_INPUT and JEE_COST_PER_1K_OUTPUT. None when neither
+        limit is set.
+        """
+        max_tokens = os.getenv("JEE_BUDGET_TOKENS")
+        max_cost = os.getenv("JEE_BUDGET_COST")
+        if not max_tokens and not max_cost:
+            return None
+        return cls(int(max_tokens) if max_tokens else None, float(max_cost) if max_cost else None,
+                   float(os.getenv("JEE_COST_PER_1K_INPUT", "0")), float(os.getenv("JEE_COST_PER_1K_OUTPUT", "0")))
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.cost_per_1k_input + output_tokens * self.cost_per_1k_output) / 1000
+
+    def allows(self, usage: Dict[str, Any], share: float = 1.0) -> bool:
+        """Whether `usage` stays within `share` of the budget."""
+        tokens = usage["input_tokens"] + usage["output_tokens"]
+        return ((self.max_tokens is None or tokens <= self.max_tokens * share)
+                and (self.max_cost is None or usage["cost"] <= self.max_cost * share))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.max_tokens,
+            "max_cost": self.max_cost,
+            "cost_per_1k_input": self.cost_per_1k_input,
+            "cost_per_1k_output": self.cost_per_1k_output,
+        }
+
+
+class UsageMeter:
+    """
+    Charges a run's LLM calls to its budget.
+
+    Calls are made inside `hedging.metered(meter)`. Before each call, its
+    prompt plus RESERVE_FACTOR times the expected answer for its template
+    is reserved. A call that could take the run past the budget is refused
+    with BudgetExceeded, which the agents turn into their heuristic
+    fallback. Afterwards the reservation is replaced by the tokens the
+    provider reported (or estimated from the text), so the budget can only
+    be exceeded by an answer longer than the reserve. Thread-safe.
+    """
+
+    def __init__(self, budget: Budget, output_tokens: Optional[Dict[str, int]] = None):
+        self.budget = budget
+        self.output_tokens = dict(output_tokens or OUTPUT_TOKENS)
+        self.refused = 0
+        self._spent: Dict[str, Dict[str, Any]] = {}
+        self._reserved = _usage()
+        self._templates = {template.system: name for name, template in TEMPLATES.items()}
+        self._lock = threading.Lock()
+
+    def _template(self, messages: List[Any]) -> str:
+        system = getattr(messages[0], "content", "") if messages else ""
+        return self._templates.get(system, "other")
+
+    def reserve(self, messages: List[Any], label: Optional[str] = None) -> Tuple[str, List[Any], Dict[str, Any]]:
+        """
+        Reserve room for one call.
+
+        Returns:
+            Ticket for settle()
+
+        Raises:
+            BudgetExceeded: if the call could overspend the budget
+        """
+        template = self._template(messages)
+        input_tokens = sum(estimate_tokens(str(getattr(m, "content", ""))) for m in messages)
+        output_tokens = RESERVE_FACTOR * self.output_tokens.get(template, max(OUTPUT_TOKENS.values()))
+        expected = _usage(1, input_tokens, output_tokens, self.budget.cost(input_tokens, output_tokens))
+        with self._lock:
+            projected = _sum(self._spent)
+            _add(projected, self._reserved)
+            _add(projected, expected)
+            if not self.budget.allows(projected):
+                self.refused += 1
+                raise BudgetExceeded(f"{label or template} call refused: the run's budget is spent")
+            _add(self._reserved, expected)
+        return label or template, messages, expected
+
+    def settle(self, ticket: Tuple[str, List[Any], Dict[str, Any]], response: Any = None):
+        """Release a reservation and, if the call returned, record what it used."""
+        stage, messages, expected = ticket
+        if response is not None:
+            input_tokens, output_tokens = token_usage(messages, response)
+        with self._lock:
+            for key in self._reserved:
+                self._reserved[key] -= expected[key]
+            if response is not None:
+                _add(self._spent.setdefault(stage, _usage()), _usage(
+                    1, input_tokens, output_tokens, self.budget.cost(input_tokens, output_tokens)
+                ))
+
+    def spent(self) -> Dict[str, Dict[str, Any]]:
+        """Actual usage per stage so far."""
+        with self._lock:
+            return {stage: dict(usage) for stage, usage in self._spent.items()}
+
+    def report(self, plan: "BudgetPlan") -> Dict[str, Any]:
+        """Planned against actual spend, per stage and in total."""
+        spent = self.spent()
+        total = _sum(spent)
+        return {
+            "budget": self.budget.to_dict(),
+            "strategies": list(plan.strategies),
+            "scored_questions": plan.scored_count,
+            "questions": plan.questions,
+            "stages": {
+                stage: {"planned": _rounded(plan.stages.get(stage, _usage())),
+                        "actual": _rounded(spent.get(stage, _usage()))}
+                for stage in sorted(set(plan.stages) | set(spent))
+            },
+            "planned": _rounded(plan.total),
+            "actual": _rounded(total),
+            "refused_calls": self.refused,
+            "within_budget": self.budget.allows(total),
+        }
+
+
+class BudgetPlan:
+    """
+    What a run will do to stay within its budget, and its expected spend
+    per stage (prompt template, or DOUBLE_CHECK).
+
+    `strategies` are the degradations chosen. With PREFILTER, only the
+    questions in `scored_ids` go to the agents and the rest get heuristic
+    scores; otherwise `scored_ids` is None.
+    """
+
+    def __init__(self, budget: Budget, stages: Dict[str, Dict[str, Any]], strategies: List[str],
+                 options: Dict[str, Any], scored_ids: Optional[Set[Any]], questions: int,
+                 output_tokens: Dict[str, int]):
+        self.budget = budget
+        self.stages = stages
+        self.strategies = strategies
+        self.terse = options["terse"]
+        self.rules_reader = options["rules_reader"]
+        self.candidates = options["candidates"]
+        self.judge = options["judge"]
+        self.double_check_calls = options["double_check_calls"]
+        self.scored_ids = scored_ids
+        self.questions = questions
+        self.output_tokens = output_tokens
+
+    @property
+    def total(self) -> Dict[str, Any]:
+        return _sum(self.stages)
+
+    @property
+    def scored_count(self) -> int:
+        return self.questions if self.scored_ids is None else len(self.scored_ids)
+
+    @property
+    def fits(self) -> bool:
+        return self.budget.allows(self.total)
+
+    def meter(self) -> UsageMeter:
+        """A meter for running this plan."""
+        return UsageMeter(self.budget, self.output_tokens)
+
+    def agents(self, reader: ReaderAgent, relevance: RelevanceAgent, depth: DepthAgent,
+               judge: JudgeAgent) -> Tuple[ReaderAgent, RelevanceAgent, DepthAgent, JudgeAgent]:
+        """The agents with this plan's degradations; unchanged ones are returned as they are."""
+        if self.rules_reader and reader.backend != "rules":
+            reader = ReaderAgent(reader.llm, reader.trust_metadata, reader.fill_llm, backend="rules")
+        if self.terse and not relevance.terse:
+            relevance = RelevanceAgent(relevance.llm, True)
+        if self.terse and not depth.terse:
+            depth = DepthAgent(depth.llm, True)
+        if self.candidates != judge.candidates:
+            judge = JudgeAgent(judge.llm, self.candidates)
+        return reader, relevance, depth, judge
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget.to_dict(),
+            "strategies": list(self.strategies),
+            "scored_questions": self.scored_count,
+            "questions": self.questions,
+            "judge_candidates": self.candidates if self.judge else 0,
+            "double_check_calls": self.double_check_calls,
+            "stages": {stage: _rounded(usage) for stage, usage in self.stages.items()},
+            "total": _rounded(self.total),
+            "fits": self.fits,
+        }
+
+
+class BudgetedPipeline:
+    """
+    Per-question task that runs a plan: questions the plan scores go
+    through `process` with their calls charged to the meter, and the rest
+    get heuristic scores from a rule-based analysis, marked "prefiltered".
+    """
+
+    def __init__(self, process: Callable[[Dict[str, Any]], tuple], plan: BudgetPlan, meter: UsageMeter,
+                 trust_metadata: bool = False):
+        self.process = process
+        self.plan = plan
+        self.meter = meter
+        self.reader = ReaderAgent(None, trust_metadata, backend="rules")
+        self.relevance = RelevanceAgent(None)
+        self.depth = DepthAgent(None)
+
+    def __call__(self, question: Dict[str, Any]):
+        if self.plan.scored_ids is not None and question["id"] not in self.plan.scored_ids:
+            analysis = self.reader.analyze_question(question)
+            relevance = self.relevance.estimate_question(analysis, PREFILTER_NOTE)
+            depth = self.depth.estimate_question(analysis, PREFILTER_NOTE)
+            relevance["prefiltered"] = depth["prefiltered"] = True
+            return analysis, relevance, depth
+        with metered(self.meter):
+            return self.process(question)
+
+
+class BudgetPlanner:
+    """
+    Estimates a run's tokens before it starts and picks degradations until
+    the estimate fits the budget.
+
+    Each call's input is estimated from its prompt template and the
+    question's text; its output from the typical answer length of the
+    template. Degradations are applied in order, each only if the run
+    still does not fit (leaving HEADROOM): no double-checking, terse
+    scoring, fewer Judge candidates, the rule-based Reader, and finally
+    sending only the questions with the best heuristic scores to the
+    agents (without the Judge, if even it does not fit). The cascade can
+    only make a run cheaper than planned.
+    """
+
+    def __init__(self, output_tokens: Optional[Dict[str, int]] = None):
+        self.output_tokens = dict(output_tokens or OUTPUT_TOKENS)
+        self._lock = threading.Lock()
+
+    def _call(self, budget: Budget, template: str, system: str, user: str) -> Dict[str, Any]:
+        input_tokens = estimate_tokens(system) + estimate_tokens(user)
+        output_tokens = self.output_tokens[template]
+        return _usage(1, input_tokens, output_tokens, budget.cost(input_tokens, output_tokens))
+
+    def _analysis_placeholder(self) -> str:
+        return "x" * (4 * self.output_tokens["reader"])
+
+    def _question_stages(self, question: Dict[str, Any], budget: Budget, options: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Expected usage of one question's Reader, Relevance and Depth calls."""
+        text = question.get("question_text", "")
+        stages = {}
+        if options["trust_metadata"] and all(question.get(f) for f in TRUSTED_FIELDS):
+            missing = [f for f in FILL_FIELDS if question.get(f) in (None, "")]
+            if missing and not options["rules_reader"]:
+                stages["reader_fill"] = self._call(budget, "reader_fill", *READER_FILL.render(
+                    fields=", ".join(missing), topic=question["topic"], tags=", ".join(question["tags"]),
+                    bloom_level=question["bloom_level"], question_text=text
+                ))
+        elif not options["rules_reader"]:
+            stages["reader"] = self._call(budget, "reader", *READER.render(question_text=text))
+        analysis = self._analysis_placeholder()
+        for template in ((RELEVANCE_TERSE, DEPTH_TERSE) if options["terse"] else (RELEVANCE, DEPTH)):
+            stages[template.name] = self._call(
+                budget, template.name, *template.render(analysis=analysis, question_text=text)
+            )
+        return stages
+
+    def _fixed_stages(self, questions: List[Dict[str, Any]], budget: Budget,
+                      options: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Expected usage of the calls made once per run: Judge, explanations, double-checks."""
+        stages = {}
+        longest = max((q.get("question_text", "") for q in questions), key=len, default="")
+        analysis = self._analysis_placeholder()
+        if options["judge"]:
+            candidate = {
+                "question_id": 0, "question_text": "x" * 103, "topic": "Unknown",
+                "relevance_score": 10.0, "depth_score": 10.0, "composite_score": 10.0,
+                "key_concepts": [], "relevance_reasons": "x" * 153, "depth_reasons": "x" * 153,
+            }
+            stages["judge"] = self._call(budget, "judge", *JUDGE.render(
+                relevance_pct=100.0, depth_pct=100.0,
+                candidates=json.dumps([candidate] * options["candidates"], indent=2)
+            ))
+        if options["terse"] and options["explained"]:
+            scores = "x" * 4 * 30
+            for template in (RELEVANCE_EXPLAIN, DEPTH_EXPLAIN):
+                call = self._call(budget, template.name, *template.render(
+                    scores=scores, analysis=analysis, question_text=longest
+                ))
+                stages[template.name] = {key: value * options["explained"] for key, value in call.items()}
+        if options["double_check_calls"]:
+            template = RELEVANCE_TERSE if options["double_check_terse"] else RELEVANCE
+            call = self._call(budget, template.name, *template.render(analysis=analysis, question_text=longest))
+            stages[DOUBLE_CHECK] = {key: value * options["double_check_calls"] for key, value in call.items()}
+        return stages
+
+    def estimate(self, questions: List[Dict[str, Any]], budget: Budget, options: Dict[str, Any],
+                 scored_ids: Optional[Set[Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Expected usage per stage for these options."""
+        stages = self._fixed_stages(questions, budget, options)
+        for question in questions:
+            if scored_ids is not None and question["id"] not in scored_ids:
+                continue
+            for stage, usage in self._question_stages(question, budget, options).items():
+                _add(stages.setdefault(stage, _usage()), usage)
+        return stages
+
+    @staticmethod
+    def heuristic_order(questions: List[Dict[str, Any]], relevance_weight: float, depth_weight: float,
+                        trust_metadata: bool = False) -> List[Any]:
+        """Question ids by heuristic composite score from a rule-based analysis, best first."""
+        reader = ReaderAgent(None, trust_metadata, backend="rules")
+        relevance, depth = RelevanceAgent(None), DepthAgent(None)
+        scored = []
+        for position, question in enumerate(questions):
+            analysis = reader.analyze_question(question)
+            composite = (relevance_weight * _score(relevance.estimate_question(analysis, "")["overall_relevance_score"])
+                         + depth_weight * _score(depth.estimate_question(analysis, "")["overall_depth_score"]))
+            scored.append((-composite, position, question["id"]))
+        return [question_id for _, _, question_id in sorted(scored)]
+
+    def plan(self, questions: List[Dict[str, Any]], budget: Budget, relevance_weight: float,
+             depth_weight: float, trust_metadata: bool = False, rules_reader: bool = False,
+             terse: bool = False, double_check_calls: int = 0) -> BudgetPlan:
+        """
+        Plan a run of these questions within the budget.
+
+        Args:
+            questions: Questions to rank
+            budget: Limit for the whole run
+            relevance_weight: Weight for relevance in final score (0-1)
+            depth_weight: Weight for depth in final score (0-1)
+            trust_metadata: The Reader takes curated metadata from the questions
+            rules_reader: The Reader is already rule-based
+            terse: Scoring is already terse
+            double_check_calls: Extra scoring calls for double-checking close calls
+
+        Returns:
+            BudgetPlan; it always fits, if need be by calling no agent at all
+        """
+        with self._lock:
+            output_tokens = dict(self.output_tokens)
+        options = {
+            "trust_metadata": trust_metadata, "rules_reader": rules_reader, "terse": terse,
+            "candidates": CANDIDATES, "judge": True, "double_check_calls": double_check_calls,
+            "double_check_terse": terse, "explained": EXPLAINED,
+        }
+        strategies: List[str] = []
+
+        def fits(stages: Dict[str, Dict[str, Any]]) -> bool:
+            return budget.allows(_sum(stages), 1.0 - HEADROOM)
+
+        ladder = (
+            (NO_DOUBLE_CHECK, {"double_check_calls": 0}),
+            (TERSE, {"terse": True}),
+            (FEWER_CANDIDATES, {"candidates": MIN_CANDIDATES}),
+            (RULES_READER, {"rules_reader": True}),
+        )
+        stages = self.estimate(questions, budget, options)
+        for name, change in ladder:
+            if fits(stages):
+                break
+            if all(options[key] == value for key, value in change.items()):
+                continue
+            options.update(change)
+            strategies.append(name)
+            stages = self.estimate(questions, budget, options)
+
+        scored_ids = None
+        if not fits(stages):
+            # Only scored questions can need explaining, so the explanations
+            # are charged as the first few are added
+            options["explained"] = 0
+            if not fits(self._fixed_stages(questions, budget, options)):
+                options["judge"] = False
+                strategies.append(NO_JUDGE)
+            by_id = {q["id"]: q for q in questions}
+            scored = _usage()
+            scored_ids = set()
+            for question_id in self.heuristic_order(questions, relevance_weight, depth_weight, trust_metadata):
+                if len(scored_ids) < EXPLAINED:
+                    options["explained"] = len(scored_ids) + 1
+                    fixed = _sum(self._fixed_stages(questions, budget, options))
+                cost = _sum(self._question_stages(by_id[question_id], budget, options))
+                _add(cost, scored)
+                if not budget.allows(_sum({"fixed": fixed, "scored": cost}), 1.0 - HEADROOM):
+                    break
+                scored = cost
+                scored_ids.add(question_id)
+            options["explained"] = min(EXPLAINED, len(scored_ids))
+            strategies.append(PREFILTER)
+            stages = self.estimate(questions, budget, options, scored_ids)
+
+        plan = BudgetPlan(budget, stages, strategies, options, scored_ids, len(questions), output_tokens)
+        logger.info(f"Budget plan for {len(questions)} questions: {strategies or ['full']}, "
+                    f"{plan.scored_count} scored by the agents, {_rounded(plan.total)} expected")
+        return plan
+
+    def calibrate(self, meter: UsageMeter, weight: float = 0.5):
+        """
+        Move the expected answer lengths towards those of a finished run, so
+        later plans are closer to actual spend.
+        """
+        spent = meter.spent()
+        with self._lock:
+            for template, usage in spent.items():
+                if template in self.output_tokens and usage["calls"]:
+                    observed = usage["output_tokens"] / usage["calls"]
+                    self.output_tokens[template] = max(1, round((1 - weight) * self.output_tokens[template]
+                                                                + weight * observed))
@@ -0,0 +1,130 @@
+import heapq
+import threading
+from typing import Dict, List, Any, Optional
+import logging
+
+from .hedging import call_with_deadline
+from .records import _score
+
+logger = logging.getLogger(__name__)
+
+MAX_SCORE = 10.0
+
+SKIP_NOTE = "Depth not scored: this question cannot reach the TOP 3 at these weights"
+
+
+def composite_upper_bound(relevance_score: float, relevance_weight: float,
+                          depth_weight: float, max_score: float = MAX_SCORE) -> float:
+    """Best composite a question can still reach once its relevance is known."""
+    return relevance_score * relevance_weight + max_score * depth_weight
+
+
+class TopKThreshold:
+    """Running K-th best composite score among fully scored questions."""
+
+    def __init__(self, top_k: int = 3):
+        self.top_k = top_k
+        self._heap: List[float] = []
+        self._lock = threading.Lock()
+
+    def offer(self, score: float):
+        with self._lock:
+            if len(self._heap) < self.top_k:
+                heapq.heappush(self._heap, score)
+            elif score > self._heap[0]:
+                heapq.heapreplace(self._heap, score)
+
+    @property
+    def value(self) -> Optional[float]:
+        """K-th best score so far, or None until K questions are scored."""
+        with self._lock:
+            return self._heap[0] if len(self._heap) == self.top_k else None
+
+    def can_reach(self, bound: float) -> bool:
+        # Only a bound strictly below the K-th best is skipped, so ties are kept
+        value = self.value
+        return value is None or bound >= value
+
+
+class CascadePipeline:
+    """
+    Per-question task that skips Depth scoring when it cannot matter.
+
+    After Reader and Relevance, the best composite the question could reach
+    (its relevance plus a perfect depth score) is compared with the K-th
+    best composite seen so far. If it falls short, the question cannot enter
+    the TOP K, so the Depth call is replaced by the Depth Agent's heuristic
+    estimate and marked "skipped". The threshold only rises, so the TOP K is
+    the same as with full scoring. Use a new pipeline for each job, because
+    the threshold depends on the job's bank and weights.
+    """
+
+    def __init__(self, reader, relevance, depth, relevance_weight: float, depth_weight: float,
+                 top_k: int = 3, deadlines: Optional[Dict[str, float]] = None):
+        self.reader = reader
+        self.relevance = relevance
+        self.depth = depth
+        self.relevance_weight = relevance_weight
+        self.depth_weight = depth_weight
+        self.deadlines = deadlines or {}
+        self.threshold = TopKThreshold(top_k)
+        self.stats = {"depth_scored": 0, "depth_skipped": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def __call__(self, question: Dict[str, Any]):
+        analysis = call_with_deadline(self.deadlines.get("reader"), self.reader.analyze_question, question)
+        relevance = call_with_deadline(self.deadlines.get("relevance"), self.relevance.score_question, analysis)
+        relevance_value = _score(relevance.get("overall_relevance_score", 0))
+
+        bound = composite_upper_bound(relevance_value, self.relevance_weight, self.depth_weight)
+        if not self.threshold.can_reach(bound):
+            self._count("depth_skipped")
+            depth = self.depth.estimate_question(analysis, SKIP_NOTE)
+            depth["skipped"] = True
+            logger.info(f"Cascade skipped Depth for question {depth['question_id']} (bound {bound:.2f})")
+            return analysis, relevance, depth
+
+        self._count("depth_scored")
+        depth = call_with_deadline(self.deadlines.get("depth"), self.depth.score_question, analysis)
+        self.threshold.offer(
+            relevance_value * self.relevance_weight
+            + _score(depth.get("overall_depth_score", 0)) * self.depth_weight
+        )
+        return analysis, relevance, depth
+
+
+def unresolved_skips(relevance_scores: List[Dict[str, Any]], depth_scores: List[Dict[str, Any]],
+                     relevance_weight: float, depth_weight: float, top_k: int = 3) -> List[Any]:
+    """
+    Ids of questions whose Depth was skipped but that could reach the TOP K
+    at these (new) weights, and so need a real Depth score.
+
+    Args:
+        relevance_scores: Output from Relevance Agent
+        depth_scores: Depth results, possibly containing skipped estimates
+        relevance_weight: Weight for relevance in final score (0-1)
+        depth_weight: Weight for depth in final score (0-1)
+        top_k: Size of the ranking that has to stay exact
+
+    Returns:
+        List of question ids, highest upper bound first
+    """
+    relevance_by_id = {r["question_id"]: _score(r.get("overall_relevance_score", 0)) for r in relevance_scores}
+    threshold = TopKThreshold(top_k)
+    skipped = []
+    for depth in depth_scores:
+        question_id = depth["question_id"]
+        if question_id not in relevance_by_id:
+            continue
+        if depth.get("skipped"):
+            skipped.append(question_id)
+        else:
+            threshold.offer(relevance_by_id[question_id] * relevance_weight
+                            + _score(depth.get("overall_depth_score", 0)) * depth_weight)
+
+    bounds = {q: composite_upper_bound(relevance_by_id[q], relevance_weight, depth_weight) for q in skipped}
+    return sorted((q for q in skipped if threshold.can_reach(bounds[q])), key=bounds.get, reverse=True)
@@ -1,10 +1,16 @@
 import json
 import re
-from typing import Dict, List, Any
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
-from langchain_groq import ChatGroq
+from typing import Dict, List, Any, TYPE_CHECKING
+from .prompts import (
+    DEPTH as DEPTH_PROMPT, DEPTH_TERSE as DEPTH_TERSE_PROMPT,
+    DEPTH_EXPLAIN as DEPTH_EXPLAIN_PROMPT, analysis_payload
+)
+from .records import DepthScore, _score
 import logging
 
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
 logger = logging.getLogger(__name__)
 
 class DepthAgent:
@@ -13,8 +19,16 @@ class DepthAgent:
     and the sophistication of problem-solving required.
     """
     
-    def __init__(self, llm: ChatGroq):
+    def __init__(self, llm: "ChatGroq", terse: bool = False):
+        """
+        Args:
+            llm: Chat model for scoring
+            terse: Ask only for the numeric scores; justifications are
+                generated later with explain() for the questions that need them
+        """
         self.llm = llm
+        self.terse = terse
+        self.prompt = DEPTH_TERSE_PROMPT if terse else DEPTH_PROMPT
         self.name = "Depth Agent"
         
     def score_question(self, question_analysis: Dict[str, Any]) -> Dict[str, Any]:
@@ -28,19 +42,29 @@ class DepthAgent:
             Dictionary with depth scores and explanations
         """
         try:
-            prompt = self._create_scoring_prompt(question_analysis)
+            system, prompt = self.prompt.render(
+                analysis=analysis_payload(question_analysis),
+                question_text=question_analysis["original_question"]["question_text"]
+            )
+            
+            from langchain.schema import HumanMessage, SystemMessage
             
             messages = [
-                SystemMessage(content="You are a Depth Agent that evaluates the cognitive depth and reasoning complexity of JEE physics questions."),
+                SystemMessage(content=system),
                 HumanMessage(content=prompt)
             ]
             
             response = self.llm.invoke(messages)
+            self.prompt.record(prompt, response)
             depth_data = self._parse_response(response.content)
+            if self.terse:
+                depth_data = DepthScore.expand_terse(depth_data)
             
             # Add metadata
             depth_data["question_id"] = question_analysis["original_question"]["id"]
             depth_data["agent"] = self.name
+            depth_data["hedged"] = bool(getattr(response, "response_metadata", {}).get("hedged"))
+            depth_data.setdefault("degraded", False)
             
             logger.info(f"Depth Agent scored question {question_analysis['original_question']['id']}")
             return depth_data
@@ -49,6 +73,44 @@ class DepthAgent:
             logger.error(f"Error in Depth Agent scoring: {str(e)}")
             return self._fallback_scoring(question_analysis)
     
+    def explain(self, question_analysis: Dict[str, Any], depth_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fill in the justifications of a terse result, keeping its scores.
+        
+        Args:
+            question_analysis: Analysis from Reader Agent
+            depth_data: Result from score_question
+            
+        Returns:
+            The result with justifications and summary; unchanged if it is
+            not terse or the call fails
+        """
+        if not depth_data.get("terse"):
+            return depth_data
+        try:
+            scores = {c: _score(depth_data.get(c)) for c in DepthScore.CRITERIA}
+            scores["overall_depth_score"] = _score(depth_data.get("overall_depth_score"))
+            system, prompt = DEPTH_EXPLAIN_PROMPT.render(
+                scores=json.dumps(scores),
+                analysis=analysis_payload(question_analysis),
+                question_text=question_analysis["original_question"]["question_text"]
+            )
+            
+            from langchain.schema import HumanMessage, SystemMessage
+            
+            response = self.llm.invoke([SystemMessage(content=system), HumanMessage(content=prompt)])
+            DEPTH_EXPLAIN_PROMPT.record(prompt, response)
+            json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
+            if not json_match:
+                raise ValueError("No JSON found in response")
+            
+            logger.info(f"Depth Agent explained question {depth_data['question_id']}")
+            return DepthScore.with_reasons(depth_data, json.loads(json_match.group()))
+            
+        except Exception as e:
+            logger.error(f"Error in Depth Agent explanation: {str(e)}")
+            return depth_data
+    
     def score_all_questions(self, question_analyses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Score all questions for depth and complexity.
@@ -66,53 +128,6 @@ class DepthAgent:
         
         return depth_scores
     
-    def _create_scoring_prompt(self, question_analysis: Dict[str, Any]) -> str:
-        """Create the prompt for depth scoring."""
-        question_text = question_analysis["original_question"]["question_text"]
-        
-        return f"""
-You are a Depth Agent that evaluates the cognitive depth and reasoning complexity required for JEE physics questions.
-
-Analyze the following question for:
-1. Number of concepts that need to be integrated
-2. Mathematical complexity required
-3. Multi-step reasoning requirement
-4. Abstract thinking level
-5. Problem-solving strategy sophistication
-
-Question Analysis: {json.dumps(question_analysis, indent=2)}
-Question Text: {question_text}
-
-Evaluate each aspect on a scale of 1-10:
-
-{{
-  "concept_integration": {{
-    "score": number_1_to_10,
-    "explanation": "how many concepts need to be combined"
-  }},
-  "mathematical_complexity": {{
-    "score": number_1_to_10,
-    "explanation": "level of mathematical skills required"
-  }},
-  "reasoning_steps": {{
-    "score": number_1_to_10,
-    "explanation": "number and complexity of logical steps"
-  }},
-  "abstract_thinking": {{
-    "score": number_1_to_10,
-    "explanation": "level of abstract conceptual understanding needed"
-  }},
-  "strategy_sophistication": {{
-    "score": number_1_to_10,
-    "explanation": "sophistication of problem-solving approach"
-  }},
-  "overall_depth_score": number_1_to_10,
-  "depth_summary": "explanation of cognitive demands"
-}}
-
-Respond with only the JSON, no additional text.
-"""
-    
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """Parse the LLM response and extract JSON."""
         try:
@@ -126,6 +141,23 @@ Respond with only the JSON, no additional text.
             logger.error(f"Error parsing depth response: {str(e)}")
             return self._fallback_json()
     
+    def estimate_question(self, question_analysis: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        """
+        Heuristic depth estimate without calling the LLM.
+        
+        Args:
+            question_analysis: Analysis from Reader Agent
+            reason: Why the LLM was not used, stored as the note
+            
+        Returns:
+            Dictionary in the same shape as score_question
+        """
+        result = self._fallback_scoring(question_analysis)
+        result["depth_summary"] = "Estimated from the Reader analysis"
+        result["note"] = reason
+        result["degraded"] = False
+        return result
+    
     def _fallback_scoring(self, question_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Provide fallback scoring if LLM fails."""
         base_score = 5  # Default medium depth
@@ -153,11 +185,13 @@ Respond with only the JSON, no additional text.
             "depth_summary": "Fallback scoring used due to LLM error",
             "question_id": question_analysis["original_question"]["id"],
             "agent": self.name,
-            "note": "Fallback scoring used"
+            "note": "Fallback scoring used",
+            "hedged": False,
+            "degraded": True
         }
     
     def _fallback_json(self) -> Dict[str, Any]:
-        """Provide fallback JSON structure."""
+        """Provide fallback JSON structure, marked degraded."""
         return {
             "concept_integration": {"score": 5, "explanation": "Default estimation"},
             "mathematical_complexity": {"score": 5, "explanation": "Default estimation"},
@@ -165,5 +199,7 @@ Respond with only the JSON, no additional text.
             "abstract_thinking": {"score": 5, "explanation": "Default estimation"},
             "strategy_sophistication": {"score": 5, "explanation": "Default estimation"},
             "overall_depth_score": 5,
-            "depth_summary": "Default depth assessment"
+            "depth_summary": "Default depth assessment",
+            "note": "Default scores used: unreadable response",
+            "degraded": True
         }
@@ -0,0 +1,549 @@
+import abc
+import argparse
+import heapq
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+import logging
+
+from .judge_agent import CANDIDATES
+from .records import CompositeScore
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+ScoredQuestion = Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]
+
+
+def plan_shards(questions: List[Dict[str, Any]], shard_size: int = 500,
+                by: str = "id") -> List[Dict[str, Any]]:
+    """
+    Split a bank into shards of at most `shard_size` questions.
+
+    Args:
+        questions: Question dictionaries, in bank order
+        shard_size: Most questions per shard
+        by: "id" for consecutive runs of the bank, or "topic" to keep each
+            topic's questions together (large topics still split)
+
+    Returns:
+        List of {"positions": [...], "questions": [...]}; positions are bank
+        order, used to break ties exactly as a single process would
+    """
+    if by not in ("id", "topic"):
+        raise ValueError(f"Unknown sharding key '{by}', expected 'id' or 'topic'")
+    groups: Dict[Any, List[int]] = {}
+    for position, question in enumerate(questions):
+        groups.setdefault(question.get("topic", "") if by == "topic" else None, []).append(position)
+
+    shards = []
+    for positions in groups.values():
+        for start in range(0, len(positions), shard_size):
+            chunk = positions[start:start + shard_size]
+            shards.append({"positions": chunk, "questions": [questions[p] for p in chunk]})
+    return shards
+
+
+def top_entries(scored: List[Tuple[int, ScoredQuestion]], relevance_weight: float,
+                depth_weight: float, top_k: int) -> List[Dict[str, Any]]:
+    """
+    Partial TOP K of a shard: the best composites, earlier bank position
+    first on ties, with the full results of each.
+
+    Args:
+        scored: (bank position, (analysis, relevance, depth)) pairs
+    """
+    def entry(item):
+        position, (analysis, relevance, depth) = item
+        composite = CompositeScore(
+            analysis["original_question"]["id"], relevance["overall_relevance_score"],
+            depth["overall_depth_score"], relevance_weight, depth_weight
+        ).composite_score
+        return {"composite_score": composite, "position": position,
+                "analysis": analysis, "relevance": relevance, "depth": depth}
+
+    return heapq.nlargest(top_k, map(entry, scored), key=lambda e: (e["composite_score"], -e["position"]))
+
+
+def merge_top_entries(partials: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """Global TOP K from the shards' partial TOP K lists."""
+    return heapq.nlargest(top_k, (e for partial in partials for e in partial),
+                          key=lambda e: (e["composite_score"], -e["position"]))
+
+
+class ShardQueue(abc.ABC):
+    """
+    Work queue of shards shared by the coordinator and the workers.
+
+    A claimed shard is leased to one worker. Workers renew the lease while
+    they work, and a shard whose lease runs out (its worker died) goes to
+    the next worker that asks. A failed shard is retried up to
+    `max_attempts` times. Implement these methods to put the queue on
+    another backend (Redis, SQS, a database); SQLiteShardQueue is the
+    local one.
+
+    renew, complete and fail only act on a shard still leased to `worker`,
+    so a worker whose lease ran out cannot change a shard another worker
+    has claimed since.
+    """
+
+    @abc.abstractmethod
+    def put(self, run_id: str, shards: List[Dict[str, Any]]):
+        """Queue the shards of a run."""
+
+    @abc.abstractmethod
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Next shard payload for this worker (with "run_id" and "shard_id"), or None."""
+
+    @abc.abstractmethod
+    def renew(self, run_id: str, shard_id: int, worker: str, lease_seconds: float):
+        """Extend this worker's lease on the shard."""
+
+    @abc.abstractmethod
+    def complete(self, run_id: str, shard_id: int, worker: str):
+        """Mark the shard done."""
+
+    @abc.abstractmethod
+    def fail(self, run_id: str, shard_id: int, worker: str, error: str):
+        """Requeue the shard, or mark it failed after max_attempts."""
+
+    @abc.abstractmethod
+    def status(self, run_id: str) -> Dict[str, int]:
+        """Number of shards in each state."""
+
+
+class SQLiteShardQueue(ShardQueue):
+    """
+    ShardQueue in a SQLite file, safe to share between processes on one
+    machine (or on a filesystem with working locks). Each operation opens
+    its own connection, so a queue object can be used from any thread.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    run_id TEXT, shard_id INTEGER, payload TEXT, status TEXT,
+                    worker TEXT, lease_until REAL, attempts INTEGER DEFAULT 0, error TEXT,
+                    PRIMARY KEY (run_id, shard_id))
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def put(self, run_id: str, shards: List[Dict[str, Any]]):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT INTO shards (run_id, shard_id, payload, status) VALUES (?, ?, ?, ?)",
+                [(run_id, i, json.dumps(shard, ensure_ascii=False), QUEUED) for i, shard in enumerate(shards)]
+            )
+            db.execute("COMMIT")
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "UPDATE shards SET status = ?, error = 'lease expired' "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, CLAIMED, now, self.max_attempts)
+            )
+            row = db.execute(
+                "SELECT run_id, shard_id, payload FROM shards "
+                "WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY rowid LIMIT 1",
+                (QUEUED, CLAIMED, now)
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE shards SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                    "WHERE run_id = ? AND shard_id = ?",
+                    (CLAIMED, worker, now + lease_seconds, row[0], row[1])
+                )
+            db.execute("COMMIT")
+        if row is None:
+            return None
+        return dict(json.loads(row[2]), run_id=row[0], shard_id=row[1])
+
+    def renew(self, run_id: str, shard_id: int, worker: str, lease_seconds: float):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE shards SET lease_until = ? WHERE run_id = ? AND shard_id = ? AND worker = ? AND status = ?",
+                (time.time() + lease_seconds, run_id, shard_id, worker, CLAIMED)
+            )
+
+    def complete(self, run_id: str, shard_id: int, worker: str):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE shards SET status = ?, error = NULL "
+                "WHERE run_id = ? AND shard_id = ? AND worker = ? AND status = ?",
+                (DONE, run_id, shard_id, worker, CLAIMED)
+            )
+
+    def fail(self, run_id: str, shard_id: int, worker: str, error: str):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ? "
+                "WHERE run_id = ? AND shard_id = ? AND worker = ? AND status = ?",
+                (self.max_attempts, FAILED, QUEUED, error, run_id, shard_id, worker, CLAIMED)
+            )
+
+    def status(self, run_id: str) -> Dict[str, int]:
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) FROM shards WHERE run_id = ? GROUP BY status",
+                              (run_id,)).fetchall()
+        counts = {QUEUED: 0, CLAIMED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def errors(self, run_id: str) -> Dict[int, str]:
+        """Last error of each failed shard."""
+        with self._connect() as db:
+            rows = db.execute("SELECT shard_id, error FROM shards WHERE run_id = ? AND status = ?",
+                              (run_id, FAILED)).fetchall()
+        return dict(rows)
+
+
+class ShardStore:
+    """
+    Shard results on shared storage (a directory every node mounts).
+
+    Each run has a manifest, and each shard has its full results (JSON
+    lines, one scored question per line) and its partial TOP K. Files are
+    written to a temporary name and renamed, so readers never see half a
+    file and a retried shard simply replaces its earlier output.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, run_id: str, name: str) -> str:
+        return os.path.join(self.root, run_id, name)
+
+    def _write(self, path: str, lines: Iterator[str]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+        os.replace(temporary, path)
+
+    def write_manifest(self, run_id: str, manifest: Dict[str, Any]):
+        self._write(self._path(run_id, "manifest.json"), [json.dumps(manifest)])
+
+    def read_manifest(self, run_id: str) -> Dict[str, Any]:
+        with open(self._path(run_id, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_shard(self, run_id: str, shard_id: int, scored: List[Tuple[int, ScoredQuestion]],
+                    top: List[Dict[str, Any]]):
+        self._write(self._path(run_id, f"shard-{shard_id:06d}.jsonl"),
+                    (json.dumps([position, *result], ensure_ascii=False) + "\n" for position, result in scored))
+        self._write(self._path(run_id, f"shard-{shard_id:06d}.top.json"), [json.dumps(top, ensure_ascii=False)])
+
+    def read_top(self, run_id: str, shard_id: int) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self._path(run_id, f"shard-{shard_id:06d}.top.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def iter_shard(self, run_id: str, shard_id: int) -> Iterator[Tuple[int, ScoredQuestion]]:
+        with open(self._path(run_id, f"shard-{shard_id:06d}.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                position, analysis, relevance, depth = json.loads(line)
+                yield position, (analysis, relevance, depth)
+
+
+class ShardWorker:
+    """
+    Worker process: claims shards, runs the Reader, Relevance and Depth
+    stages on their questions, and writes results and the partial TOP K to
+    the store.
+
+    Questions within a shard are scored on `concurrency` threads, since
+    agent calls mostly wait on the model. Questions whose scoring raises
+    are left out of the results, as in the JobQueue.
+    """
+
+    def __init__(self, queue: ShardQueue, store: ShardStore,
+                 process_question: Callable[[Dict[str, Any]], ScoredQuestion],
+                 concurrency: int = 8, lease_seconds: float = 600, name: Optional[str] = None):
+        self.queue = queue
+        self.store = store
+        self.process_question = process_question
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.shards_done = 0
+        self.questions_done = 0
+
+    def _score(self, question: Dict[str, Any]) -> Optional[ScoredQuestion]:
+        try:
+            return self.process_question(question)
+        except Exception as e:
+            logger.error(f"Worker {self.name}: question {question.get('id')} failed: {str(e)}")
+            return None
+
+    def _questions(self, shard: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if "questions" in shard:
+            return shard["questions"]
+        from .question_bank import QuestionBank
+        with QuestionBank(shard["bank"]) as bank:
+            return bank.get_many(shard["ids"])
+
+    def run_once(self) -> bool:
+        """
+        Process one shard.
+
+        Returns:
+            False if there was no shard to claim
+        """
+        shard = self.queue.claim(self.name, self.lease_seconds)
+        if shard is None:
+            return False
+        run_id, shard_id = shard["run_id"], shard["shard_id"]
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lease_seconds / 3):
+                self.queue.renew(run_id, shard_id, self.name, self.lease_seconds)
+
+        threading.Thread(target=heartbeat, name=f"lease-{shard_id}", daemon=True).start()
+        try:
+            questions = self._questions(shard)
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="shard") as executor:
+                results = list(executor.map(self._score, questions))
+            scored = [(p, r) for p, r in zip(shard["positions"], results) if r is not None]
+            relevance_weight, depth_weight = shard["weights"]
+            top = top_entries(scored, relevance_weight, depth_weight, shard["top_k"])
+            self.store.write_shard(run_id, shard_id, scored, top)
+            self.queue.complete(run_id, shard_id, self.name)
+        except Exception as e:
+            logger.error(f"Worker {self.name}: shard {run_id}/{shard_id} failed: {str(e)}")
+            self.queue.fail(run_id, shard_id, self.name, str(e))
+            return True
+        finally:
+            stop.set()
+
+        self.shards_done += 1
+        self.questions_done += len(scored)
+        logger.info(f"Worker {self.name}: shard {run_id}/{shard_id} done ({len(scored)}/{len(questions)} scored)")
+        return True
+
+    def run(self, exit_when_empty: bool = False, poll_interval: float = 2.0):
+        """Process shards until stopped, or until the queue is empty."""
+        while True:
+            if not self.run_once():
+                if exit_when_empty:
+                    return
+                time.sleep(poll_interval)
+
+
+class Coordinator:
+    """
+    Splits a bank into shards for ShardWorkers and merges their results.
+
+    Every shard keeps its best `top_k` questions (at least the Judge's
+    CANDIDATES), so the merged TOP K, and the Judge's prompt built from it,
+    are the same as scoring the whole bank in one process.
+    """
+
+    def __init__(self, queue: ShardQueue, store: ShardStore):
+        self.queue = queue
+        self.store = store
+
+    def submit(self, questions: List[Dict[str, Any]], relevance_weight: float = 0.6,
+               depth_weight: float = 0.4, shard_size: int = 500, by: str = "id",
+               top_k: int = CANDIDATES, bank_path: Optional[str] = None) -> str:
+        """
+        Queue a bank for the workers.
+
+        Args:
+            questions: Question dictionaries, in bank order
+            relevance_weight: Weight for relevance in final score (0-1)
+            depth_weight: Weight for depth in final score (0-1)
+            shard_size: Most questions per shard
+            by: Shard by "id" (bank order) or "topic"
+            top_k: Questions each shard keeps for the merge
+            bank_path: A QuestionBank file on shared storage; shards then
+                carry question ids only and workers read the questions
+                from it
+
+        Returns:
+            Run id
+        """
+        run_id = uuid.uuid4().hex
+        top_k = max(top_k, CANDIDATES)
+        shards = plan_shards(questions, shard_size, by)
+        for shard in shards:
+            shard.update(weights=[relevance_weight, depth_weight], top_k=top_k)
+            if bank_path is not None:
+                shard["bank"] = bank_path
+                shard["ids"] = [q["id"] for q in shard.pop("questions")]
+        self.store.write_manifest(run_id, {
+            "shards": len(shards), "questions": len(questions), "weights": [relevance_weight, depth_weight],
+            "top_k": top_k, "by": by, "submitted_at": time.time(),
+        })
+        self.queue.put(run_id, shards)
+        logger.info(f"Run {run_id}: {len(questions)} questions in {len(shards)} shards by {by}")
+        return run_id
+
+    def status(self, run_id: str) -> Dict[str, Any]:
+        counts = self.queue.status(run_id)
+        total = sum(counts.values())
+        return dict(counts, total=total, finished=counts[DONE] + counts[FAILED] == total)
+
+    def wait(self, run_id: str, timeout: Optional[float] = None, poll_interval: float = 1.0) -> Dict[str, Any]:
+        """Block until every shard is done or failed, or the timeout expires."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            status = self.status(run_id)
+            if status["finished"] or (deadline is not None and time.time() >= deadline):
+                return status
+            time.sleep(poll_interval)
+
+    def merge(self, run_id: str) -> Dict[str, Any]:
+        """
+        Merge the shards' partial TOP K lists.
+
+        Returns:
+            Dictionary with the TOP K candidates' reader_analyses,
+            relevance_scores and depth_scores (best first), their
+            composite_scores, and the shards still missing
+        """
+        manifest = self.store.read_manifest(run_id)
+        partials, missing = [], []
+        for shard_id in range(manifest["shards"]):
+            top = self.store.read_top(run_id, shard_id)
+            if top is None:
+                missing.append(shard_id)
+            else:
+                partials.append(top)
+        if missing:
+            logger.warning(f"Run {run_id}: merging without {len(missing)} shard(s): {missing[:10]}")
+        merged = merge_top_entries(partials, manifest["top_k"])
+        return {
+            "reader_analyses": [e["analysis"] for e in merged],
+            "relevance_scores": [e["relevance"] for e in merged],
+            "depth_scores": [e["depth"] for e in merged],
+            "composite_scores": [e["composite_score"] for e in merged],
+            "weights": manifest["weights"],
+            "missing_shards": missing,
+        }
+
+    def rank(self, run_id: str, judge=None) -> Dict[str, Any]:
+        """
+        TOP 3 of the merged candidates, with the Judge Agent's reasoning
+        when a judge is given.
+
+        Returns:
+            Ranking dictionary in the same shape as JudgeAgent.rank_questions
+        """
+        merged = self.merge(run_id)
+        relevance_weight, depth_weight = merged["weights"]
+        args = (merged["reader_analyses"], merged["relevance_scores"], merged["depth_scores"],
+                relevance_weight, depth_weight)
+        if judge is None:
+            from .judge_agent import JudgeAgent
+            return JudgeAgent(None).rank_locally(*args)
+        return judge.rank_questions(*args)
+
+    def iter_results(self, run_id: str) -> Iterator[ScoredQuestion]:
+        """Every scored question of the run, shard by shard."""
+        for shard_id in range(self.store.read_manifest(run_id)["shards"]):
+            try:
+                for _, result in self.store.iter_shard(run_id, shard_id):
+                    yield result
+            except FileNotFoundError:
+                continue
+
+
+def _load_questions(path: str) -> List[Dict[str, Any]]:
+    if path.endswith(".jqb"):
+        from .question_bank import QuestionBank
+        with QuestionBank(path) as bank:
+            return list(bank)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m agents.distributed",
+                                     description="Sharded ranking across worker processes")
+    parser.add_argument("--queue", required=True, help="SQLite queue file")
+    parser.add_argument("--store", required=True, help="Shared results directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Shard a bank and queue it")
+    submit.add_argument("questions", help="Questions JSON file or .jqb bank")
+    submit.add_argument("--importance-weight", type=float, default=0.6)
+    submit.add_argument("--shard-size", type=int, default=500)
+    submit.add_argument("--by", choices=("id", "topic"), default="id")
+
+    worker = commands.add_parser("worker", help="Score shards until stopped")
+    worker.add_argument("--concurrency", type=int, default=8, help="Questions scored at once")
+    worker.add_argument("--exit-when-empty", action="store_true")
+    worker.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between checks of an empty queue")
+
+    status = commands.add_parser("status", help="Shard counts of a run")
+    status.add_argument("run_id")
+
+    rank = commands.add_parser("rank", help="Merge a run and print the TOP 3")
+    rank.add_argument("run_id")
+    rank.add_argument("--judge", action="store_true", help="Ask the Judge Agent for reasoning")
+
+    args = parser.parse_args(argv)
+    queue, store = SQLiteShardQueue(args.queue), ShardStore(args.store)
+    coordinator = Coordinator(queue, store)
+
+    if args.command == "submit":
+        bank_path = os.path.abspath(args.questions) if args.questions.endswith(".jqb") else None
+        questions = _load_questions(args.questions)
+        print(coordinator.submit(questions, args.importance_weight, 1.0 - args.importance_weight,
+                                 args.shard_size, args.by, bank_path=bank_path))
+    elif args.command == "worker":
+        from .hedging import STAGE_DEADLINES
+        from .job_queue import agent_pipeline
+        from .llm import create_agent_llms
+        from .reader_agent import ReaderAgent
+        from .relevance_agent import RelevanceAgent
+        from .depth_agent import DepthAgent
+
+        llms = create_agent_llms()
+        process = agent_pipeline(
+            ReaderAgent(llms["reader"], os.getenv("JEE_TRUST_METADATA") == "1", llms["reader_fill"],
+                        backend=os.getenv("JEE_READER", "llm")),
+            RelevanceAgent(llms["relevance"], os.getenv("JEE_TERSE") == "1"),
+            DepthAgent(llms["depth"], os.getenv("JEE_TERSE") == "1"),
+            STAGE_DEADLINES
+        )
+        ShardWorker(queue, store, process, args.concurrency).run(args.exit_when_empty, args.poll_interval)
+    elif args.command == "status":
+        print(json.dumps(coordinator.status(args.run_id)))
+    else:
+        judge = None
+        if args.judge:
+            from .judge_agent import JudgeAgent
+            from .llm import create_agent_llms
+            judge = JudgeAgent(create_agent_llms()["judge"])
+        print(json.dumps(coordinator.rank(args.run_id, judge), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    main()
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, List
+
+
+class FakeResponse:
+    """Minimal stand-in for a LangChain chat message."""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.response_metadata = {}
+
+    def __add__(self, other: "FakeResponse") -> "FakeResponse":
+        # Streamed chunks add up to the whole message, as LangChain chunks do
+        return FakeResponse(self.content + other.content)
+
+
+class FakeLLM:
+    """
+    Deterministic offline LLM for benchmarks and local development.
+
+    Recognises which agent is calling from its system message and returns
+    well-formed JSON for that agent, with scores derived from a hash of the
+    prompt so repeated calls agree. `latency` (seconds) is slept per call to
+    mimic a remote model, plus `token_latency` per output token (about 4
+    characters) to mimic generation time; `reason_words` pads each
+    justification to a realistic length. A `temperature` above 0.1 adds
+    random noise to the rubric scores, like sampling a real model. Terse
+    (scores-only) and explain (reasons-only) prompts get the matching shape.
+    `stream` returns the same content one token at a time.
+    """
+
+    def __init__(self, latency: float = 0.0, name: str = "fake", temperature: float = 0.1,
+                 token_latency: float = 0.0, reason_words: int = 0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.reason = " ".join(["Fake model estimate"] + ["text"] * reason_words)
+        self.judge_padding = " text" * reason_words
+        self.name = name
+        self.temperature = temperature
+        self._rng = random.Random()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, messages: List[Any]) -> FakeResponse:
+        content = self._content(messages)
+        if self.token_latency:
+            time.sleep(self.token_latency * len(content) / 4)
+        return FakeResponse(content)
+
+    def stream(self, messages: List[Any]) -> Iterator[FakeResponse]:
+        content = self._content(messages)
+        for start in range(0, len(content), 4):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield FakeResponse(content[start:start + 4])
+
+    def _content(self, messages: List[Any]) -> str:
+        """Count the call, wait `latency` and build the response text."""
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        system = getattr(messages[0], "content", "") if messages else ""
+        prompt = getattr(messages[-1], "content", "") if messages else ""
+        seed = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8], 16)
+
+        if "Reader Agent" in system:
+            payload = self._reader(seed)
+        elif "Relevance Agent" in system:
+            payload = self._criteria(seed, [
+                "exam_frequency", "conceptual_importance", "application_relevance",
+                "foundation_building", "skill_development",
+            ], "justification", "overall_relevance_score", "summary")
+        elif "Depth Agent" in system:
+            payload = self._criteria(seed, [
+                "concept_integration", "mathematical_complexity", "reasoning_steps",
+                "abstract_thinking", "strategy_sophistication",
+            ], "explanation", "overall_depth_score", "depth_summary")
+        elif "Judge Agent" in system:
+            payload = self._judge(prompt)
+        else:
+            payload = {}
+
+        if "scores only" in system:
+            payload = {k: v["score"] if isinstance(v, dict) else v
+                       for k, v in payload.items() if k.endswith("_score") or isinstance(v, dict)}
+        elif "already been scored" in system:
+            payload = {k: v.get("justification", v.get("explanation")) if isinstance(v, dict) else v
+                       for k, v in payload.items() if not k.endswith("_score")}
+
+        return json.dumps(payload)
+
+    @staticmethod
+    def _score(seed: int, shift: int) -> int:
+        return 1 + (seed >> shift) % 10
+
+    def _reader(self, seed: int) -> dict:
+        return {
+            "main_topic": "Physics",
+            "sub_topics": ["general"],
+            "bloom_level": ["Understand", "Apply", "Analyze"][seed % 3],
+            "question_type": "numerical",
+            "difficulty": ["Easy", "Medium", "Hard"][(seed >> 2) % 3],
+            "key_principles": ["basic principles"],
+            "complexity_score": self._score(seed, 4),
+        }
+
+    def _criteria(self, seed: int, criteria: List[str], reason_key: str,
+                  overall_key: str, summary_key: str) -> dict:
+        payload = {}
+        scores = []
+        noise = max(0.0, self.temperature - 0.1) * 3
+        for i, criterion in enumerate(criteria):
+            score = self._score(seed, 3 * i)
+            if noise:
+                score = min(10, max(1, round(score + self._rng.gauss(0, noise))))
+            scores.append(score)
+            payload[criterion] = {"score": score, reason_key: self.reason}
+        payload[overall_key] = round(sum(scores) / len(scores))
+        payload[summary_key] = "Fake model summary"
+        return payload
+
+    def _judge(self, prompt: str) -> dict:
+        ids = [int(i) for i in re.findall(r'"question_id":\s*(-?\d+)', prompt)]
+        return {
+            "top_3_questions": [
+                {"rank": rank + 1, "question_id": question_id,
+                 "selection_reasoning": f"Fake judge reasoning for rank {rank + 1}.{self.judge_padding}"}
+                for rank, question_id in enumerate(ids[:3])
+            ],
+            "overall_analysis": "Fake judge analysis",
+            "methodology": "Fake judge methodology",
+        }
@@ -0,0 +1,353 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-call budget in seconds for each pipeline stage. When a stage's budget
+# runs out the agent falls back to its heuristic scores and marks the
+# result as degraded.
+STAGE_DEADLINES = {
+    "reader": 20.0,
+    "relevance": 20.0,
+    "depth": 20.0,
+    "judge": 30.0,
+    "relevance_explain": 20.0,
+    "depth_explain": 20.0,
+}
+
+# Client-side limits for the chat models. A call abandoned at its deadline
+# keeps its pool thread until the client gives up, so the client timeout is
+# the longest stage deadline and the client does not retry on its own:
+# HedgedLLM retries transient errors itself, within the caller's deadline.
+CLIENT_TIMEOUT = max(STAGE_DEADLINES.values())
+CLIENT_RETRIES = 0
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+_RETRY_STATUSES = (408, 409, 429)
+
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an LLM call does not finish within its deadline."""
+
+
+def transient(error: Exception) -> bool:
+    """Whether a failed call may succeed if sent again (rate limit, 5xx, dropped connection)."""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in _RETRY_STATUSES or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError)) or \
+        type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Limit LLM calls made by this thread inside the block to `seconds`.
+    Nested deadlines keep the earlier of the two.
+    """
+    previous = getattr(_local, "deadline", None)
+    if seconds is not None:
+        new = time.monotonic() + seconds
+        _local.deadline = new if previous is None else min(previous, new)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def current_deadline() -> Optional[float]:
+    return getattr(_local, "deadline", None)
+
+
+def call_with_deadline(seconds: Optional[float], fn, *args):
+    """Run fn(*args) with its LLM calls limited to `seconds`."""
+    with deadline(seconds):
+        return fn(*args)
+
+
+@contextmanager
+def metered(meter, label: Optional[str] = None):
+    """
+    Charge LLM calls made by this thread inside the block to `meter` (see
+    budget.UsageMeter), which may refuse them. `label` books the calls
+    under that name instead of their prompt template's.
+    """
+    previous = getattr(_local, "meter", None)
+    _local.meter = None if meter is None else (meter, label)
+    try:
+        yield
+    finally:
+        _local.meter = previous
+
+
+def current_meter() -> Optional[tuple]:
+    """(meter, label) set by `metered`, or None."""
+    return getattr(_local, "meter", None)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _mark(response: Any, hedged: bool) -> Any:
+    metadata = getattr(response, "response_metadata", None)
+    if isinstance(metadata, dict):
+        metadata["hedged"] = hedged
+    return response
+
+
+class HedgedLLM:
+    """
+    Wraps a chat model with per-call deadlines, retries and optional hedging.
+
+    A call that fails with a transient error (see `transient`) is sent
+    again up to `retries` times, after `retry_backoff` seconds doubling
+    each time, as long as the backoff fits in what is left of its deadline.
+
+    With hedging on, a duplicate request is sent once the primary has been
+    outstanding longer than the observed p95 latency, and whichever answer
+    arrives first wins. Calls made inside a `deadline(...)` block raise
+    DeadlineExceeded when the budget runs out, which the agents turn into
+    their heuristic fallback. Calls made inside a `metered(...)` block are
+    charged to its meter, which raises BudgetExceeded instead of letting a
+    call overspend. Responses carry response_metadata["hedged"].
+
+    Requests still running at their deadline are abandoned and keep their
+    worker until the model answers; queued ones are cancelled. No hedge is
+    sent while every worker is busy, so abandoned calls cannot double the
+    load on a slow model. Streams under a deadline are read on a worker so
+    a stalled stream is given up at the deadline too.
+    """
+
+    def __init__(self, llm, hedge: bool = True, hedge_percentile: float = 0.95,
+                 min_samples: int = 20, default_hedge_delay: float = 5.0, max_workers: int = 16,
+                 retries: int = 2, retry_backoff: float = 0.5):
+        self.llm = llm
+        self.hedge = hedge
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.latency = LatencyTracker()
+        self.max_workers = max_workers
+        self.stats = {"calls": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0,
+                      "deadline_exceeded": 0, "abandoned": 0}
+        self._stats_lock = threading.Lock()
+        self._outstanding = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _finished(self, future):
+        with self._stats_lock:
+            self._outstanding -= 1
+
+    def _submit(self, fn, *args):
+        with self._stats_lock:
+            self._outstanding += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait before sending the duplicate request."""
+        if len(self.latency) < self.min_samples:
+            return self.default_hedge_delay
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _timed_invoke(self, messages: List[Any]):
+        start = time.monotonic()
+        response = self.llm.invoke(messages)
+        self.latency.record(time.monotonic() - start)
+        return response
+
+    def invoke(self, messages: List[Any]):
+        charge = current_meter()
+        if charge is None:
+            return self._invoke(messages)
+        meter, label = charge
+        ticket = meter.reserve(messages, label)
+        response = None
+        try:
+            response = self._invoke(messages)
+        finally:
+            meter.settle(ticket, response)
+        return response
+
+    def _invoke(self, messages: List[Any]):
+        self._count("calls")
+        call_deadline = current_deadline()
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(messages, call_deadline)
+            except Exception as e:
+                backoff = self.retry_backoff * 2 ** attempt
+                if attempt >= self.retries or not transient(e) or \
+                        (call_deadline is not None and call_deadline - time.monotonic() <= backoff):
+                    raise
+                attempt += 1
+                self._count("retries")
+                logger.warning(f"Retrying LLM call ({attempt}/{self.retries}) after {type(e).__name__}: {str(e)}")
+                time.sleep(backoff)
+
+    def _attempt(self, messages: List[Any], call_deadline: Optional[float]):
+        """One request (plus its hedge), within the deadline."""
+        if call_deadline is None and not self.hedge:
+            return _mark(self._timed_invoke(messages), False)
+
+        def remaining() -> Optional[float]:
+            return None if call_deadline is None else max(0.0, call_deadline - time.monotonic())
+
+        primary = self._submit(self._timed_invoke, messages)
+        futures = [primary]
+
+        if self.hedge:
+            delay = self.hedge_delay()
+            budget = remaining()
+            done, _ = wait(futures, timeout=delay if budget is None else min(delay, budget))
+            if not done and (budget is None or budget > delay):
+                if self._outstanding >= self.max_workers:
+                    self._count("hedges_skipped")
+                else:
+                    self._count("hedged")
+                    futures.append(self._submit(self._timed_invoke, messages))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return _mark(future.result(), len(futures) > 1)
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        for future in pending:
+            if not future.cancel():
+                self._count("abandoned")
+        self._count("deadline_exceeded")
+        raise DeadlineExceeded(f"LLM call exceeded its deadline after {len(futures)} request(s)")
+
+    def stream(self, messages: List[Any]) -> Iterator[Any]:
+        """
+        Yield the response in chunks as the model generates it.
+
+        Streams are not hedged. The deadline is checked as each chunk
+        arrives. Models without streaming yield their whole response as
+        one chunk.
+        """
+        charge = current_meter()
+        if charge is None:
+            yield from self._stream(messages)
+            return
+        meter, label = charge
+        ticket = meter.reserve(messages, label)
+        response = None
+        try:
+            for chunk in self._stream(messages):
+                response = chunk if response is None else response + chunk
+                yield chunk
+        finally:
+            meter.settle(ticket, response)
+
+    def _stream(self, messages: List[Any]) -> Iterator[Any]:
+        self._count("calls")
+        call_deadline = current_deadline()
+        stream = getattr(self.llm, "stream", None)
+        if stream is None:
+            yield self._attempt(messages, call_deadline)
+            return
+
+        start = time.monotonic()
+        if call_deadline is None:
+            yield from stream(messages)
+        else:
+            yield from self._stream_within(stream, messages, call_deadline)
+        self.latency.record(time.monotonic() - start)
+
+    def _stream_within(self, stream, messages: List[Any], call_deadline: float) -> Iterator[Any]:
+        """Read the stream on a worker, waiting for each chunk no longer than the deadline allows."""
+        chunks = queue.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def read():
+            try:
+                for chunk in stream(messages):
+                    if stop.is_set():
+                        return
+                    chunks.put((chunk, None))
+                chunks.put((end, None))
+            except Exception as e:
+                chunks.put((None, e))
+
+        reader = self._submit(read)
+        try:
+            while True:
+                remaining = call_deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    chunk, error = chunks.get(timeout=remaining)
+                except queue.Empty:
+                    if not reader.done() and not reader.cancel():
+                        self._count("abandoned")
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceeded("LLM stream exceeded its deadline")
+                if error is not None:
+                    raise error
+                if chunk is end:
+                    return
+                yield chunk
+        finally:
+            stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+            stats["outstanding"] = self._outstanding
+        stats["p95_latency"] = self.latency.percentile(0.95)
+        stats["hedge_delay"] = self.hedge_delay()
+        return stats
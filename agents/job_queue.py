@@ -0,0 +1,336 @@
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Any, Callable, Optional, Tuple
+import logging
+
+from .hedging import call_with_deadline
+from .records import ScoredRecord, compact_scored, expand_scored
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+ScoredQuestion = Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]
+
+
+def agent_pipeline(reader, relevance, depth,
+                   deadlines: Optional[Dict[str, float]] = None) -> Callable[[Dict[str, Any]], ScoredQuestion]:
+    """
+    Per-question task: Reader analysis, then Relevance and Depth scoring.
+
+    Args:
+        deadlines: Optional per-stage budgets in seconds (see
+            hedging.STAGE_DEADLINES); a stage that runs out falls back to
+            heuristic scores instead of holding up the job
+    """
+    deadlines = deadlines or {}
+
+    def process(question: Dict[str, Any]) -> ScoredQuestion:
+        analysis = call_with_deadline(deadlines.get("reader"), reader.analyze_question, question)
+        return (
+            analysis,
+            call_with_deadline(deadlines.get("relevance"), relevance.score_question, analysis),
+            call_with_deadline(deadlines.get("depth"), depth.score_question, analysis),
+        )
+    return process
+
+
+class _Job:
+    def __init__(self, tenant: str, questions: List[Dict[str, Any]], priority: int,
+                 finalize: Optional[Callable[[Dict[str, List[Dict[str, Any]]]], Any]],
+                 process: Optional[Callable[[Dict[str, Any]], ScoredQuestion]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.tenant = tenant
+        self.questions = questions
+        self.priority = priority
+        self.finalize = finalize
+        self.process = process
+        self.status = QUEUED
+        self.pending = deque(range(len(questions)))
+        self.in_flight = 0
+        self.completed = 0
+        self.results: List[Optional[ScoredRecord]] = [None] * len(questions)
+        self.completion_order: List[int] = []
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+
+
+class _Tenant:
+    def __init__(self, name: str, weight: float, virtual_time: float):
+        self.name = name
+        self.weight = weight
+        self.virtual_time = virtual_time
+        self.jobs: List[_Job] = []
+        self.served = 0
+
+
+class JobQueue:
+    """
+    In-process job queue with per-tenant fair-share scheduling.
+
+    A job is split into one task per question, and worker threads pull tasks
+    one at a time. The tenant with the smallest virtual time (tasks served
+    divided by its weight) gets the next task; within a tenant the highest
+    priority jobs go first and equal-priority jobs take turns. A 10-question
+    job therefore finishes in about 10 task slots even while a 10k-question
+    job from the same or another tenant is running.
+
+    Scored questions are kept as slotted records that refer to the job's
+    questions by id, so a large job holds one copy of each question and
+    shares its topic and tag strings. result() and completed_results()
+    return the usual dictionaries.
+    """
+
+    def __init__(self, process_question: Callable[[Dict[str, Any]], ScoredQuestion],
+                 num_workers: int = 4, retention_seconds: float = 3600):
+        self.process_question = process_question
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, _Job] = {}
+        self._tenants: Dict[str, _Tenant] = {}
+        self._lock = threading.Lock()
+        self._work_available = threading.Condition(self._lock)
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def set_tenant_weight(self, tenant: str, weight: float):
+        """Give a tenant a larger (or smaller) share of the workers."""
+        with self._lock:
+            self._tenant(tenant).weight = weight
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = _Tenant(name, 1.0, 0.0)
+            self._tenants[name] = tenant
+        return tenant
+
+    def submit(self, tenant: str, questions: List[Dict[str, Any]], priority: int = 0,
+               finalize: Optional[Callable[[Dict[str, List[Dict[str, Any]]]], Any]] = None,
+               process: Optional[Callable[[Dict[str, Any]], ScoredQuestion]] = None) -> str:
+        """
+        Queue a job.
+
+        Args:
+            tenant: Fair-share bucket (user, session or API client)
+            questions: Questions to score
+            priority: Higher runs first among the tenant's own jobs
+            finalize: Optional callable run on the scored results when the
+                job finishes; its return value becomes the job result
+            process: Optional per-job replacement for the queue's
+                process_question (e.g. a cascade that depends on the job's
+                weights)
+
+        Returns:
+            Job id
+        """
+        job = _Job(tenant, list(questions), priority, finalize, process)
+        with self._lock:
+            self._expire_finished()
+            self._jobs[job.job_id] = job
+            owner = self._tenant(tenant)
+            if not owner.jobs:
+                # A tenant returning from idle starts at the current virtual
+                # time, so it cannot claim the workers for the time it was away.
+                active = [t.virtual_time for t in self._tenants.values() if t.jobs]
+                owner.virtual_time = max(owner.virtual_time, min(active) if active else 0.0)
+            owner.jobs.append(job)
+            finalize = not job.questions and self._finish(job)
+            self._work_available.notify_all()
+        if finalize:
+            self._run_finalize(job)
+        logger.info(f"Queued job {job.job_id} for {tenant} ({len(job.questions)} questions)")
+        return job.job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job; queued tasks are dropped and in-flight results discarded."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job.status = CANCELLED
+            job.pending.clear()
+            job.finished_at = time.time()
+            self._detach(job)
+        logger.info(f"Cancelled job {job_id}")
+        return True
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Progress snapshot for polling."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "job_id": job.job_id,
+                "tenant": job.tenant,
+                "priority": job.priority,
+                "status": job.status,
+                "total": len(job.questions),
+                "completed": job.completed,
+                "error": job.error,
+            }
+
+    def result(self, job_id: str) -> Any:
+        """Job result once done (finalize output, or the scored lists)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != DONE:
+                return None
+            return self._scored_lists(job) if job.finalize is None else job.result
+
+    def completed_results(self, job_id: str, start: int = 0) -> List[Optional[ScoredQuestion]]:
+        """
+        Scored questions in the order they finished, from position `start`,
+        so callers can show partial results while the job is running. Failed
+        questions appear as None; advance `start` by the length returned.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return []
+            return [None if job.results[i] is None else expand_scored(job.results[i], job.questions[i])
+                    for i in job.completion_order[start:]]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 0.05) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes or the timeout expires; returns its status."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["status"] in FINISHED:
+                return status
+            if deadline is not None and time.time() >= deadline:
+                return status
+            time.sleep(poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tenants": {
+                    t.name: {"weight": t.weight, "served": t.served, "active_jobs": len(t.jobs)}
+                    for t in self._tenants.values()
+                },
+                "pending_tasks": sum(len(j.pending) for j in self._jobs.values()),
+                "jobs": len(self._jobs),
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            self._stopped = True
+            self._work_available.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    # Scheduling (call with the lock held)
+
+    def _next_task(self) -> Optional[Tuple[_Job, int]]:
+        candidates = [t for t in self._tenants.values() if any(j.pending for j in t.jobs)]
+        if not candidates:
+            return None
+        tenant = min(candidates, key=lambda t: t.virtual_time)
+        runnable = [j for j in tenant.jobs if j.pending]
+        top_priority = max(j.priority for j in runnable)
+        job = next(j for j in runnable if j.priority == top_priority)
+
+        # Rotate so equal-priority jobs of this tenant take turns
+        tenant.jobs.remove(job)
+        tenant.jobs.append(job)
+
+        tenant.virtual_time += 1.0 / tenant.weight
+        tenant.served += 1
+        job.status = RUNNING
+        job.in_flight += 1
+        return job, job.pending.popleft()
+
+    def _detach(self, job: _Job):
+        tenant = self._tenants.get(job.tenant)
+        if tenant is not None and job in tenant.jobs:
+            tenant.jobs.remove(job)
+
+    def _finish(self, job: _Job) -> bool:
+        """
+        Mark a job complete. Returns True when the caller still has to run
+        finalize (outside the lock).
+        """
+        job.finished_at = time.time()
+        self._detach(job)
+        if job.finalize is None:
+            # result() builds the scored lists from the records on request
+            job.status = DONE
+            return False
+        return True
+
+    def _expire_finished(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [i for i, j in self._jobs.items() if j.finished_at is not None and j.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _scored_lists(job: _Job) -> Dict[str, List[Dict[str, Any]]]:
+        scored = [expand_scored(r, q) for r, q in zip(job.results, job.questions) if r is not None]
+        return {
+            "reader_analyses": [r[0] for r in scored],
+            "relevance_scores": [r[1] for r in scored],
+            "depth_scores": [r[2] for r in scored],
+        }
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                task = self._next_task()
+                while task is None and not self._stopped:
+                    self._work_available.wait()
+                    task = self._next_task()
+                if self._stopped:
+                    return
+            job, index = task
+
+            try:
+                question = job.questions[index]
+                scored = compact_scored((job.process or self.process_question)(question), question)
+                error = None
+            except Exception as e:
+                scored, error = None, str(e)
+                logger.error(f"Job {job.job_id} question {index} failed: {error}")
+
+            finalize = False
+            with self._lock:
+                job.in_flight -= 1
+                if job.status == CANCELLED:
+                    continue
+                job.results[index] = scored
+                job.completion_order.append(index)
+                job.completed += 1
+                if error and job.error is None:
+                    job.error = error
+                if not job.pending and job.in_flight == 0:
+                    finalize = self._finish(job)
+
+            if finalize:
+                self._run_finalize(job)
+
+    def _run_finalize(self, job: _Job):
+        try:
+            result = job.finalize(self._scored_lists(job))
+            status, error = DONE, job.error
+        except Exception as e:
+            logger.error(f"Job {job.job_id} finalize failed: {str(e)}")
+            result, status, error = None, FAILED, str(e)
+        with self._lock:
+            if job.status != CANCELLED:
+                job.result, job.status, job.error = result, status, error
@@ -1,20 +1,34 @@
 import json
 import re
-from typing import Dict, List, Any, Tuple
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
-from langchain_groq import ChatGroq
+from typing import Dict, Iterator, List, Any, Tuple, TYPE_CHECKING
+from .partial_json import IncrementalJSONParser
+from .records import compute_composite_scores, question_texts
+from .prompts import JUDGE as JUDGE_PROMPT
 import logging
 
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
 logger = logging.getLogger(__name__)
 
+# Questions (by composite score) the Judge sees in its prompt
+CANDIDATES = 5
+
 class JudgeAgent:
     """
     Judge Agent: Makes final decisions on question ranking by synthesizing inputs
     from all other agents and applying weighting factors.
     """
     
-    def __init__(self, llm: ChatGroq):
+    def __init__(self, llm: "ChatGroq", candidates: int = CANDIDATES):
+        """
+        Args:
+            llm: Chat model for the final decision
+            candidates: Questions with the best composite scores shown to
+                the Judge (at least 3)
+        """
         self.llm = llm
+        self.candidates = candidates
         self.name = "Judge Agent"
         
     def rank_questions(self, 
@@ -37,51 +51,197 @@ class JudgeAgent:
             Dictionary with top 3 ranked questions and explanations
         """
         try:
-            # Calculate composite scores
-            composite_scores = self._calculate_composite_scores(
-                reader_analyses, relevance_scores, depth_scores, 
-                relevance_weight, depth_weight
-            )
-            
-            # Check if we should use fallback due to potential token limits
-            prompt = self._create_ranking_prompt(
+            composite_scores, system, prompt = self.candidate_prompt(
                 reader_analyses, relevance_scores, depth_scores,
-                relevance_weight, depth_weight, composite_scores
+                relevance_weight, depth_weight
             )
             
             # Estimate token count (rough approximation)
-            estimated_tokens = len(prompt.split()) * 1.3  # Conservative estimate
+            estimated_tokens = len((system + prompt).split()) * 1.3  # Conservative estimate
             
             if estimated_tokens > 5000:  # Stay well below 6000 limit
                 logger.warning(f"Prompt too large ({estimated_tokens} estimated tokens), using fallback ranking")
-                return self._fallback_ranking(composite_scores, reader_analyses)
+                ranking = self._fallback_ranking(composite_scores, reader_analyses)
+                ranking["degraded"] = True
+                return ranking
+            
+            from langchain.schema import HumanMessage, SystemMessage
             
             messages = [
-                SystemMessage(content="You are a Judge Agent for ranking JEE physics questions."),
+                SystemMessage(content=system),
                 HumanMessage(content=prompt)
             ]
             
             response = self.llm.invoke(messages)
-            try:
-                ranking_data = self._parse_response(response.content)
-            except Exception as parse_error:
-                logger.warning(f"Failed to parse LLM response, using fallback ranking: {str(parse_error)}")
-                return self._fallback_ranking(composite_scores, reader_analyses)
+            JUDGE_PROMPT.record(prompt, response)
+            return self._complete_ranking(response, composite_scores, reader_analyses,
+                                          relevance_weight, depth_weight)
             
-            # Add calculation details
-            ranking_data["calculation_details"] = {
-                "relevance_weight": relevance_weight,
-                "depth_weight": depth_weight,
-                "composite_scores": composite_scores,
-                "agent": self.name
-            }
+        except Exception as e:
+            logger.error(f"Error in Judge Agent ranking: {str(e)}")
+            ranking = self._fallback_ranking(composite_scores, reader_analyses)
+            ranking["degraded"] = True
+            return ranking
+    
+    def stream_ranking(self,
+                       reader_analyses: List[Dict[str, Any]],
+                       relevance_scores: List[Dict[str, Any]],
+                       depth_scores: List[Dict[str, Any]],
+                       relevance_weight: float = 0.6,
+                       depth_weight: float = 0.4) -> Iterator[Dict[str, Any]]:
+        """
+        Same decision as rank_questions, yielded while the Judge's answer streams in.
+        
+        The answer is read with an incremental JSON parser. A question is
+        yielded as soon as the Judge has named it, with its composite
+        scores filled in from the local calculation, and its reasoning grows
+        as more tokens arrive. These partial rankings are marked "partial".
+        
+        Yields:
+            Partial rankings, then the complete ranking exactly as
+            rank_questions returns it
+        """
+        composite_scores = []
+        try:
+            composite_scores, system, prompt = self.candidate_prompt(
+                reader_analyses, relevance_scores, depth_scores,
+                relevance_weight, depth_weight
+            )
+            stream = getattr(self.llm, "stream", None)
+            estimated_tokens = len((system + prompt).split()) * 1.3
+            if stream is None or estimated_tokens > 5000:
+                yield self.rank_questions(reader_analyses, relevance_scores, depth_scores,
+                                          relevance_weight, depth_weight)
+                return
+            
+            from langchain.schema import HumanMessage, SystemMessage
             
-            logger.info("Judge Agent completed final ranking")
-            return ranking_data
+            composites_by_id = {c["question_id"]: c for c in composite_scores}
+            parser = IncrementalJSONParser()
+            response = None
+            for chunk in stream([SystemMessage(content=system), HumanMessage(content=prompt)]):
+                response = chunk if response is None else response + chunk
+                if isinstance(chunk.content, str) and parser.feed(chunk.content):
+                    partial = self._partial_ranking(parser.value, composites_by_id)
+                    if partial["top_3_questions"]:
+                        yield partial
+            
+            JUDGE_PROMPT.record(prompt, response)
+            yield self._complete_ranking(response, composite_scores, reader_analyses,
+                                         relevance_weight, depth_weight)
             
         except Exception as e:
             logger.error(f"Error in Judge Agent ranking: {str(e)}")
-            return self._fallback_ranking(composite_scores, reader_analyses)
+            ranking = self._fallback_ranking(composite_scores, reader_analyses)
+            ranking["degraded"] = True
+            yield ranking
+    
+    def _complete_ranking(self, response: Any, composite_scores: List[Dict[str, Any]],
+                          reader_analyses: List[Dict[str, Any]],
+                          relevance_weight: float, depth_weight: float) -> Dict[str, Any]:
+        """Parse the Judge's full answer and add calculation details."""
+        try:
+            ranking_data = self._parse_response(response.content)
+        except Exception as parse_error:
+            logger.warning(f"Failed to parse LLM response, using fallback ranking: {str(parse_error)}")
+            ranking = self._fallback_ranking(composite_scores, reader_analyses)
+            ranking["degraded"] = True
+            return ranking
+        
+        # Add calculation details
+        ranking_data["calculation_details"] = {
+            "relevance_weight": relevance_weight,
+            "depth_weight": depth_weight,
+            "composite_scores": composite_scores,
+            "agent": self.name,
+            "hedged": bool(getattr(response, "response_metadata", {}).get("hedged")),
+            "degraded": False
+        }
+        
+        logger.info("Judge Agent completed final ranking")
+        return ranking_data
+    
+    @staticmethod
+    def _partial_ranking(data: Any, composites_by_id: Dict[Any, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ranking entries parsed so far whose question id is known. Scores
+        the Judge has not written yet come from the composite scores, and
+        the full question text is shown instead of the Judge's copy.
+        """
+        data = data if isinstance(data, dict) else {}
+        entries = data.get("top_3_questions")
+        top_questions = []
+        for i, entry in enumerate(entries if isinstance(entries, list) else []):
+            if not isinstance(entry, dict) or "question_id" not in entry:
+                continue
+            composite = composites_by_id.get(entry["question_id"], {})
+            question = {
+                "rank": i + 1,
+                "final_score": composite.get("composite_score", 0),
+                "relevance_contribution": composite.get("relevance_contribution", 0),
+                "depth_contribution": composite.get("depth_contribution", 0),
+                "selection_reasoning": "",
+            }
+            question.update(entry)
+            question["question_text"] = composite.get("question_text", question.get("question_text", ""))
+            top_questions.append(question)
+        return {
+            "top_3_questions": top_questions,
+            "overall_analysis": data.get("overall_analysis", ""),
+            "methodology": data.get("methodology", ""),
+            "partial": True,
+        }
+    
+    def candidate_prompt(self,
+                         reader_analyses: List[Dict[str, Any]],
+                         relevance_scores: List[Dict[str, Any]],
+                         depth_scores: List[Dict[str, Any]],
+                         relevance_weight: float = 0.6,
+                         depth_weight: float = 0.4) -> Tuple[List[Dict[str, Any]], str, str]:
+        """
+        Composite scores and the ranking prompt built from them.
+        
+        The prompt only contains the top `candidates` questions, so two
+        score sets with the same prompt get the same Judge decision.
+        
+        Returns:
+            (composite_scores, system, user)
+        """
+        # Calculate composite scores
+        composite_scores = self._calculate_composite_scores(
+            reader_analyses, relevance_scores, depth_scores,
+            relevance_weight, depth_weight
+        )
+        system, prompt = self._create_ranking_prompt(
+            reader_analyses, relevance_scores, depth_scores,
+            relevance_weight, depth_weight, composite_scores
+        )
+        return composite_scores, system, prompt
+    
+    def rank_locally(self,
+                     reader_analyses: List[Dict[str, Any]],
+                     relevance_scores: List[Dict[str, Any]],
+                     depth_scores: List[Dict[str, Any]],
+                     relevance_weight: float = 0.6,
+                     depth_weight: float = 0.4) -> Dict[str, Any]:
+        """
+        Rank by composite score alone, without calling the LLM.
+        
+        Returns:
+            Dictionary in the same shape as rank_questions
+        """
+        composite_scores = self._calculate_composite_scores(
+            reader_analyses, relevance_scores, depth_scores,
+            relevance_weight, depth_weight
+        )
+        ranking = self._fallback_ranking(composite_scores, reader_analyses)
+        ranking["calculation_details"] = {
+            "relevance_weight": relevance_weight,
+            "depth_weight": depth_weight,
+            "composite_scores": composite_scores,
+            "agent": self.name
+        }
+        return ranking
     
     def _calculate_composite_scores(self, 
                                    reader_analyses: List[Dict[str, Any]], 
@@ -90,34 +250,12 @@ class JudgeAgent:
                                    relevance_weight: float,
                                    depth_weight: float) -> List[Dict[str, Any]]:
         """Calculate composite scores for all questions."""
-        composite_scores = []
-        
-        for i, reader_analysis in enumerate(reader_analyses):
-            question_id = reader_analysis["original_question"]["id"]
-            
-            # Find corresponding scores
-            relevance_score = next((r for r in relevance_scores if r["question_id"] == question_id), None)
-            depth_score = next((d for d in depth_scores if d["question_id"] == question_id), None)
-            
-            if relevance_score and depth_score:
-                relevance_val = relevance_score["overall_relevance_score"]
-                depth_val = depth_score["overall_depth_score"]
-                
-                composite_score = (relevance_val * relevance_weight) + (depth_val * depth_weight)
-                
-                composite_scores.append({
-                    "question_id": question_id,
-                    "question_text": reader_analysis["original_question"]["question_text"],
-                    "relevance_score": relevance_val,
-                    "depth_score": depth_val,
-                    "composite_score": composite_score,
-                    "relevance_contribution": relevance_val * relevance_weight,
-                    "depth_contribution": depth_val * depth_weight
-                })
-        
-        # Sort by composite score
-        composite_scores.sort(key=lambda x: x["composite_score"], reverse=True)
-        return composite_scores
+        texts = question_texts(reader_analyses)
+        composites = compute_composite_scores(
+            list(texts), relevance_scores, depth_scores,
+            relevance_weight, depth_weight
+        )
+        return [c.to_dict(texts[c.question_id]) for c in composites]
     
     def _create_ranking_prompt(self, 
                               reader_analyses: List[Dict[str, Any]], 
@@ -125,11 +263,17 @@ class JudgeAgent:
                               depth_scores: List[Dict[str, Any]],
                               relevance_weight: float,
                               depth_weight: float,
-                              composite_scores: List[Dict[str, Any]]) -> str:
-        """Create a concise prompt for final ranking to avoid token limits."""
+                              composite_scores: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """
+        Create a concise prompt for final ranking to avoid token limits.
         
-        # Get top 5 candidates only to reduce data size
-        top_candidates = composite_scores[:5]
+        Returns:
+            (system, user) text; the candidates go in the user message so
+            the instructions stay a cacheable prefix
+        """
+        
+        # Get top candidates only to reduce data size
+        top_candidates = composite_scores[:self.candidates]
         
         # Create simplified data for prompt - only essential information
         simplified_data = []
@@ -153,24 +297,11 @@ class JudgeAgent:
                 "depth_reasons": depth_data.get("reasoning", "")[:150] + "..."  # Truncate
             })
         
-        return f"""Judge Agent: Analyze and rank TOP 3 JEE physics questions with detailed reasoning.
-
-Your task: Select the 3 most important questions for JEE exam preparation.
-
-Analysis Weights: Relevance {relevance_weight*100}% | Depth {depth_weight*100}%
-
-Candidate Questions:
-{json.dumps(simplified_data, indent=2)}
-
-Instructions:
-1. Evaluate each question's importance for JEE Physics exam
-2. Consider relevance to JEE syllabus, depth of concepts, and exam frequency
-3. Provide detailed reasoning for WHY each question earned its rank
-4. Explain how the scores influenced your decision
-
-Return JSON with detailed explanations:
-{{"top_3_questions": [{{"rank": 1, "question_id": X, "question_text": "full text", "final_score": X.X, "relevance_contribution": X.X, "depth_contribution": X.X, "selection_reasoning": "Detailed explanation: Why this question is #1 - mention specific concepts, relevance to JEE pattern, difficulty appropriateness, and learning value (3-4 sentences)"}}, {{"rank": 2, "question_id": Y, "selection_reasoning": "Detailed explanation for rank #2 (3-4 sentences)"}}, {{"rank": 3, "question_id": Z, "selection_reasoning": "Detailed explanation for rank #3 (3-4 sentences)"}}], "overall_analysis": "Summary of ranking methodology and key factors", "methodology": "How weights and scores determined final ranking"}}
-"""
+        return JUDGE_PROMPT.render(
+            relevance_pct=relevance_weight * 100,
+            depth_pct=depth_weight * 100,
+            candidates=json.dumps(simplified_data, indent=2)
+        )
     
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """Parse the LLM response and extract JSON."""
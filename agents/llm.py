@@ -0,0 +1,81 @@
+import os
+from typing import Dict, Any, Optional
+import logging
+
+from .hedging import CLIENT_RETRIES, CLIENT_TIMEOUT, HedgedLLM
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+
+def create_llm(api_key: Optional[str] = None, model: Optional[str] = None,
+               temperature: float = 0.1, max_retries: int = CLIENT_RETRIES,
+               request_timeout: float = CLIENT_TIMEOUT,
+               hedge: Optional[bool] = None):
+    """
+    Create the chat model shared by the agents.
+
+    Setting JEE_FAKE_LLM=1 returns an offline FakeLLM instead (its per-call
+    latency in seconds can be set with JEE_FAKE_LLM_LATENCY), which is what
+    the benchmarks use. The model is wrapped in a HedgedLLM so per-stage
+    deadlines apply.
+
+    Args:
+        api_key: Groq API key (defaults to GROQ_API_KEY)
+        model: Model name (defaults to GROQ_MODEL or DEFAULT_MODEL)
+        hedge: Send a duplicate request after the p95 latency
+            (defaults to JEE_HEDGE_REQUESTS)
+
+    Returns:
+        HedgedLLM around a ChatGroq client or FakeLLM
+    """
+    if hedge is None:
+        hedge = os.getenv("JEE_HEDGE_REQUESTS") == "1"
+
+    if os.getenv("JEE_FAKE_LLM") == "1":
+        from .fake_llm import FakeLLM
+        return HedgedLLM(FakeLLM(latency=float(os.getenv("JEE_FAKE_LLM_LATENCY", "0")),
+                                 temperature=temperature), hedge=hedge)
+
+    from langchain_groq import ChatGroq
+
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY is not set")
+
+    return HedgedLLM(ChatGroq(
+        model=model or os.getenv("GROQ_MODEL", DEFAULT_MODEL),
+        temperature=temperature,
+        groq_api_key=api_key,
+        max_retries=max_retries,
+        request_timeout=request_timeout
+    ), hedge=hedge)
+
+
+def create_agent_llms(api_key: Optional[str] = None, model: Optional[str] = None,
+                      temperature: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Chat models for the reader, relevance, depth and judge agents.
+
+    With JEE_MODEL_ROUTES set (inline JSON or a path, see router.ModelRouter)
+    each agent gets its own routed model with failover and per-endpoint
+    latency/cost tracking. Otherwise all four share one create_llm() client.
+
+    Args:
+        temperature: Sampling temperature for every model, overriding the
+            default 0.1 and any temperature in the route config
+
+    Returns:
+        Dictionary mapping agent name to its chat model
+    """
+    from .router import AGENTS, ModelRouter, load_route_config
+
+    config = load_route_config()
+    if config is not None:
+        router = ModelRouter(config, api_key, temperature=temperature)
+        logger.info(f"Routing agents with policy config: {sorted(config.get('agents', {}))}")
+        return dict(router.llms)
+
+    llm = create_llm(api_key, model) if temperature is None else create_llm(api_key, model, temperature)
+    return {agent: llm for agent in AGENTS}
@@ -0,0 +1,161 @@
+import bisect
+import heapq
+from fractions import Fraction
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from .records import _score
+
+logger = logging.getLogger(__name__)
+
+# Slider positions this close to a breakpoint count as being on it
+BREAKPOINT_TOLERANCE = 1e-9
+
+
+def _candidates(lines: List[Tuple[Any, float, float, int]], top_k: int):
+    """
+    Lines that reach the TOP K somewhere in [0, 1] (the K-skyband).
+
+    Composites are linear in the weight, so a question that K others beat
+    at both ends is never in the TOP K, where "beat" means a higher score
+    or an equal score and an earlier bank position. Lines are visited in
+    their w = 0 order, so every earlier line beats the current one there;
+    keeping the K best (relevance, bank position) keys seen so far tells
+    whether K of them also beat it at w = 1. O(n log K).
+    """
+    best: List[Tuple[float, int]] = []
+    kept = []
+    for line in sorted(lines, key=lambda l: (-l[2], l[3])):
+        key = (line[1], -line[3])
+        if len(best) == top_k and best[0] > key:
+            continue
+        kept.append(line)
+        if len(best) < top_k:
+            heapq.heappush(best, key)
+        elif key > best[0]:
+            heapq.heapreplace(best, key)
+    return kept
+
+
+class TopKSchedule:
+    """
+    The TOP K for every importance weight in [0, 1].
+
+    `points` are the weights at which the ranking changes (always starting
+    with 0 and ending with 1). `at_points[i]` is the ranking exactly at
+    points[i], where tied questions keep their bank order, and
+    `between[i]` the ranking on the open interval points[i]..points[i+1].
+    A slider position resolves with one binary search.
+    """
+
+    def __init__(self, top_k: int, points: List[Fraction], at_points: List[Tuple[Any, ...]],
+                 between: List[Tuple[Any, ...]], candidates: int):
+        self.top_k = top_k
+        self.points = points
+        self.at_points = at_points
+        self.between = between
+        self.candidates = candidates
+        self._floats = [float(p) for p in points]
+
+    def lookup(self, importance_weight: float) -> Tuple[Any, ...]:
+        """Ordered TOP K question ids at this importance weight."""
+        weight = min(1.0, max(0.0, importance_weight))
+        i = bisect.bisect_left(self._floats, weight - BREAKPOINT_TOLERANCE)
+        if i < len(self._floats) and self._floats[i] <= weight + BREAKPOINT_TOLERANCE:
+            return self.at_points[i]
+        return self.between[i - 1]
+
+    def distinct_sets(self) -> List[frozenset]:
+        """Every different TOP K set across the weight range, in slider order."""
+        seen = []
+        for ranking in (r for pair in zip(self.at_points, self.between + [()]) for r in pair):
+            if ranking and frozenset(ranking) not in seen:
+                seen.append(frozenset(ranking))
+        return seen
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "top_k": self.top_k,
+            "candidates": self.candidates,
+            "breakpoints": [
+                {"weight": float(p), "top_k": list(at)} for p, at in zip(self.points, self.at_points)
+            ],
+            "intervals": [
+                {"from": float(a), "to": float(b), "top_k": list(r)}
+                for a, b, r in zip(self.points, self.points[1:], self.between)
+            ],
+        }
+
+
+def build_schedule(question_ids: List[Any],
+                   relevance_scores: List[Dict[str, Any]],
+                   depth_scores: List[Dict[str, Any]],
+                   top_k: int = 3) -> TopKSchedule:
+    """
+    Precompute the TOP K over the whole importance-weight range.
+
+    With weight w the composite is depth + w * (relevance - depth), one line
+    per question. After dropping lines that can never reach the TOP K, a
+    kinetic sweep moves from w = 0 to 1. The next event is the nearest
+    crossing of two adjacent TOP K lines, or of an outside line with the
+    K-th. Arithmetic is exact (Fractions), so ties are found exactly.
+
+    Args:
+        question_ids: Ids of questions to rank, in bank order (breaks ties)
+        relevance_scores: Output from Relevance Agent
+        depth_scores: Output from Depth Agent
+        top_k: Size of the ranking
+
+    Returns:
+        TopKSchedule covering [0, 1]
+    """
+    relevance_by_id = {r["question_id"]: r.get("overall_relevance_score", 0) for r in relevance_scores}
+    depth_by_id = {d["question_id"]: d.get("overall_depth_score", 0) for d in depth_scores}
+    lines = [
+        (question_id, _score(relevance_by_id[question_id]), _score(depth_by_id[question_id]), order)
+        for order, question_id in enumerate(question_ids)
+        if question_id in relevance_by_id and question_id in depth_by_id
+    ]
+    # Float comparisons are exact, so only the survivors need Fractions
+    lines = [(q, Fraction(r), Fraction(d), order) for q, r, d, order in _candidates(lines, top_k)]
+    slopes = {line[0]: line[1] - line[2] for line in lines}
+    by_id = {line[0]: line for line in lines}
+
+    def ranking(weight: Fraction, after: bool) -> Tuple[Any, ...]:
+        # Just after a weight, lines tied there are ordered by slope
+        ordered = sorted(lines, key=lambda l: (-(l[2] + weight * slopes[l[0]]),
+                                               -slopes[l[0]] if after else 0, l[3]))
+        return tuple(l[0] for l in ordered[:top_k])
+
+    def crossing(upper, lower, weight: Fraction) -> Optional[Fraction]:
+        # Where `lower` overtakes `upper`, if after `weight`
+        rise = slopes[lower] - slopes[upper]
+        if rise <= 0:
+            return None
+        point = (by_id[upper][2] - by_id[lower][2]) / rise
+        return point if point > weight else None
+
+    weight = Fraction(0)
+    points, at_points, between = [weight], [ranking(weight, False)], []
+    current = ranking(weight, True)
+    while True:
+        events = [crossing(a, b, weight) for a, b in zip(current, current[1:])]
+        if len(current) == top_k:
+            inside = set(current)
+            events += [crossing(current[-1], q, weight) for q in by_id if q not in inside]
+        events = [e for e in events if e is not None and e < 1]
+        if not events:
+            break
+        weight = min(events)
+        at, after = ranking(weight, False), ranking(weight, True)
+        if at != current or after != current:
+            between.append(current)
+            points.append(weight)
+            at_points.append(at)
+            current = after
+
+    between.append(current)
+    points.append(Fraction(1))
+    at_points.append(ranking(Fraction(1), False))
+    logger.info(f"TOP {top_k} schedule: {len(points) - 2} breakpoints from {len(lines)} candidate questions")
+    return TopKSchedule(top_k, points, at_points, between, len(lines))
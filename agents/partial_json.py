@@ -0,0 +1,150 @@
+import json
+import re
+from typing import Any, List, Optional
+
+_STRING_STOP = re.compile(r'["\\]')
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object while its text is still arriving.
+
+    `value` is the object read so far. Strings appear as soon as they open
+    and grow as more text arrives, while numbers, booleans and nulls appear
+    once they are complete. Objects and arrays appear as soon as they open.
+    Each character is looked at once, so feeding a whole response costs
+    the same however it is split into chunks. Text before the first "{"
+    (such as a preamble from the model) and after the object closes is
+    ignored; `text` keeps everything fed, for a final strict parse.
+    """
+
+    def __init__(self):
+        self.value: Any = None
+        self.done = False
+        self.text = ""
+        self._stack: List[Any] = []
+        # Per open object: the key whose value comes next (None while reading a key)
+        self._keys: List[Optional[str]] = []
+        self._string: Optional[str] = None
+        self._string_is_key = False
+        self._escape: Optional[str] = None
+        self._literal = ""
+        self._slot = None
+
+    def _attach(self, value: Any):
+        if not self._stack:
+            self.value = value
+            return
+        container = self._stack[-1]
+        if isinstance(container, dict):
+            container[self._keys[-1]] = value
+            self._slot = (container, self._keys[-1])
+        else:
+            container.append(value)
+            self._slot = (container, len(container) - 1)
+
+    def _flush_literal(self) -> bool:
+        literal, self._literal = self._literal, ""
+        if not literal:
+            return False
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            return False
+        self._attach(value)
+        return True
+
+    def _open(self, container):
+        self._attach(container)
+        self._stack.append(container)
+        self._keys.append(None)
+
+    def _close(self):
+        self._stack.pop()
+        self._keys.pop()
+        if not self._stack:
+            self.done = True
+
+    def _end_string(self):
+        string, self._string = self._string, None
+        if self._string_is_key:
+            self._keys[-1] = string
+        else:
+            container, key = self._slot
+            container[key] = string
+
+    def feed(self, text: str) -> bool:
+        """
+        Read the next chunk of the response.
+
+        Returns:
+            True if `value` changed
+        """
+        self.text += text
+        changed = False
+        i, n = 0, len(text)
+        while i < n and not self.done:
+            if self._string is not None:
+                if self._escape is not None:
+                    self._escape += text[i]
+                    i += 1
+                    if len(self._escape) == 6 or (len(self._escape) == 2 and self._escape[1] != "u"):
+                        try:
+                            self._string += json.loads(f'"{self._escape}"')
+                        except ValueError:
+                            pass
+                        # The second half of a \u surrogate pair joins the first
+                        if len(self._string) >= 2 and "\udc00" <= self._string[-1] <= "\udfff" \
+                                and "\ud800" <= self._string[-2] <= "\udbff":
+                            pair = self._string[-2:].encode("utf-16", "surrogatepass").decode("utf-16")
+                            self._string = self._string[:-2] + pair
+                        self._escape = None
+                    continue
+                match = _STRING_STOP.search(text, i)
+                end = n if match is None else match.start()
+                if end > i:
+                    self._string += text[i:end]
+                    changed = changed or not self._string_is_key
+                if match is None:
+                    break
+                if text[end] == "\\":
+                    self._escape = "\\"
+                else:
+                    self._end_string()
+                    changed = True
+                i = end + 1
+                continue
+
+            char = text[i]
+            i += 1
+            if not self._stack:
+                if char == "{":
+                    self._open({})
+                    changed = True
+                continue
+            if char in _WHITESPACE or char in ",:}]":
+                changed = self._flush_literal() or changed
+                if char == "," and isinstance(self._stack[-1], dict):
+                    self._keys[-1] = None
+                elif char in "}]":
+                    self._close()
+            elif char == "{":
+                self._open({})
+                changed = True
+            elif char == "[":
+                self._open([])
+                changed = True
+            elif char == '"':
+                self._string = ""
+                self._string_is_key = isinstance(self._stack[-1], dict) and self._keys[-1] is None
+                if not self._string_is_key:
+                    self._attach("")
+                    changed = True
+            else:
+                self._literal += char
+
+        if self._string is not None and not self._string_is_key:
+            container, key = self._slot
+            container[key] = self._string
+        return changed
@@ -0,0 +1,229 @@
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from .records import RELEVANCE_CRITERIA, DEPTH_CRITERIA, _score
+
+logger = logging.getLogger(__name__)
+
+# Columns of the bank matrix: the two overall scores, then every criterion
+COLUMNS = ("overall_relevance_score", "overall_depth_score") + RELEVANCE_CRITERIA + DEPTH_CRITERIA
+
+# Memory for one block of student x question scores (float64)
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Relative distance within which BLAS scores are treated as possible ties
+SLACK = 1e-9
+
+
+def _exact(weights, values):
+    """
+    Row-wise dot products summed column by column: equal questions always
+    get bit-identical scores, which BLAS does not guarantee, and the
+    two-weight case matches the app's formula.
+    """
+    scores = weights[:, 0] * values[:, 0]
+    for column in range(1, values.shape[1]):
+        scores += weights[:, column] * values[:, column]
+    return scores
+
+
+def _top_k_rows(weights, matrix, top_k: int):
+    """
+    Each student's K best questions in `matrix`, as (positions, scores).
+
+    BLAS scores the block and a partial selection finds each row's K best.
+    Those, plus any other question within rounding distance of the K-th
+    (a possible tie), are rescored exactly and sorted: best score first,
+    then lower position, as in the app's stable sort.
+    """
+    import numpy as np
+
+    approx = weights @ matrix.T
+    n = approx.shape[1]
+    rows = np.repeat(np.arange(len(weights)), top_k)
+    cols = np.argpartition(approx, n - top_k, axis=1)[:, n - top_k:].reshape(-1)
+    kth = approx[rows, cols].reshape(len(weights), top_k).min(axis=1, keepdims=True)
+    near = approx >= kth - SLACK * np.maximum(1.0, np.abs(kth))
+    tied = np.flatnonzero(near.sum(axis=1) > top_k)
+    if len(tied):
+        tied_rows, tied_cols = np.nonzero(near[tied])
+        keep = ~np.isin(rows, tied)
+        rows = np.concatenate([rows[keep], tied[tied_rows]])
+        cols = np.concatenate([cols[keep], tied_cols])
+
+    exact = _exact(weights[rows], matrix[cols])
+    order = np.lexsort((cols, -exact, rows))
+    rows, cols, exact = rows[order], cols[order], exact[order]
+    keep = np.arange(len(rows)) - np.searchsorted(rows, rows) < top_k
+    shape = (len(weights), top_k)
+    return cols[keep].reshape(shape), exact[keep].reshape(shape)
+
+
+class ScoredBank:
+    """
+    A scored question bank as a matrix, for ranking it under many weights.
+
+    Each student's composite scores are one row of W X^T, where W holds
+    the students' weight vectors and X the bank. Rows are produced in
+    blocks of students and questions small enough for MAX_BLOCK_BYTES. Only
+    the running TOP K per student is kept between question blocks, so memory
+    does not grow with the bank or the number of students. Ties go to the
+    question listed first, as in the app's ranking.
+    """
+
+    def __init__(self, question_ids: List[Any], relevance_scores: List[Dict[str, Any]],
+                 depth_scores: List[Dict[str, Any]]):
+        """
+        Args:
+            question_ids: Ids of questions to rank, in bank order (breaks ties)
+            relevance_scores: Output from Relevance Agent
+            depth_scores: Output from Depth Agent
+        """
+        import numpy as np
+
+        relevance_by_id = {r["question_id"]: r for r in relevance_scores}
+        depth_by_id = {d["question_id"]: d for d in depth_scores}
+        self.question_ids = [q for q in question_ids if q in relevance_by_id and q in depth_by_id]
+        rows = []
+        for question_id in self.question_ids:
+            relevance, depth = relevance_by_id[question_id], depth_by_id[question_id]
+            rows.append(
+                [_score(relevance.get("overall_relevance_score", 0)), _score(depth.get("overall_depth_score", 0))]
+                + [_score(relevance.get(c, 0)) for c in RELEVANCE_CRITERIA]
+                + [_score(depth.get(c, 0)) for c in DEPTH_CRITERIA]
+            )
+        self.matrix = np.array(rows, dtype=np.float64).reshape(len(rows), len(COLUMNS))
+
+    @staticmethod
+    def weight_matrix(weights):
+        """
+        Students' weights as rows over COLUMNS.
+
+        Accepts one importance weight per student (depth gets the rest), a
+        [relevance, depth] pair per student, or one weight per criterion
+        (the five relevance criteria, then the five depth criteria).
+        """
+        import numpy as np
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim == 1:
+            weights = np.stack([weights, 1.0 - weights], axis=1)
+        columns = np.zeros((len(weights), len(COLUMNS)))
+        if weights.shape[1] == 2:
+            columns[:, :2] = weights
+        elif weights.shape[1] == len(COLUMNS) - 2:
+            columns[:, 2:] = weights
+        else:
+            raise ValueError(f"Expected 1, 2 or {len(COLUMNS) - 2} weights per student, got {weights.shape[1]}")
+        return columns
+
+    def _reduced(self, columns, top_k: int):
+        """
+        Bank restricted to the weighted columns, keeping only the first K
+        questions of each group with identical scores there: later copies
+        always lose the tie. Returns (matrix, bank positions), in bank order.
+        """
+        import numpy as np
+
+        matrix = self.matrix[:, columns]
+        _, group = np.unique(matrix, axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        order = np.lexsort((np.arange(len(group)), group))
+        starts = np.searchsorted(group[order], group[order])
+        keep = np.sort(order[np.arange(len(order)) - starts < top_k])
+        return matrix[keep], keep
+
+    def top_k(self, weights, top_k: int = 3, max_block_bytes: int = MAX_BLOCK_BYTES) -> Tuple[Any, Any]:
+        """
+        Each student's TOP K questions.
+
+        Students are processed in blocks of similar weights. With
+        non-negative weights, a block first scores a small pilot set (the
+        best K questions on each column) to get a lower bound on every
+        student's K-th best score, and skips the questions whose best
+        possible score for the block is below it. The rest are scored in
+        question blocks of at most max_block_bytes.
+
+        Args:
+            weights: Per-student weights (see weight_matrix)
+            top_k: Questions per student
+            max_block_bytes: Memory for one block of composite scores
+
+        Returns:
+            (ids, scores): students x K arrays of question ids and composite
+            scores, best first
+        """
+        import numpy as np
+
+        students = self.weight_matrix(weights)
+        n_students = len(students)
+        columns = np.flatnonzero(np.any(students != 0, axis=0))
+        matrix, positions = self._reduced(columns, top_k)
+        students = students[:, columns]
+        top_k = min(top_k, len(matrix))
+        ids = np.asarray(self.question_ids)
+        if top_k == 0 or len(columns) == 0:
+            return ids[:0].reshape(n_students, 0), np.zeros((n_students, 0))
+
+        prune = bool((students >= 0).all() and (matrix >= 0).all())
+        pilot = np.unique(np.argsort(-matrix, axis=0, kind="stable")[:top_k].reshape(-1))
+        cells = max(max_block_bytes // 8, top_k)
+        student_block = max(1, min(n_students, 256, cells // top_k))
+
+        best_index = np.empty((n_students, top_k), dtype=np.int64)
+        best_score = np.empty((n_students, top_k))
+        scored = blocks = 0
+        by_weights = np.lexsort(students.T[::-1])
+        for s in range(0, n_students, student_block):
+            rows = by_weights[s:s + student_block]
+            w = students[rows]
+            candidates = np.arange(len(matrix))
+            if prune:
+                pilot_scores = w @ matrix[pilot].T
+                floor = np.partition(pilot_scores, len(pilot) - top_k, axis=1)[:, len(pilot) - top_k].min()
+                candidates = np.flatnonzero(matrix @ w.max(axis=0) >= floor - SLACK * max(1.0, abs(floor)))
+            scored += len(candidates)
+            blocks += 1
+
+            question_block = max(top_k, cells // len(w))
+            index = score = None
+            for q in range(0, len(candidates), question_block):
+                chunk = candidates[q:q + question_block]
+                local, local_score = _top_k_rows(w, matrix[chunk], min(top_k, len(chunk)))
+                if index is None:
+                    index, score = chunk[local], local_score
+                    continue
+                # Merge with the running TOP K; best score first, then bank order
+                index = np.concatenate([index, chunk[local]], axis=1)
+                score = np.concatenate([score, local_score], axis=1)
+                order = np.lexsort((index, -score), axis=1)[:, :top_k]
+                index = np.take_along_axis(index, order, axis=1)
+                score = np.take_along_axis(score, order, axis=1)
+            order = np.lexsort((index, -score), axis=1)
+            best_index[rows] = np.take_along_axis(index, order, axis=1)
+            best_score[rows] = np.take_along_axis(score, order, axis=1)
+
+        logger.info(f"Ranked {len(self.matrix)} questions for {n_students} students; "
+                    f"{len(matrix)} kept after merging ties, {scored / blocks:.0f} scored per student block")
+        return ids[positions[best_index]], best_score
+
+
+def personalized_top_k(question_ids: List[Any], relevance_scores: List[Dict[str, Any]],
+                       depth_scores: List[Dict[str, Any]], weights, top_k: int = 3,
+                       max_block_bytes: Optional[int] = None) -> Tuple[Any, Any]:
+    """
+    TOP K of one scored bank for every student's weights.
+
+    Args:
+        question_ids: Ids of questions to rank, in bank order (breaks ties)
+        relevance_scores: Output from Relevance Agent
+        depth_scores: Output from Depth Agent
+        weights: Per-student weights (see ScoredBank.weight_matrix)
+        top_k: Questions per student
+        max_block_bytes: Memory for one block of composite scores
+
+    Returns:
+        (ids, scores): students x K arrays, best first
+    """
+    bank = ScoredBank(question_ids, relevance_scores, depth_scores)
+    return bank.top_k(weights, top_k, max_block_bytes or MAX_BLOCK_BYTES)
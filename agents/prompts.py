@@ -0,0 +1,282 @@
+import hashlib
+import json
+import threading
+from typing import Dict, List, Any, Tuple
+
+# Keys added by the pipeline rather than the Reader Agent; left out of
+# prompts so they do not change the text sent to the model
+_PIPELINE_KEYS = ("agent", "hedged", "degraded", "note", "metadata", "original_question")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def token_usage(messages: List[Any], response: Any) -> tuple:
+    """(input_tokens, output_tokens) from the response, or estimated from text length."""
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict) and "input_tokens" in usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage")
+    if isinstance(usage, dict) and "prompt_tokens" in usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    prompt_chars = sum(len(str(getattr(m, "content", ""))) for m in messages)
+    return prompt_chars // 4, len(str(getattr(response, "content", ""))) // 4
+
+
+def _cached_prompt_tokens(response: Any) -> int:
+    """Prompt tokens the provider served from its prefix cache, if reported."""
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens")
+    if cached is None:
+        details = (getattr(response, "usage_metadata", None) or {}).get("input_token_details") or {}
+        cached = details.get("cache_read")
+    return int(cached or 0)
+
+
+class PromptTemplate:
+    """
+    Versioned agent prompt split into a static prefix and a per-call suffix.
+
+    The instructions and the JSON schema go in the system message, and this
+    text is identical for every call. The question data is rendered into the
+    user message, which always comes last. Providers that cache on prompt
+    prefixes can then reuse the whole instruction block. `key` (name and
+    version) is part of the service's result-cache key, so changing a
+    template invalidates earlier results.
+    """
+
+    def __init__(self, name: str, version: int, system: str, suffix: str):
+        self.name = name
+        self.version = version
+        self.system = system.strip()
+        self.suffix = suffix.strip()
+        self.key = f"{name}@v{version}"
+        self.fingerprint = hashlib.sha1(self.system.encode("utf-8")).hexdigest()[:12]
+        self.prefix_tokens = estimate_tokens(self.system)
+        self.stats = {"calls": 0, "prefix_tokens": 0, "variable_tokens": 0,
+                      "cached_tokens": 0, "prefix_hits": 0}
+        self._lock = threading.Lock()
+
+    def render(self, **values: Any) -> Tuple[str, str]:
+        """Return (system, user) text for one call."""
+        return self.system, self.suffix.format(**values)
+
+    def record(self, user: str, response: Any):
+        """Count one call; a prefix hit is a call the provider partly served from cache."""
+        cached = _cached_prompt_tokens(response)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prefix_tokens"] += self.prefix_tokens
+            self.stats["variable_tokens"] += estimate_tokens(user)
+            self.stats["cached_tokens"] += cached
+            self.stats["prefix_hits"] += 1 if cached else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        calls = stats["calls"]
+        stats["version"] = self.key
+        stats["fingerprint"] = self.fingerprint
+        stats["prefix_share"] = round(stats["prefix_tokens"] / max(stats["prefix_tokens"] + stats["variable_tokens"], 1), 3)
+        stats["prefix_hit_rate"] = round(stats["prefix_hits"] / calls, 3) if calls else None
+        return stats
+
+
+def analysis_payload(question_analysis: Dict[str, Any]) -> str:
+    """Reader output as compact, key-sorted JSON so equal analyses render identically."""
+    content = {k: v for k, v in question_analysis.items() if k not in _PIPELINE_KEYS}
+    return json.dumps(content, sort_keys=True, ensure_ascii=False)
+
+
+READER = PromptTemplate("reader", 2, """
+You are a Reader Agent specialized in analyzing JEE (Joint Entrance Examination) physics questions. Your task is to parse and extract detailed information from each question.
+
+For the given question, identify and extract:
+1. Main physics topic/concept
+2. Sub-topics or related concepts
+3. Bloom's taxonomy level (Remember, Understand, Apply, Analyze, Evaluate, Create)
+4. Question type (numerical, conceptual, derivation, etc.)
+5. Difficulty level (Easy, Medium, Hard)
+6. Key physics principles involved
+
+Provide your analysis in the following JSON format:
+{
+  "main_topic": "string",
+  "sub_topics": ["list", "of", "subtopics"],
+  "bloom_level": "string",
+  "question_type": "string",
+  "difficulty": "string",
+  "key_principles": ["list", "of", "principles"],
+  "complexity_score": number_1_to_10
+}
+
+Respond with only the JSON, no additional text.
+""", """
+Question: {question_text}
+""")
+
+READER_FILL = PromptTemplate("reader_fill", 1, """
+You are a Reader Agent specialized in analyzing JEE (Joint Entrance Examination) physics questions. The question's topic, tags and Bloom's level are curated and correct; only classify the fields listed in the user message.
+
+Allowed values:
+- question_type: numerical, conceptual, derivation, etc.
+- difficulty: Easy, Medium, Hard
+- complexity_score: number_1_to_10
+
+Respond with only a JSON object containing exactly the requested fields, no additional text.
+""", """
+Fields: {fields}
+Topic: {topic} | Tags: {tags} | Bloom level: {bloom_level}
+Question: {question_text}
+""")
+
+RELEVANCE = PromptTemplate("relevance", 2, """
+You are a Relevance Agent that evaluates the importance and utility of JEE physics questions for exam preparation and conceptual understanding.
+
+Evaluate the question in the user message based on:
+1. Frequency of appearance in JEE exams (how often similar questions appear)
+2. Conceptual importance (fundamental physics concepts)
+3. Application relevance (real-world applications)
+4. Foundation building (prerequisite for other topics)
+5. Problem-solving skills development
+
+Rate each criterion on a scale of 1-10 and provide justification:
+
+{
+  "exam_frequency": {"score": number_1_to_10, "justification": "explanation"},
+  "conceptual_importance": {"score": number_1_to_10, "justification": "explanation"},
+  "application_relevance": {"score": number_1_to_10, "justification": "explanation"},
+  "foundation_building": {"score": number_1_to_10, "justification": "explanation"},
+  "skill_development": {"score": number_1_to_10, "justification": "explanation"},
+  "overall_relevance_score": number_1_to_10,
+  "summary": "brief explanation of overall relevance"
+}
+
+Respond with only the JSON, no additional text.
+""", """
+Question Analysis: {analysis}
+Question Text: {question_text}
+""")
+
+DEPTH = PromptTemplate("depth", 2, """
+You are a Depth Agent that evaluates the cognitive depth and reasoning complexity required for JEE physics questions.
+
+Analyze the question in the user message for:
+1. Number of concepts that need to be integrated
+2. Mathematical complexity required
+3. Multi-step reasoning requirement
+4. Abstract thinking level
+5. Problem-solving strategy sophistication
+
+Evaluate each aspect on a scale of 1-10:
+
+{
+  "concept_integration": {"score": number_1_to_10, "explanation": "how many concepts need to be combined"},
+  "mathematical_complexity": {"score": number_1_to_10, "explanation": "level of mathematical skills required"},
+  "reasoning_steps": {"score": number_1_to_10, "explanation": "number and complexity of logical steps"},
+  "abstract_thinking": {"score": number_1_to_10, "explanation": "level of abstract conceptual understanding needed"},
+  "strategy_sophistication": {"score": number_1_to_10, "explanation": "sophistication of problem-solving approach"},
+  "overall_depth_score": number_1_to_10,
+  "depth_summary": "explanation of cognitive demands"
+}
+
+Respond with only the JSON, no additional text.
+""", """
+Question Analysis: {analysis}
+Question Text: {question_text}
+""")
+
+RELEVANCE_TERSE = PromptTemplate("relevance_terse", 1, """
+You are a Relevance Agent that evaluates the importance and utility of JEE physics questions for exam preparation and conceptual understanding.
+
+Rate the question in the user message from 1 to 10 on:
+- exam_frequency: how often similar questions appear in JEE exams
+- conceptual_importance: how fundamental the physics concepts are
+- application_relevance: real-world applications
+- foundation_building: prerequisite for other topics
+- skill_development: problem-solving skills developed
+
+Respond with only this JSON, scores only, no justifications:
+{"exam_frequency": n, "conceptual_importance": n, "application_relevance": n, "foundation_building": n, "skill_development": n, "overall_relevance_score": n}
+""", """
+Question Analysis: {analysis}
+Question Text: {question_text}
+""")
+
+RELEVANCE_EXPLAIN = PromptTemplate("relevance_explain", 1, """
+You are a Relevance Agent that evaluates the importance and utility of JEE physics questions for exam preparation and conceptual understanding.
+
+The question in the user message has already been scored from 1 to 10 on exam_frequency, conceptual_importance, application_relevance, foundation_building and skill_development. Do not change the scores; explain each one in one or two sentences.
+
+Respond with only this JSON, no additional text:
+{"exam_frequency": "justification", "conceptual_importance": "justification", "application_relevance": "justification", "foundation_building": "justification", "skill_development": "justification", "summary": "brief explanation of overall relevance"}
+""", """
+Scores: {scores}
+Question Analysis: {analysis}
+Question Text: {question_text}
+""")
+
+DEPTH_TERSE = PromptTemplate("depth_terse", 1, """
+You are a Depth Agent that evaluates the cognitive depth and reasoning complexity required for JEE physics questions.
+
+Rate the question in the user message from 1 to 10 on:
+- concept_integration: how many concepts need to be combined
+- mathematical_complexity: level of mathematical skills required
+- reasoning_steps: number and complexity of logical steps
+- abstract_thinking: level of abstract conceptual understanding needed
+- strategy_sophistication: sophistication of problem-solving approach
+
+Respond with only this JSON, scores only, no explanations:
+{"concept_integration": n, "mathematical_complexity": n, "reasoning_steps": n, "abstract_thinking": n, "strategy_sophistication": n, "overall_depth_score": n}
+""", """
+Question Analysis: {analysis}
+Question Text: {question_text}
+""")
+
+DEPTH_EXPLAIN = PromptTemplate("depth_explain", 1, """
+You are a Depth Agent that evaluates the cognitive depth and reasoning complexity required for JEE physics questions.
+
+The question in the user message has already been scored from 1 to 10 on concept_integration, mathematical_complexity, reasoning_steps, abstract_thinking and strategy_sophistication. Do not change the scores; explain each one in one or two sentences.
+
+Respond with only this JSON, no additional text:
+{"concept_integration": "explanation", "mathematical_complexity": "explanation", "reasoning_steps": "explanation", "abstract_thinking": "explanation", "strategy_sophistication": "explanation", "depth_summary": "explanation of cognitive demands"}
+""", """
+Scores: {scores}
+Question Analysis: {analysis}
+Question Text: {question_text}
+""")
+
+JUDGE = PromptTemplate("judge", 2, """
+You are a Judge Agent for ranking JEE physics questions. Analyze and rank the TOP 3 JEE physics questions with detailed reasoning.
+
+Your task: Select the 3 most important questions for JEE exam preparation from the candidates in the user message.
+
+Instructions:
+1. Evaluate each question's importance for JEE Physics exam
+2. Consider relevance to JEE syllabus, depth of concepts, and exam frequency
+3. Provide detailed reasoning for WHY each question earned its rank
+4. Explain how the scores and analysis weights influenced your decision
+
+Return JSON with detailed explanations:
+{"top_3_questions": [{"rank": 1, "question_id": X, "question_text": "full text", "final_score": X.X, "relevance_contribution": X.X, "depth_contribution": X.X, "selection_reasoning": "Detailed explanation: Why this question is #1 - mention specific concepts, relevance to JEE pattern, difficulty appropriateness, and learning value (3-4 sentences)"}, {"rank": 2, "question_id": Y, "selection_reasoning": "Detailed explanation for rank #2 (3-4 sentences)"}, {"rank": 3, "question_id": Z, "selection_reasoning": "Detailed explanation for rank #3 (3-4 sentences)"}], "overall_analysis": "Summary of ranking methodology and key factors", "methodology": "How weights and scores determined final ranking"}
+""", """
+Analysis Weights: Relevance {relevance_pct}% | Depth {depth_pct}%
+
+Candidate Questions:
+{candidates}
+""")
+
+TEMPLATES: Dict[str, PromptTemplate] = {t.name: t for t in (
+    READER, READER_FILL, RELEVANCE, RELEVANCE_TERSE, RELEVANCE_EXPLAIN,
+    DEPTH, DEPTH_TERSE, DEPTH_EXPLAIN, JUDGE
+)}
+
+
+def template_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-template call, token and prefix-cache statistics."""
+    return {name: template.get_stats() for name, template in TEMPLATES.items()}
+
@@ -0,0 +1,233 @@
+import json
+import mmap
+import struct
+import sys
+from typing import Dict, List, Any, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File layout (all integers little-endian):
+#
+#   header   MAGIC, version, record count, hash table size,
+#            offsets of the string table, index and hash table
+#   records  compact UTF-8 JSON, one question after another
+#   strings  JSON object {"topics": [...], "bloom_levels": [...]}
+#   index    one INDEX_ENTRY per record, in original order
+#   hash     open-addressing table of record numbers keyed by question id
+MAGIC = b"JQBANK"
+VERSION = 1
+HEADER = struct.Struct("<6sHIIQQQ")
+INDEX_ENTRY = struct.Struct("<qQIHH")
+HASH_SLOT = struct.Struct("<i")
+EMPTY_SLOT = -1
+
+
+def _slot(question_id: int, mask: int) -> int:
+    """Fibonacci hash of a question id into the hash table."""
+    return ((question_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32 & mask
+
+
+def write_bank(questions: List[Dict[str, Any]], path: str) -> int:
+    """
+    Write questions to the binary bank format.
+
+    Args:
+        questions: List of question dictionaries with integer "id"
+        path: Output file path
+
+    Returns:
+        Number of questions written
+    """
+    topics: Dict[str, int] = {}
+    bloom_levels: Dict[str, int] = {}
+    seen_ids = set()
+
+    table_size = 1
+    while table_size < max(2 * len(questions), 8):
+        table_size <<= 1
+    mask = table_size - 1
+    table = [EMPTY_SLOT] * table_size
+
+    entries = []
+    with open(path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+
+        for number, question in enumerate(questions):
+            question_id = question["id"]
+            if not isinstance(question_id, int):
+                raise ValueError(f"Question {number + 1}: 'id' should be a number.")
+            if question_id in seen_ids:
+                raise ValueError(f"Duplicate question id: {question_id}")
+            seen_ids.add(question_id)
+
+            topic = topics.setdefault(question.get("topic", ""), len(topics))
+            bloom = bloom_levels.setdefault(question.get("bloom_level", ""), len(bloom_levels))
+
+            payload = json.dumps(question, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            entries.append(INDEX_ENTRY.pack(question_id, f.tell(), len(payload), topic, bloom))
+            f.write(payload)
+
+            slot = _slot(question_id, mask)
+            while table[slot] != EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            table[slot] = number
+
+        strings_offset = f.tell()
+        f.write(json.dumps({
+            "topics": list(topics),
+            "bloom_levels": list(bloom_levels),
+        }, ensure_ascii=False).encode("utf-8"))
+
+        index_offset = f.tell()
+        f.write(b"".join(entries))
+
+        hash_offset = f.tell()
+        f.write(struct.pack(f"<{table_size}i", *table))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(questions), table_size,
+                            strings_offset, index_offset, hash_offset))
+
+    logger.info(f"Wrote {len(questions)} questions to bank {path}")
+    return len(questions)
+
+
+def convert_json_to_bank(json_path: str, bank_path: str) -> int:
+    """Convert a question file in the existing JSON format to a bank file."""
+    with open(json_path, "r") as f:
+        questions = json.load(f)
+    return write_bank(questions, bank_path)
+
+
+class QuestionBank:
+    """
+    Read-only, memory-mapped question bank.
+
+    Opening a bank only reads the header and the small topic/bloom string
+    table; questions are decoded on access. Lookup by id goes through an
+    on-disk hash table, and topic/bloom filters scan the fixed-width index
+    without decoding question JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self._count, self._table_size,
+         strings_offset, self._index_offset, self._hash_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a question bank file")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported question bank version: {version}")
+
+        strings = json.loads(self._mm[strings_offset:self._index_offset].decode("utf-8"))
+        self.topics: List[str] = [sys.intern(t) for t in strings["topics"]]
+        self.bloom_levels: List[str] = [sys.intern(b) for b in strings["bloom_levels"]]
+        self._mask = self._table_size - 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, question_id: int) -> bool:
+        return self._find(question_id) is not None
+
+    def __getitem__(self, question_id: int) -> Dict[str, Any]:
+        question = self.get(question_id)
+        if question is None:
+            raise KeyError(question_id)
+        return question
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_questions()
+
+    def _entry(self, number: int):
+        return INDEX_ENTRY.unpack_from(self._mm, self._index_offset + number * INDEX_ENTRY.size)
+
+    def _find(self, question_id: int):
+        if not isinstance(question_id, int):
+            # Ids are ints; hashing anything else would raise or repeat a string
+            return None
+        slot = _slot(question_id, self._mask)
+        while True:
+            (number,) = HASH_SLOT.unpack_from(self._mm, self._hash_offset + slot * HASH_SLOT.size)
+            if number == EMPTY_SLOT:
+                return None
+            entry = self._entry(number)
+            if entry[0] == question_id:
+                return entry
+            slot = (slot + 1) & self._mask
+
+    def _decode(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(self._mm[offset:offset + length].decode("utf-8"))
+
+    def get(self, question_id: int) -> Optional[Dict[str, Any]]:
+        """Return the question with this id, or None if it is not in the bank."""
+        entry = self._find(question_id)
+        if entry is None:
+            return None
+        return self._decode(entry[1], entry[2])
+
+    def get_many(self, question_ids: List[int]) -> List[Dict[str, Any]]:
+        """Return questions for the given ids, skipping unknown ids."""
+        questions = []
+        for question_id in question_ids:
+            question = self.get(question_id)
+            if question is not None:
+                questions.append(question)
+        return questions
+
+    def ids(self) -> List[int]:
+        """All question ids in original order."""
+        return [entry[0] for entry in self._iter_entries()]
+
+    def _iter_entries(self):
+        end = self._index_offset + self._count * INDEX_ENTRY.size
+        return INDEX_ENTRY.iter_unpack(self._mm[self._index_offset:end])
+
+    def iter_questions(self, topic: Optional[str] = None,
+                       bloom_level: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate questions in original order, optionally filtered.
+
+        Args:
+            topic: Only yield questions with this topic
+            bloom_level: Only yield questions with this Bloom level
+
+        Returns:
+            Iterator of question dictionaries
+        """
+        topic_index = self.topics.index(topic) if topic in self.topics else None
+        bloom_index = self.bloom_levels.index(bloom_level) if bloom_level in self.bloom_levels else None
+        if (topic is not None and topic_index is None) or (bloom_level is not None and bloom_index is None):
+            return
+
+        for _, offset, length, entry_topic, entry_bloom in self._iter_entries():
+            if topic_index is not None and entry_topic != topic_index:
+                continue
+            if bloom_index is not None and entry_bloom != bloom_index:
+                continue
+            yield self._decode(offset, length)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m agents.question_bank <questions.json> <bank.jqb>")
+        sys.exit(1)
+    count = convert_json_to_bank(sys.argv[1], sys.argv[2])
+    print(f"Converted {count} questions to {sys.argv[2]}")
@@ -1,21 +1,47 @@
 import json
 import re
-from typing import Dict, List, Any
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
-from langchain_groq import ChatGroq
+from typing import Dict, List, Any, TYPE_CHECKING
+from .prompts import READER as READER_PROMPT, READER_FILL as READER_FILL_PROMPT
+from .rule_reader import RuleBasedReader
 import logging
 
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Curated fields that trusted-metadata mode takes from the question as-is
+TRUSTED_FIELDS = ("topic", "tags", "bloom_level")
+
+# Fields the Reader still has to fill in when they are not in the question
+FILL_FIELDS = ("question_type", "difficulty", "complexity_score")
+
 class ReaderAgent:
     """
     Reader Agent: Parses and analyzes JEE questions to extract topic information,
     Bloom's taxonomy level, and complexity metrics.
     """
     
-    def __init__(self, llm: ChatGroq):
+    def __init__(self, llm: "ChatGroq", trust_metadata: bool = False, fill_llm=None,
+                 backend: str = "llm"):
+        """
+        Args:
+            llm: Chat model for full analyses
+            trust_metadata: Take topic, tags and bloom_level from the question
+                instead of asking the LLM; only missing fields are filled in
+            fill_llm: Cheaper chat model for filling the missing fields
+                (defaults to llm)
+            backend: "llm", or "rules" to analyze questions with the local
+                rule-based analyzer and never call the LLM
+        """
+        if backend not in ("llm", "rules"):
+            raise ValueError(f"Unknown Reader backend: {backend}")
         self.llm = llm
+        self.fill_llm = fill_llm or llm
+        self.trust_metadata = trust_metadata
+        self.backend = backend
+        self.rules = RuleBasedReader()
         self.name = "Reader Agent"
         
     def analyze_question(self, question: Dict[str, Any]) -> Dict[str, Any]:
@@ -28,20 +54,39 @@ class ReaderAgent:
         Returns:
             Dictionary with analysis results
         """
+        if self.trust_metadata and all(question.get(f) for f in TRUSTED_FIELDS):
+            return self._analyze_trusted(question)
+        
+        if self.backend == "rules":
+            analysis = self.rules.analyze_text(question["question_text"])
+            analysis.update(original_question=question, agent=self.name, metadata="rules",
+                            hedged=False, degraded=False)
+            return analysis
+        
         try:
-            prompt = self._create_analysis_prompt(question["question_text"])
+            system, prompt = READER_PROMPT.render(question_text=question["question_text"])
+            
+            from langchain.schema import HumanMessage, SystemMessage
             
             messages = [
-                SystemMessage(content="You are a Reader Agent specialized in analyzing JEE physics questions."),
+                SystemMessage(content=system),
                 HumanMessage(content=prompt)
             ]
             
             response = self.llm.invoke(messages)
+            READER_PROMPT.record(prompt, response)
             analysis = self._parse_response(response.content)
+            unreadable = not analysis
+            # Model values are normalized first; rule values only replace what is still unusable
+            fixed = self.rules.repair(analysis, question["question_text"])
             
             # Add original question data
             analysis["original_question"] = question
             analysis["agent"] = self.name
+            analysis["hedged"] = bool(getattr(response, "response_metadata", {}).get("hedged"))
+            analysis["degraded"] = unreadable
+            if fixed:
+                analysis["note"] = f"Rule-based values used for {', '.join(fixed)}"
             
             logger.info(f"Reader Agent analyzed question {question['id']}")
             return analysis
@@ -50,6 +95,66 @@ class ReaderAgent:
             logger.error(f"Error in Reader Agent analysis: {str(e)}")
             return self._fallback_analysis(question)
     
+    def _analyze_trusted(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the analysis from curated metadata. The LLM is asked only for
+        the fields the question does not carry, with a much shorter prompt,
+        and is skipped entirely when nothing is missing or the backend is
+        "rules". Rule-based values stand in for anything the LLM leaves out.
+        """
+        analysis = {
+            "main_topic": question["topic"],
+            "sub_topics": list(question["tags"]),
+            "bloom_level": question["bloom_level"],
+            "key_principles": list(question.get("key_principles", question["tags"])),
+            "original_question": question,
+            "agent": self.name,
+            "metadata": "trusted",
+            "hedged": False,
+            "degraded": False
+        }
+        missing = [f for f in FILL_FIELDS if question.get(f) in (None, "")]
+        for field in FILL_FIELDS:
+            if field not in missing:
+                analysis[field] = question[field]
+        if not missing:
+            return analysis
+        
+        defaults = self.rules.analyze_text(question["question_text"])
+        if self.backend == "rules":
+            for field in missing:
+                analysis[field] = defaults[field]
+            return analysis
+        
+        try:
+            system, prompt = READER_FILL_PROMPT.render(
+                fields=", ".join(missing),
+                topic=question["topic"],
+                tags=", ".join(question["tags"]),
+                bloom_level=question["bloom_level"],
+                question_text=question["question_text"]
+            )
+            
+            from langchain.schema import HumanMessage, SystemMessage
+            
+            response = self.fill_llm.invoke([SystemMessage(content=system), HumanMessage(content=prompt)])
+            READER_FILL_PROMPT.record(prompt, response)
+            filled = self._parse_response(response.content)
+            analysis["hedged"] = bool(getattr(response, "response_metadata", {}).get("hedged"))
+        except Exception as e:
+            logger.error(f"Error filling Reader fields for question {question['id']}: {str(e)}")
+            filled = {}
+            analysis["note"] = "Rule-based values used for missing fields"
+            analysis["degraded"] = True
+        
+        for field in missing:
+            analysis[field] = filled.get(field, defaults[field])
+        # Only the filled fields: curated values (e.g. bloom level "Applying") stay as given
+        self.rules.repair(analysis, question["question_text"], defaults, fields=missing)
+        
+        logger.info(f"Reader Agent filled {', '.join(missing)} for question {question['id']} from trusted metadata")
+        return analysis
+    
     def analyze_all_questions(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Analyze all questions in the dataset.
@@ -67,35 +172,6 @@ class ReaderAgent:
         
         return analyses
     
-    def _create_analysis_prompt(self, question_text: str) -> str:
-        """Create the prompt for question analysis."""
-        return f"""
-You are a Reader Agent specialized in analyzing JEE (Joint Entrance Examination) physics questions. Your task is to parse and extract detailed information from each question.
-
-For the given question, identify and extract:
-1. Main physics topic/concept
-2. Sub-topics or related concepts
-3. Bloom's taxonomy level (Remember, Understand, Apply, Analyze, Evaluate, Create)
-4. Question type (numerical, conceptual, derivation, etc.)
-5. Difficulty level (Easy, Medium, Hard)
-6. Key physics principles involved
-
-Question: {question_text}
-
-Provide your analysis in the following JSON format:
-{{
-  "main_topic": "string",
-  "sub_topics": ["list", "of", "subtopics"],
-  "bloom_level": "string",
-  "question_type": "string",
-  "difficulty": "string",
-  "key_principles": ["list", "of", "principles"],
-  "complexity_score": number_1_to_10
-}}
-
-Respond with only the JSON, no additional text.
-"""
-    
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """Parse the LLM response and extract JSON."""
         try:
@@ -108,31 +184,23 @@ Respond with only the JSON, no additional text.
                 raise ValueError("No JSON found in response")
         except Exception as e:
             logger.error(f"Error parsing response: {str(e)}")
-            return self._fallback_json()
+            # Left empty so the rule-based values fill every field
+            return {}
     
     def _fallback_analysis(self, question: Dict[str, Any]) -> Dict[str, Any]:
-        """Provide fallback analysis if LLM fails."""
+        """Provide fallback analysis if LLM fails, from the question's own metadata and the rules."""
+        analysis = self.rules.analyze_text(question.get("question_text", ""))
         return {
-            "main_topic": question.get("topic", "Unknown"),
-            "sub_topics": question.get("tags", []),
-            "bloom_level": question.get("bloom_level", "Apply"),
-            "question_type": "numerical",
-            "difficulty": "Medium",
-            "key_principles": question.get("tags", []),
-            "complexity_score": 5,
+            "main_topic": question.get("topic") or analysis["main_topic"],
+            "sub_topics": question.get("tags") or analysis["sub_topics"],
+            "bloom_level": question.get("bloom_level") or analysis["bloom_level"],
+            "question_type": analysis["question_type"],
+            "difficulty": analysis["difficulty"],
+            "key_principles": analysis["key_principles"],
+            "complexity_score": analysis["complexity_score"],
             "original_question": question,
             "agent": self.name,
-            "note": "Fallback analysis used"
-        }
-    
-    def _fallback_json(self) -> Dict[str, Any]:
-        """Provide fallback JSON structure."""
-        return {
-            "main_topic": "Physics",
-            "sub_topics": ["general"],
-            "bloom_level": "Apply",
-            "question_type": "numerical",
-            "difficulty": "Medium",
-            "key_principles": ["basic principles"],
-            "complexity_score": 5
+            "note": "Fallback analysis used",
+            "hedged": False,
+            "degraded": True
         }
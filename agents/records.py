@@ -0,0 +1,347 @@
+import sys
+from typing import Dict, List, Any, Optional, Tuple
+
+RELEVANCE_CRITERIA = (
+    "exam_frequency",
+    "conceptual_importance",
+    "application_relevance",
+    "foundation_building",
+    "skill_development",
+)
+
+DEPTH_CRITERIA = (
+    "concept_integration",
+    "mathematical_complexity",
+    "reasoning_steps",
+    "abstract_thinking",
+    "strategy_sophistication",
+)
+
+
+def _score(value: Any, default: float = 0) -> float:
+    """Read a numeric score, accepting either a bare number or {"score": n}."""
+    if isinstance(value, dict):
+        value = value.get("score", default)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _number(value: float) -> Any:
+    """Return ints as ints so the dict shape matches the LLM output."""
+    return int(value) if float(value).is_integer() else value
+
+
+class _Record:
+    """
+    Slotted form of an agent result dictionary that converts back to an
+    equal dictionary. Keys named in FIELDS are held in slots; anything else,
+    or a field whose value does not have the usual type, stays in `extra`.
+    """
+
+    __slots__ = ("extra",)
+
+    FIELDS: Tuple[str, ...] = ()
+    # Strings that repeat across a bank (topics, tags, labels) are interned
+    LABELS: Tuple[str, ...] = ()
+    # Lists of strings, held as interned tuples
+    LISTS: Tuple[str, ...] = ()
+
+    def _load(self, data: Dict[str, Any], skip: Tuple[str, ...] = ()):
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        extra = {}
+        for key, value in data.items():
+            if key in skip:
+                continue
+            if key not in self.FIELDS or value is None:
+                extra[key] = value
+            elif key in self.LISTS:
+                if isinstance(value, list) and all(isinstance(v, str) for v in value):
+                    setattr(self, key, tuple(sys.intern(v) for v in value))
+                else:
+                    extra[key] = value
+            elif key in self.LABELS and isinstance(value, str):
+                setattr(self, key, sys.intern(value))
+            else:
+                setattr(self, key, value)
+        self.extra = extra or None
+
+    def _dump(self) -> Dict[str, Any]:
+        result = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                result[field] = list(value) if field in self.LISTS else value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+class QuestionAnalysis(_Record):
+    """
+    Compact Reader Agent result. The question is referenced by id instead
+    of being held as "original_question"; to_dict() puts it back.
+    """
+
+    __slots__ = ("question_id", "main_topic", "sub_topics", "bloom_level", "question_type",
+                 "difficulty", "key_principles", "complexity_score", "agent", "metadata",
+                 "note", "hedged", "degraded")
+
+    question_id: Any
+    main_topic: Optional[str]
+    sub_topics: Optional[Tuple[str, ...]]
+    bloom_level: Optional[str]
+    question_type: Optional[str]
+    difficulty: Optional[str]
+    key_principles: Optional[Tuple[str, ...]]
+    complexity_score: Any
+    agent: Optional[str]
+    metadata: Optional[str]
+    note: Optional[str]
+    hedged: Optional[bool]
+    degraded: Optional[bool]
+
+    FIELDS = __slots__[1:]
+    LABELS = ("main_topic", "bloom_level", "question_type", "difficulty", "agent", "metadata", "note")
+    LISTS = ("sub_topics", "key_principles")
+
+    @classmethod
+    def from_dict(cls, analysis: Dict[str, Any], question: Dict[str, Any]) -> "QuestionAnalysis":
+        """
+        Build a record from a Reader Agent result.
+
+        Args:
+            analysis: ReaderAgent.analyze_question output
+            question: The question it analyzed; "original_question" is only
+                dropped when it is this question, so to_dict(question) can
+                restore it
+
+        Returns:
+            QuestionAnalysis record
+        """
+        record = cls()
+        original = analysis.get("original_question")
+        if question.get("id") is not None and (original is question or original == question):
+            record.question_id = question.get("id")
+            record._load(analysis, skip=("original_question",))
+        else:
+            record.question_id = None
+            record._load(analysis)
+        return record
+
+    def to_dict(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert back to the Reader Agent dictionary.
+
+        Args:
+            question: The question this record's id refers to
+
+        Returns:
+            Dictionary equal to the analyze_question output it was built from
+        """
+        result = self._dump()
+        if self.question_id is not None:
+            result["original_question"] = question
+        return result
+
+
+class _CriteriaScore(_Record):
+    """
+    Five-criterion rubric result. The class attributes describe the rubric
+    (used by the agents through expand_terse and with_reasons); instances
+    are compact results, with one score and one reason per criterion.
+    """
+
+    __slots__ = ("scores", "reasons", "question_id", "agent", "note", "hedged", "degraded", "terse")
+
+    scores: Optional[Tuple[Any, ...]]
+    reasons: Optional[Tuple[str, ...]]
+    question_id: Any
+
+    CRITERIA: Tuple[str, ...] = ()
+    REASON_KEY = "justification"
+    OVERALL_KEY = ""
+    SUMMARY_KEY = ""
+    LABELS = ("agent", "note")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_CriteriaScore":
+        """Build a record from a Relevance or Depth Agent result."""
+        record = cls()
+        entries = [data.get(criterion) for criterion in cls.CRITERIA]
+        if all(isinstance(e, dict) and len(e) == 2 and e.get("score") is not None
+               and isinstance(e.get(cls.REASON_KEY), str) for e in entries):
+            record.scores = tuple(e["score"] for e in entries)
+            record.reasons = tuple(e[cls.REASON_KEY] for e in entries)
+            record._load(data, skip=cls.CRITERIA)
+        else:
+            record.scores = record.reasons = None
+            record._load(data)
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to an agent result dictionary equal to the one it was built from."""
+        result = {}
+        if self.scores is not None:
+            for criterion, score, reason in zip(self.CRITERIA, self.scores, self.reasons):
+                result[criterion] = {"score": score, self.REASON_KEY: reason}
+        result.update(self._dump())
+        return result
+
+    @classmethod
+    def expand_terse(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Bring a scores-only agent result into the usual shape.
+
+        Bare criterion scores become {"score": n, reason: ""} and the result
+        is marked "terse" until its reasons are filled in with with_reasons.
+        """
+        result = dict(data)
+        expanded = False
+        for criterion in cls.CRITERIA:
+            entry = result.get(criterion)
+            if not isinstance(entry, dict):
+                result[criterion] = {"score": _number(_score(entry)), cls.REASON_KEY: ""}
+                expanded = True
+        result.setdefault(cls.SUMMARY_KEY, "")
+        if expanded:
+            result["terse"] = True
+        return result
+
+    @classmethod
+    def with_reasons(cls, data: Dict[str, Any], reasons: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a terse result with its justifications and summary filled in."""
+        result = dict(data)
+        for criterion in cls.CRITERIA:
+            entry = dict(result.get(criterion) or {})
+            entry[cls.REASON_KEY] = str(reasons.get(criterion, entry.get(cls.REASON_KEY, "")))
+            result[criterion] = entry
+        result[cls.SUMMARY_KEY] = str(reasons.get(cls.SUMMARY_KEY, result.get(cls.SUMMARY_KEY, "")))
+        result.pop("terse", None)
+        return result
+
+
+class RelevanceScore(_CriteriaScore):
+    """Relevance Agent rubric and compact result."""
+
+    __slots__ = ("overall_relevance_score", "summary")
+
+    CRITERIA = RELEVANCE_CRITERIA
+    REASON_KEY = "justification"
+    OVERALL_KEY = "overall_relevance_score"
+    SUMMARY_KEY = "summary"
+    FIELDS = __slots__ + _CriteriaScore.__slots__[2:]
+
+
+class DepthScore(_CriteriaScore):
+    """Depth Agent rubric and compact result."""
+
+    __slots__ = ("overall_depth_score", "depth_summary")
+
+    CRITERIA = DEPTH_CRITERIA
+    REASON_KEY = "explanation"
+    OVERALL_KEY = "overall_depth_score"
+    SUMMARY_KEY = "depth_summary"
+    FIELDS = __slots__ + _CriteriaScore.__slots__[2:]
+
+
+class CompositeScore:
+    """
+    Weighted combination of relevance and depth for one question. The
+    question text is looked up by id when converting to a dictionary.
+    """
+
+    __slots__ = ("question_id", "relevance_score", "depth_score", "relevance_weight", "depth_weight")
+
+    def __init__(self, question_id: int, relevance_score: float, depth_score: float,
+                 relevance_weight: float, depth_weight: float):
+        self.question_id = question_id
+        self.relevance_score = relevance_score
+        self.depth_score = depth_score
+        self.relevance_weight = relevance_weight
+        self.depth_weight = depth_weight
+
+    @property
+    def relevance_contribution(self) -> float:
+        return self.relevance_score * self.relevance_weight
+
+    @property
+    def depth_contribution(self) -> float:
+        return self.depth_score * self.depth_weight
+
+    @property
+    def composite_score(self) -> float:
+        return self.relevance_contribution + self.depth_contribution
+
+    def to_dict(self, question_text: str = "") -> Dict[str, Any]:
+        """Convert to the composite score dictionary used by the Judge Agent."""
+        return {
+            "question_id": self.question_id,
+            "question_text": question_text,
+            "relevance_score": self.relevance_score,
+            "depth_score": self.depth_score,
+            "composite_score": self.composite_score,
+            "relevance_contribution": self.relevance_contribution,
+            "depth_contribution": self.depth_contribution,
+        }
+
+
+ScoredRecord = Tuple[QuestionAnalysis, RelevanceScore, DepthScore]
+
+
+def compact_scored(scored: Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]],
+                   question: Dict[str, Any]) -> ScoredRecord:
+    """Records for one question's (analysis, relevance, depth) results."""
+    analysis, relevance, depth = scored
+    return (QuestionAnalysis.from_dict(analysis, question),
+            RelevanceScore.from_dict(relevance), DepthScore.from_dict(depth))
+
+
+def expand_scored(record: ScoredRecord, question: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """The (analysis, relevance, depth) dictionaries of one question's records."""
+    analysis, relevance, depth = record
+    return analysis.to_dict(question), relevance.to_dict(), depth.to_dict()
+
+
+def question_texts(reader_analyses: List[Dict[str, Any]]) -> Dict[Any, str]:
+    """Map question id to question text from Reader Agent results."""
+    texts = {}
+    for analysis in reader_analyses:
+        question = analysis.get("original_question", {})
+        texts[question.get("id")] = question.get("question_text", "")
+    return texts
+
+
+def compute_composite_scores(question_ids: List[Any],
+                             relevance_scores: List[Dict[str, Any]],
+                             depth_scores: List[Dict[str, Any]],
+                             relevance_weight: float,
+                             depth_weight: float) -> List[CompositeScore]:
+    """
+    Combine relevance and depth scores into sorted composite records.
+
+    Args:
+        question_ids: Ids of questions to score, in reader order
+        relevance_scores: Output from Relevance Agent
+        depth_scores: Output from Depth Agent
+        relevance_weight: Weight for relevance in final score (0-1)
+        depth_weight: Weight for depth in final score (0-1)
+
+    Returns:
+        List of CompositeScore records sorted by composite score, highest first
+    """
+    relevance_by_id = {r["question_id"]: r["overall_relevance_score"] for r in relevance_scores}
+    depth_by_id = {d["question_id"]: d["overall_depth_score"] for d in depth_scores}
+
+    composites = []
+    for question_id in question_ids:
+        if question_id in relevance_by_id and question_id in depth_by_id:
+            composites.append(CompositeScore(
+                question_id, relevance_by_id[question_id], depth_by_id[question_id],
+                relevance_weight, depth_weight
+            ))
+
+    composites.sort(key=lambda c: c.composite_score, reverse=True)
+    return composites
@@ -1,10 +1,16 @@
 import json
 import re
-from typing import Dict, List, Any
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
-from langchain_groq import ChatGroq
+from typing import Dict, List, Any, TYPE_CHECKING
+from .prompts import (
+    RELEVANCE as RELEVANCE_PROMPT, RELEVANCE_TERSE as RELEVANCE_TERSE_PROMPT,
+    RELEVANCE_EXPLAIN as RELEVANCE_EXPLAIN_PROMPT, analysis_payload
+)
+from .records import RelevanceScore, _score
 import logging
 
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
 logger = logging.getLogger(__name__)
 
 class RelevanceAgent:
@@ -13,8 +19,16 @@ class RelevanceAgent:
     and overall relevance for JEE preparation.
     """
     
-    def __init__(self, llm: ChatGroq):
+    def __init__(self, llm: "ChatGroq", terse: bool = False):
+        """
+        Args:
+            llm: Chat model for scoring
+            terse: Ask only for the numeric scores; justifications are
+                generated later with explain() for the questions that need them
+        """
         self.llm = llm
+        self.terse = terse
+        self.prompt = RELEVANCE_TERSE_PROMPT if terse else RELEVANCE_PROMPT
         self.name = "Relevance Agent"
         
     def score_question(self, question_analysis: Dict[str, Any]) -> Dict[str, Any]:
@@ -28,19 +42,29 @@ class RelevanceAgent:
             Dictionary with relevance scores and justifications
         """
         try:
-            prompt = self._create_scoring_prompt(question_analysis)
+            system, prompt = self.prompt.render(
+                analysis=analysis_payload(question_analysis),
+                question_text=question_analysis["original_question"]["question_text"]
+            )
+            
+            from langchain.schema import HumanMessage, SystemMessage
             
             messages = [
-                SystemMessage(content="You are a Relevance Agent that evaluates the importance and utility of JEE physics questions."),
+                SystemMessage(content=system),
                 HumanMessage(content=prompt)
             ]
             
             response = self.llm.invoke(messages)
+            self.prompt.record(prompt, response)
             relevance_data = self._parse_response(response.content)
+            if self.terse:
+                relevance_data = RelevanceScore.expand_terse(relevance_data)
             
             # Add metadata
             relevance_data["question_id"] = question_analysis["original_question"]["id"]
             relevance_data["agent"] = self.name
+            relevance_data["hedged"] = bool(getattr(response, "response_metadata", {}).get("hedged"))
+            relevance_data.setdefault("degraded", False)
             
             logger.info(f"Relevance Agent scored question {question_analysis['original_question']['id']}")
             return relevance_data
@@ -49,6 +73,44 @@ class RelevanceAgent:
             logger.error(f"Error in Relevance Agent scoring: {str(e)}")
             return self._fallback_scoring(question_analysis)
     
+    def explain(self, question_analysis: Dict[str, Any], relevance_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fill in the justifications of a terse result, keeping its scores.
+        
+        Args:
+            question_analysis: Analysis from Reader Agent
+            relevance_data: Result from score_question
+            
+        Returns:
+            The result with justifications and summary; unchanged if it is
+            not terse or the call fails
+        """
+        if not relevance_data.get("terse"):
+            return relevance_data
+        try:
+            scores = {c: _score(relevance_data.get(c)) for c in RelevanceScore.CRITERIA}
+            scores["overall_relevance_score"] = _score(relevance_data.get("overall_relevance_score"))
+            system, prompt = RELEVANCE_EXPLAIN_PROMPT.render(
+                scores=json.dumps(scores),
+                analysis=analysis_payload(question_analysis),
+                question_text=question_analysis["original_question"]["question_text"]
+            )
+            
+            from langchain.schema import HumanMessage, SystemMessage
+            
+            response = self.llm.invoke([SystemMessage(content=system), HumanMessage(content=prompt)])
+            RELEVANCE_EXPLAIN_PROMPT.record(prompt, response)
+            json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
+            if not json_match:
+                raise ValueError("No JSON found in response")
+            
+            logger.info(f"Relevance Agent explained question {relevance_data['question_id']}")
+            return RelevanceScore.with_reasons(relevance_data, json.loads(json_match.group()))
+            
+        except Exception as e:
+            logger.error(f"Error in Relevance Agent explanation: {str(e)}")
+            return relevance_data
+    
     def score_all_questions(self, question_analyses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Score all questions for relevance.
@@ -66,53 +128,6 @@ class RelevanceAgent:
         
         return relevance_scores
     
-    def _create_scoring_prompt(self, question_analysis: Dict[str, Any]) -> str:
-        """Create the prompt for relevance scoring."""
-        question_text = question_analysis["original_question"]["question_text"]
-        
-        return f"""
-You are a Relevance Agent that evaluates the importance and utility of JEE physics questions for exam preparation and conceptual understanding.
-
-Evaluate the following question based on:
-1. Frequency of appearance in JEE exams (how often similar questions appear)
-2. Conceptual importance (fundamental physics concepts)
-3. Application relevance (real-world applications)
-4. Foundation building (prerequisite for other topics)
-5. Problem-solving skills development
-
-Question Analysis: {json.dumps(question_analysis, indent=2)}
-Question Text: {question_text}
-
-Rate each criterion on a scale of 1-10 and provide justification:
-
-{{
-  "exam_frequency": {{
-    "score": number_1_to_10,
-    "justification": "explanation"
-  }},
-  "conceptual_importance": {{
-    "score": number_1_to_10,
-    "justification": "explanation"
-  }},
-  "application_relevance": {{
-    "score": number_1_to_10,
-    "justification": "explanation"
-  }},
-  "foundation_building": {{
-    "score": number_1_to_10,
-    "justification": "explanation"
-  }},
-  "skill_development": {{
-    "score": number_1_to_10,
-    "justification": "explanation"
-  }},
-  "overall_relevance_score": number_1_to_10,
-  "summary": "brief explanation of overall relevance"
-}}
-
-Respond with only the JSON, no additional text.
-"""
-    
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """Parse the LLM response and extract JSON."""
         try:
@@ -126,6 +141,23 @@ Respond with only the JSON, no additional text.
             logger.error(f"Error parsing relevance response: {str(e)}")
             return self._fallback_json()
     
+    def estimate_question(self, question_analysis: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        """
+        Heuristic relevance estimate without calling the LLM.
+        
+        Args:
+            question_analysis: Analysis from Reader Agent
+            reason: Why the LLM was not used, stored as the note
+            
+        Returns:
+            Dictionary in the same shape as score_question
+        """
+        result = self._fallback_scoring(question_analysis)
+        result["summary"] = "Estimated from the Reader analysis"
+        result["note"] = reason
+        result["degraded"] = False
+        return result
+    
     def _fallback_scoring(self, question_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Provide fallback scoring if LLM fails."""
         base_score = 6  # Default medium relevance
@@ -150,11 +182,13 @@ Respond with only the JSON, no additional text.
             "summary": "Fallback scoring used due to LLM error",
             "question_id": question_analysis["original_question"]["id"],
             "agent": self.name,
-            "note": "Fallback scoring used"
+            "note": "Fallback scoring used",
+            "hedged": False,
+            "degraded": True
         }
     
     def _fallback_json(self) -> Dict[str, Any]:
-        """Provide fallback JSON structure."""
+        """Provide fallback JSON structure, marked degraded."""
         return {
             "exam_frequency": {"score": 6, "justification": "Default estimation"},
             "conceptual_importance": {"score": 6, "justification": "Default estimation"},
@@ -162,5 +196,7 @@ Respond with only the JSON, no additional text.
             "foundation_building": {"score": 6, "justification": "Default estimation"},
             "skill_development": {"score": 6, "justification": "Default estimation"},
             "overall_relevance_score": 6,
-            "summary": "Default relevance assessment"
+            "summary": "Default relevance assessment",
+            "note": "Default scores used: unreadable response",
+            "degraded": True
         }
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Callable, Hashable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Result lists kept for each analysis, in the order they are hashed
+FIELDS = ("reader_analyses", "relevance_scores", "depth_scores")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _size(value: Any) -> int:
+    """Approximate bytes held by a derived value: its pickled size."""
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _Entry:
+    """One stored analysis: its record keys, the shared records and the keys of what was derived from them."""
+
+    def __init__(self, keys: List[str], results: Dict[str, List[Dict[str, Any]]], size: int):
+        self.keys = keys
+        self.results = results
+        self.size = size
+        self.rankings: Dict[Hashable, Dict[str, Any]] = {}
+        self.ranking_bytes = 0
+        self.derived: Dict[str, str] = {}  # name -> derived key
+        self.banks = set()
+        self.last_used = time.monotonic()
+
+
+class ResultStore:
+    """
+    Process-wide store for analysis results, shared by every session.
+
+    Sessions keep only the handle returned by put(). Records are interned
+    by content hash: an analysis identical to a stored one gets the same
+    handle, and analyses of the same bank share the question dictionaries
+    (with their text) and every record that came out the same, so a
+    re-explained or partly rescored result costs only its changed records.
+    Entries are evicted least recently used first once the store holds more
+    than `max_bytes` of records (measured as their JSON size), rankings and
+    derived values (measured pickled), or `max_entries` analyses, and after
+    `ttl` seconds without use.
+
+    Results returned by get() are shared; callers build new lists and dicts
+    instead of changing them.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_entries: int = 1000,
+                 ttl: Optional[float] = 6 * 3600):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._records: Dict[str, list] = {}  # key -> [record, references, size, question key]
+        self._banks: Dict[str, str] = {}
+        self._derived: Dict[str, list] = {}  # key -> [value, references, size]
+        self._record_bytes = 0
+        self._ranking_bytes = 0
+        self._derived_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "deduplicated": 0, "shared": 0, "hits": 0, "misses": 0,
+                      "evicted_lru": 0, "evicted_ttl": 0}
+
+    def _intern(self, key: str, record: Dict[str, Any], size: int, question_key: Optional[str] = None):
+        slot = self._records.get(key)
+        if slot is None:
+            self._records[key] = slot = [record, 0, size, question_key]
+            self._record_bytes += size
+        slot[1] += 1
+        return slot[0]
+
+    def _release(self, key: str):
+        slot = self._records[key]
+        slot[1] -= 1
+        if slot[1] == 0:
+            del self._records[key]
+            self._record_bytes -= slot[2]
+            if slot[3] is not None:
+                self._release(slot[3])
+
+    def _prepare(self, results: Dict[str, List[Dict[str, Any]]]) -> List[tuple]:
+        """(field, record key, record, size, question) for every record, without storing anything."""
+        prepared = []
+        for field in FIELDS:
+            for record in results.get(field, []):
+                question = record.get("original_question") if field == "reader_analyses" else None
+                if isinstance(question, dict):
+                    text = _canonical(question)
+                    question = (_digest(text), question, len(text.encode("utf-8")))
+                    text = _canonical(dict(record, original_question=question[0]))
+                else:
+                    question = None
+                    text = _canonical(record)
+                prepared.append((field, _digest(field + text), record, len(text.encode("utf-8")), question))
+        return prepared
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        while self._entries:
+            handle, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.ttl:
+                break
+            self._evict(handle)
+            self.stats["evicted_ttl"] += 1
+
+    def _evict(self, handle: str):
+        entry = self._entries.pop(handle)
+        for key in entry.keys:
+            self._release(key)
+        self._ranking_bytes -= entry.ranking_bytes
+        for key in entry.derived.values():
+            self._release_derived(key)
+        for bank in entry.banks:
+            if self._banks.get(bank) == handle:
+                del self._banks[bank]
+        logger.info(f"Evicted result {handle[:12]} ({entry.size + entry.ranking_bytes} bytes)")
+
+    def _touch(self, handle: str) -> Optional[_Entry]:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._entries.get(handle)
+        if entry is not None:
+            entry.last_used = now
+            self._entries.move_to_end(handle)
+        return entry
+
+    def put(self, results: Dict[str, List[Dict[str, Any]]], bank: Optional[str] = None,
+            parent: Optional[str] = None) -> str:
+        """
+        Store an analysis.
+
+        Args:
+            results: Lists named in FIELDS
+            bank: Key of the bank and settings that produced the results;
+                find(bank) returns this handle afterwards
+            parent: Handle these results update (adding explanations or
+                scores); its rankings and banks carry over to the new handle.
+                Results with degraded records (fallback scores) are not
+                registered for any bank, so other sessions do not reuse them
+
+        Returns:
+            Handle for get(); equal results always get the same handle
+        """
+        prepared = self._prepare(results)
+        handle = _digest("".join(key for _, key, _, _, _ in prepared))
+        with self._lock:
+            self.stats["puts"] += 1
+            entry = self._touch(handle)
+            if entry is not None:
+                self.stats["deduplicated"] += 1
+            else:
+                stored = {field: [] for field in FIELDS}
+                size = 0
+                for field, key, record, record_size, question in prepared:
+                    question_key = None
+                    if question is not None:
+                        question_key, question_record, question_size = question
+                        question_record = self._intern(question_key, question_record, question_size)
+                        if key not in self._records:
+                            record = dict(record, original_question=question_record)
+                        size += question_size
+                    stored[field].append(self._intern(key, record, record_size, question_key))
+                    if question_key is not None and self._records[key][1] > 1:
+                        # The record was already stored with its question
+                        self._release(question_key)
+                    size += record_size
+                entry = _Entry([key for _, key, _, _, _ in prepared], stored, size)
+                self._entries[handle] = entry
+            previous = self._entries.get(parent) if parent not in (None, handle) else None
+            banks = set() if bank is None else {bank}
+            if previous is not None:
+                for key, ranking in previous.rankings.items():
+                    if key not in entry.rankings:
+                        self._set_ranking(entry, key, ranking)
+                banks |= {b for b in previous.banks if self._banks.get(b) == parent}
+            if any(record.get("degraded") for _, _, record, _, _ in prepared):
+                banks = set()
+            for b in banks:
+                self._banks[b] = handle
+                entry.banks.add(b)
+            self._shrink()
+        return handle
+
+    def _shrink(self):
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._held() > self.max_bytes):
+            self._evict(next(iter(self._entries)))
+            self.stats["evicted_lru"] += 1
+
+    def _held(self) -> int:
+        return self._record_bytes + self._ranking_bytes + self._derived_bytes
+
+    def get(self, handle: Optional[str]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """The stored results (shared; do not modify), or None once evicted."""
+        with self._lock:
+            entry = self._touch(handle) if handle is not None else None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return dict(entry.results)
+
+    def find(self, bank: str) -> Optional[str]:
+        """Handle of the latest results stored for this bank, if still held."""
+        with self._lock:
+            handle = self._banks.get(bank)
+            if handle is None or self._touch(handle) is None:
+                return None
+            self.stats["shared"] += 1
+            return handle
+
+    def _set_ranking(self, entry: _Entry, key: Hashable, ranking: Dict[str, Any]):
+        previous = entry.rankings.get(key)
+        size = len(_canonical(ranking).encode("utf-8"))
+        if previous is not None:
+            size -= len(_canonical(previous).encode("utf-8"))
+        entry.rankings[key] = ranking
+        entry.ranking_bytes += size
+        self._ranking_bytes += size
+
+    def put_ranking(self, handle: str, key: Hashable, ranking: Dict[str, Any]):
+        """Keep a ranking of these results, e.g. by importance weight or by TOP 3 set."""
+        with self._lock:
+            entry = self._touch(handle)
+            if entry is not None:
+                self._set_ranking(entry, key, ranking)
+                self._shrink()
+
+    def ranking(self, handle: Optional[str], key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._touch(handle) if handle is not None else None
+            return None if entry is None else entry.rankings.get(key)
+
+    def _release_derived(self, key: str):
+        slot = self._derived[key]
+        slot[1] -= 1
+        if slot[1] == 0:
+            del self._derived[key]
+            self._derived_bytes -= slot[2]
+
+    def derived(self, handle: str, name: str, build: Callable[[Dict[str, List[Dict[str, Any]]]], Any],
+                depends: Optional[Callable[[Dict[str, List[Dict[str, Any]]]], Any]] = None) -> Any:
+        """
+        Value computed from the results (charts, TOP 3 schedule), built once
+        and evicted with the last entry using it. Counted towards max_bytes.
+
+        Args:
+            handle: Handle from put()
+            name: Name of the value
+            build: Builds the value from the results
+            depends: The part of the results the value is built from; entries
+                where it is equal (e.g. the same scores with new
+                explanations) share one value. Defaults to all of the results
+
+        Returns:
+            The value (shared; do not modify), or None once evicted
+        """
+        with self._lock:
+            entry = self._touch(handle)
+            if entry is None:
+                return None
+            key = entry.derived.get(name)
+            if key is not None:
+                return self._derived[key][0]
+            results = dict(entry.results)
+        key = _digest(name + handle if depends is None else name + _canonical(depends(results)))
+        with self._lock:
+            slot = self._derived.get(key)
+        if slot is None:
+            value = build(results)
+            slot = [value, 0, _size(value)]
+        with self._lock:
+            if name in entry.derived:
+                return self._derived[entry.derived[name]][0]
+            slot = self._derived.get(key, slot)
+            if self._entries.get(handle) is entry:
+                if slot[1] == 0:
+                    self._derived[key] = slot
+                    self._derived_bytes += slot[2]
+                entry.derived[name] = key
+                slot[1] += 1
+                self._shrink()
+            return slot[0]
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Entry and record counts, bytes held against what the same results
+        would take with a separate copy per analysis, and the hit and
+        eviction counters.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            stored = self._held()
+            logical = sum(entry.size for entry in self._entries.values()) + self._ranking_bytes + self._derived_bytes
+            stats = dict(self.stats)
+            stats.update({
+                "entries": len(self._entries),
+                "banks": len(self._banks),
+                "records": len(self._records),
+                "derived": len(self._derived),
+                "derived_bytes": self._derived_bytes,
+                "stored_bytes": stored,
+                "undeduplicated_bytes": logical,
+                "saved_bytes": logical - stored,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            })
+            return stats
@@ -0,0 +1,275 @@
+import io
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Union
+import logging
+
+from .records import RELEVANCE_CRITERIA, DEPTH_CRITERIA, compute_composite_scores
+
+logger = logging.getLogger(__name__)
+
+PARQUET = "parquet"
+ARROW = "arrow"
+
+
+def _schema():
+    """Column layout for full analysis results."""
+    import pyarrow as pa
+
+    text_list = pa.list_(pa.string())
+    fields = [
+        ("question_id", pa.int64()),
+        ("question_text", pa.string()),
+        ("topic", pa.string()),
+        ("tags", text_list),
+        ("bloom_level", pa.string()),
+        ("main_topic", pa.string()),
+        ("sub_topics", text_list),
+        ("reader_bloom_level", pa.string()),
+        ("question_type", pa.string()),
+        ("difficulty", pa.string()),
+        ("key_principles", text_list),
+        ("complexity_score", pa.float64()),
+    ]
+    fields += [(f"relevance_{c}", pa.float64()) for c in RELEVANCE_CRITERIA]
+    fields.append(("overall_relevance_score", pa.float64()))
+    fields += [(f"depth_{c}", pa.float64()) for c in DEPTH_CRITERIA]
+    fields += [
+        ("overall_depth_score", pa.float64()),
+        ("relevance_weight", pa.float64()),
+        ("depth_weight", pa.float64()),
+        ("composite_score", pa.float64()),
+        ("relevance_contribution", pa.float64()),
+        ("depth_contribution", pa.float64()),
+        ("rank", pa.int64()),
+        ("question_source", pa.string()),
+        ("reader_note", pa.string()),
+        ("relevance_note", pa.string()),
+        ("depth_note", pa.string()),
+        ("hedged", pa.bool_()),
+        ("degraded", pa.bool_()),
+        ("relevance_samples", pa.int64()),
+        ("relevance_score_std", pa.float64()),
+        ("depth_samples", pa.int64()),
+        ("depth_score_std", pa.float64()),
+        ("depth_skipped", pa.bool_()),
+    ]
+    return pa.schema(fields)
+
+
+def _criterion(data: Dict[str, Any], name: str) -> Optional[float]:
+    entry = data.get(name)
+    if isinstance(entry, dict):
+        entry = entry.get("score")
+    try:
+        return float(entry)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_result(reader_analysis: Dict[str, Any],
+                   relevance_score: Dict[str, Any],
+                   depth_score: Dict[str, Any],
+                   relevance_weight: float,
+                   depth_weight: float,
+                   rank: Optional[int] = None,
+                   question_source: str = "") -> Dict[str, Any]:
+    """
+    Flatten one question's agent outputs into a single export row.
+
+    Args:
+        reader_analysis: Output from Reader Agent
+        relevance_score: Output from Relevance Agent
+        depth_score: Output from Depth Agent
+        relevance_weight: Weight for relevance in final score (0-1)
+        depth_weight: Weight for depth in final score (0-1)
+        rank: Position of the question in the composite ranking
+        question_source: "sample" or "uploaded"
+
+    Returns:
+        Dictionary with one value per export column
+    """
+    question = reader_analysis.get("original_question", {})
+    relevance_val = _criterion(relevance_score, "overall_relevance_score") or 0.0
+    depth_val = _criterion(depth_score, "overall_depth_score") or 0.0
+
+    row = {
+        "question_id": question.get("id"),
+        "question_text": question.get("question_text", ""),
+        "topic": question.get("topic"),
+        "tags": list(question.get("tags", [])),
+        "bloom_level": question.get("bloom_level"),
+        "main_topic": reader_analysis.get("main_topic"),
+        "sub_topics": [str(t) for t in reader_analysis.get("sub_topics", [])],
+        "reader_bloom_level": reader_analysis.get("bloom_level"),
+        "question_type": reader_analysis.get("question_type"),
+        "difficulty": reader_analysis.get("difficulty"),
+        "key_principles": [str(p) for p in reader_analysis.get("key_principles", [])],
+        "complexity_score": _criterion(reader_analysis, "complexity_score"),
+    }
+    for criterion in RELEVANCE_CRITERIA:
+        row[f"relevance_{criterion}"] = _criterion(relevance_score, criterion)
+    row["overall_relevance_score"] = relevance_val
+    for criterion in DEPTH_CRITERIA:
+        row[f"depth_{criterion}"] = _criterion(depth_score, criterion)
+    row.update({
+        "overall_depth_score": depth_val,
+        "relevance_weight": relevance_weight,
+        "depth_weight": depth_weight,
+        "composite_score": relevance_val * relevance_weight + depth_val * depth_weight,
+        "relevance_contribution": relevance_val * relevance_weight,
+        "depth_contribution": depth_val * depth_weight,
+        "rank": rank,
+        "question_source": question_source,
+        "reader_note": reader_analysis.get("note"),
+        "relevance_note": relevance_score.get("note"),
+        "depth_note": depth_score.get("note"),
+        "hedged": any(bool(r.get("hedged")) for r in (reader_analysis, relevance_score, depth_score)),
+        "degraded": any(bool(r.get("degraded")) for r in (reader_analysis, relevance_score, depth_score)),
+        "relevance_samples": relevance_score.get("samples", 1),
+        "relevance_score_std": relevance_score.get("score_std"),
+        "depth_samples": depth_score.get("samples", 1),
+        "depth_score_std": depth_score.get("score_std"),
+        "depth_skipped": bool(depth_score.get("skipped", False)),
+    })
+    return row
+
+
+class ResultsWriter:
+    """
+    Streams flattened result rows to a columnar file in fixed-size chunks,
+    so only one chunk of rows is held in memory at a time.
+    """
+
+    def __init__(self, sink: Union[str, io.IOBase], format: str = PARQUET, chunk_size: int = 1000):
+        import pyarrow as pa
+
+        if format not in (PARQUET, ARROW):
+            raise ValueError(f"Unsupported export format: {format}")
+
+        self.schema = _schema()
+        self.format = format
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._buffer: List[Dict[str, Any]] = []
+
+        if format == PARQUET:
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(sink, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(sink, self.schema)
+
+    def write(self, row: Dict[str, Any]):
+        """Buffer one row and flush when the chunk is full."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def write_all(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Write buffered rows as one record batch / row group."""
+        if not self._buffer:
+            return
+        import pyarrow as pa
+
+        batch = pa.RecordBatch.from_pylist(self._buffer, schema=self.schema)
+        self._writer.write_batch(batch)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        logger.info(f"Exported {self.rows_written} result rows ({self.format})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_result_rows(reader_analyses: List[Dict[str, Any]],
+                     relevance_scores: List[Dict[str, Any]],
+                     depth_scores: List[Dict[str, Any]],
+                     relevance_weight: float,
+                     depth_weight: float,
+                     question_source: str = "") -> Iterator[Dict[str, Any]]:
+    """Yield one export row per question that has both relevance and depth scores."""
+    relevance_by_id = {r["question_id"]: r for r in relevance_scores}
+    depth_by_id = {d["question_id"]: d for d in depth_scores}
+    question_ids = [a["original_question"]["id"] for a in reader_analyses]
+    composites = compute_composite_scores(
+        question_ids, relevance_scores, depth_scores, relevance_weight, depth_weight
+    )
+    ranks = {c.question_id: i + 1 for i, c in enumerate(composites)}
+
+    for analysis in reader_analyses:
+        question_id = analysis["original_question"]["id"]
+        if question_id not in ranks:
+            continue
+        yield flatten_result(
+            analysis, relevance_by_id[question_id], depth_by_id[question_id],
+            relevance_weight, depth_weight, ranks[question_id], question_source
+        )
+
+
+def export_results(sink: Union[str, io.IOBase],
+                   reader_analyses: List[Dict[str, Any]],
+                   relevance_scores: List[Dict[str, Any]],
+                   depth_scores: List[Dict[str, Any]],
+                   relevance_weight: float,
+                   depth_weight: float,
+                   question_source: str = "",
+                   format: str = PARQUET,
+                   chunk_size: int = 1000) -> int:
+    """
+    Export every question's Reader fields, criterion scores and composite
+    scores to Parquet or Arrow IPC.
+
+    Returns:
+        Number of rows written
+    """
+    with ResultsWriter(sink, format=format, chunk_size=chunk_size) as writer:
+        writer.write_all(iter_result_rows(
+            reader_analyses, relevance_scores, depth_scores,
+            relevance_weight, depth_weight, question_source
+        ))
+    return writer.rows_written
+
+
+def export_results_bytes(*args, **kwargs) -> bytes:
+    """Same as export_results but returns the file contents (for downloads)."""
+    buffer = io.BytesIO()
+    export_results(buffer, *args, **kwargs)
+    return buffer.getvalue()
+
+
+def load_results(path: str, columns: Optional[List[str]] = None, as_pandas: bool = True):
+    """
+    Load an exported results file using memory mapping.
+
+    Arrow IPC files are mapped zero-copy; Parquet files are read through a
+    memory-mapped source. Pass columns to read only the ones needed.
+
+    Args:
+        path: File written by export_results
+        columns: Optional subset of columns to load
+        as_pandas: Return a pandas DataFrame instead of a pyarrow Table
+
+    Returns:
+        pandas DataFrame or pyarrow Table
+    """
+    import pyarrow as pa
+
+    if path.endswith((".arrow", ".feather", ".ipc")):
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        if columns:
+            table = table.select(columns)
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns, memory_map=True)
+
+    return table.to_pandas() if as_pandas else table
@@ -0,0 +1,320 @@
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Any, Callable, Iterator, Optional
+import logging
+
+from .hedging import CLIENT_RETRIES, CLIENT_TIMEOUT, DeadlineExceeded, HedgedLLM, LatencyTracker
+from .prompts import token_usage
+
+logger = logging.getLogger(__name__)
+
+AGENTS = ("reader", "reader_fill", "relevance", "depth", "judge")
+
+# Routes that default to another agent's route rather than "default"
+# (reader_fill: the short trusted-metadata Reader call)
+ROUTE_FALLBACKS = {"reader_fill": "reader"}
+
+ROUND_ROBIN = "round_robin"
+LEAST_LATENCY = "least_latency"
+CHEAPEST = "cheapest"
+POLICIES = (ROUND_ROBIN, LEAST_LATENCY, CHEAPEST)
+
+
+def _groq_client(model: str, api_key: Optional[str] = None, temperature: float = 0.1,
+                 max_retries: int = CLIENT_RETRIES, request_timeout: float = CLIENT_TIMEOUT, **_):
+    from langchain_groq import ChatGroq
+
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY is not set")
+    return ChatGroq(model=model, temperature=temperature, groq_api_key=api_key,
+                    max_retries=max_retries, request_timeout=request_timeout)
+
+
+def _fake_client(model: str = "fake", latency: float = 0.0, temperature: float = 0.1, **_):
+    from .fake_llm import FakeLLM
+    return FakeLLM(latency=latency, name=model, temperature=temperature)
+
+
+# provider name -> factory(model=..., **endpoint options) returning a chat model
+PROVIDERS: Dict[str, Callable[..., Any]] = {
+    "groq": _groq_client,
+    "fake": _fake_client,
+}
+
+
+class Endpoint:
+    """
+    One model at one provider, with its running latency and cost figures.
+
+    Costs are in dollars per 1k tokens. After a failure the endpoint is
+    skipped for `cooldown` seconds unless no other endpoint is available.
+    """
+
+    def __init__(self, name: str, llm, cost_per_1k_input: float = 0.0,
+                 cost_per_1k_output: float = 0.0, cooldown: float = 30.0):
+        self.name = name
+        self.llm = llm
+        self.cost_per_1k_input = cost_per_1k_input
+        self.cost_per_1k_output = cost_per_1k_output
+        self.cooldown = cooldown
+        self.latency = LatencyTracker()
+        self.ewma_latency: Optional[float] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    @property
+    def unit_cost(self) -> float:
+        return self.cost_per_1k_input + self.cost_per_1k_output
+
+    def load(self) -> float:
+        """Expected wait: smoothed latency scaled by requests already in flight."""
+        if self.ewma_latency is None:
+            return 0.0  # untried endpoints go first so they get measured
+        return self.ewma_latency * (1 + self.in_flight)
+
+    def _begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+
+    def _failed(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.failures += 1
+            self.unhealthy_until = time.monotonic() + self.cooldown
+
+    def invoke(self, messages: List[Any]):
+        self._begin()
+        start = time.monotonic()
+        try:
+            response = self.llm.invoke(messages)
+        except Exception:
+            self._failed()
+            raise
+        return self._finished(messages, response, time.monotonic() - start)
+
+    def stream(self, messages: List[Any]) -> Iterator[Any]:
+        """Yield response chunks; counted like invoke once the stream ends."""
+        self._begin()
+        start = time.monotonic()
+        response = None
+        try:
+            for chunk in self.llm.stream(messages):
+                response = chunk if response is None else response + chunk
+                yield chunk
+        except GeneratorExit:
+            # The caller stopped reading early
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        except Exception:
+            self._failed()
+            raise
+        if response is None:
+            with self._lock:
+                self.in_flight -= 1
+        else:
+            self._finished(messages, response, time.monotonic() - start)
+
+    def _finished(self, messages: List[Any], response: Any, elapsed: float):
+        input_tokens, output_tokens = token_usage(messages, response)
+        self.latency.record(elapsed)
+        with self._lock:
+            self.in_flight -= 1
+            self.ewma_latency = elapsed if self.ewma_latency is None else 0.8 * self.ewma_latency + 0.2 * elapsed
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.cost += (input_tokens * self.cost_per_1k_input + output_tokens * self.cost_per_1k_output) / 1000
+        metadata = getattr(response, "response_metadata", None)
+        if isinstance(metadata, dict):
+            metadata["endpoint"] = self.name
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "healthy": self.healthy,
+                "ewma_latency": self.ewma_latency,
+                "p95_latency": self.latency.percentile(0.95),
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cost": round(self.cost, 6),
+            }
+
+
+class RoutedLLM:
+    """
+    Chat model that spreads calls over several endpoints.
+
+    Policies:
+        round_robin: take turns between endpoints
+        least_latency: pick the lowest smoothed latency, accounting for
+            requests already in flight
+        cheapest: pick the lowest per-token cost, the others are fallbacks
+
+    When the chosen endpoint raises, the next one in policy order is tried,
+    so a provider outage fails over instead of failing the agent.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], policy: str = LEAST_LATENCY):
+        if not endpoints:
+            raise ValueError("RoutedLLM needs at least one endpoint")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy '{policy}', expected one of {POLICIES}")
+        self.endpoints = endpoints
+        self.policy = policy
+        self._turn = itertools.count()
+
+    def _order(self) -> List[Endpoint]:
+        if self.policy == ROUND_ROBIN:
+            start = next(self._turn) % len(self.endpoints)
+            ordered = self.endpoints[start:] + self.endpoints[:start]
+        elif self.policy == CHEAPEST:
+            ordered = sorted(self.endpoints, key=lambda e: (e.unit_cost, e.load()))
+        else:
+            ordered = sorted(self.endpoints, key=lambda e: e.load())
+        # Endpoints cooling down after a failure are only used as a last resort
+        return [e for e in ordered if e.healthy] + [e for e in ordered if not e.healthy]
+
+    def invoke(self, messages: List[Any]):
+        error = None
+        for endpoint in self._order():
+            try:
+                return endpoint.invoke(messages)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning(f"Endpoint {endpoint.name} failed, trying next: {str(e)}")
+                error = e
+        raise error
+
+    def stream(self, messages: List[Any]) -> Iterator[Any]:
+        """Like invoke, but an endpoint is only failed over before its first chunk."""
+        error = None
+        for endpoint in self._order():
+            chunks = endpoint.stream(messages)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning(f"Endpoint {endpoint.name} failed, trying next: {str(e)}")
+                error = e
+                continue
+            yield first
+            yield from chunks
+            return
+        raise error
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"policy": self.policy, "endpoints": {e.name: e.get_stats() for e in self.endpoints}}
+
+
+class ModelRouter:
+    """
+    Assigns a (routed) chat model to each agent.
+
+    Built from a config such as:
+
+        {
+          "policy": "least_latency",
+          "agents": {
+            "reader": [{"provider": "groq", "model": "llama-3.1-8b-instant",
+                        "cost_per_1k_input": 0.00005, "cost_per_1k_output": 0.00008}],
+            "judge": {"policy": "cheapest", "endpoints": [
+                {"provider": "groq", "model": "llama-3.3-70b-versatile"},
+                {"provider": "groq", "model": "meta-llama/llama-4-scout-17b-16e-instruct"}]},
+            "default": [{"provider": "groq", "model": "meta-llama/llama-4-scout-17b-16e-instruct"}]
+          }
+        }
+
+    Agents without an entry use "default". Endpoints with the same provider,
+    model and options share one client, and so one connection pool.
+    """
+
+    def __init__(self, config: Dict[str, Any], api_key: Optional[str] = None,
+                 hedge: Optional[bool] = None, temperature: Optional[float] = None):
+        if hedge is None:
+            hedge = os.getenv("JEE_HEDGE_REQUESTS") == "1"
+        self.api_key = api_key
+        self.temperature = temperature
+        self._clients: Dict[str, Any] = {}
+        self._endpoints: Dict[str, Endpoint] = {}
+        self.routes: Dict[str, RoutedLLM] = {}
+        self.llms: Dict[str, HedgedLLM] = {}
+
+        agents_config = config.get("agents", {})
+        default_policy = config.get("policy", LEAST_LATENCY)
+        for agent in AGENTS:
+            spec = agents_config.get(agent, agents_config.get(ROUTE_FALLBACKS.get(agent), agents_config.get("default")))
+            if spec is None:
+                raise ValueError(f"No model route configured for the {agent} agent")
+            if isinstance(spec, dict):
+                policy, endpoint_specs = spec.get("policy", default_policy), spec["endpoints"]
+            else:
+                policy, endpoint_specs = default_policy, spec
+            self.routes[agent] = RoutedLLM([self._endpoint(agent, e) for e in endpoint_specs], policy)
+            self.llms[agent] = HedgedLLM(self.routes[agent], hedge=hedge)
+
+    def _endpoint(self, agent: str, spec: Dict[str, Any]) -> Endpoint:
+        spec = dict(spec)
+        provider = spec.pop("provider", "groq")
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown model provider '{provider}', expected one of {sorted(PROVIDERS)}")
+        cost_in = spec.pop("cost_per_1k_input", 0.0)
+        cost_out = spec.pop("cost_per_1k_output", 0.0)
+        cooldown = spec.pop("cooldown", 30.0)
+        name = spec.pop("name", None) or f"{provider}:{spec.get('model', '')}"
+        if provider == "groq":
+            spec.setdefault("api_key", self.api_key)
+        if self.temperature is not None:
+            spec["temperature"] = self.temperature
+
+        client_key = json.dumps([provider, spec], sort_keys=True, default=str)
+        if client_key not in self._clients:
+            self._clients[client_key] = PROVIDERS[provider](**spec)
+        return Endpoint(f"{agent}/{name}", self._clients[client_key], cost_in, cost_out, cooldown)
+
+    def llm_for(self, agent: str) -> HedgedLLM:
+        return self.llms[agent]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-agent, per-endpoint calls, failures, latency and cost."""
+        stats = {agent: route.get_stats() for agent, route in self.routes.items()}
+        stats["total_cost"] = round(sum(
+            endpoint["cost"] for route in stats.values() for endpoint in route["endpoints"].values()
+        ), 6)
+        return stats
+
+
+def load_route_config(source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Read a routing config from JEE_MODEL_ROUTES (or `source`), which is
+    either inline JSON or a path to a JSON file. Returns None when unset.
+    """
+    source = source or os.getenv("JEE_MODEL_ROUTES")
+    if not source:
+        return None
+    if source.lstrip().startswith("{"):
+        return json.loads(source)
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,345 @@
+import re
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+BLOOM_LEVELS = ("Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create")
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+# Other spellings of the Bloom levels and difficulties that models answer
+# with, lower-cased, mapped to the canonical value
+BLOOM_SYNONYMS = {
+    "remembering": "Remember", "recall": "Remember", "knowledge": "Remember",
+    "understanding": "Understand", "comprehension": "Understand", "comprehend": "Understand",
+    "applying": "Apply", "application": "Apply",
+    "analyzing": "Analyze", "analysing": "Analyze", "analyse": "Analyze", "analysis": "Analyze",
+    "evaluating": "Evaluate", "evaluation": "Evaluate",
+    "creating": "Create", "creation": "Create", "synthesis": "Create", "synthesize": "Create",
+}
+DIFFICULTY_SYNONYMS = {
+    "simple": "Easy", "basic": "Easy", "low": "Easy",
+    "moderate": "Medium", "intermediate": "Medium", "average": "Medium", "medium-hard": "Medium",
+    "difficult": "Hard", "challenging": "Hard", "advanced": "Hard", "high": "Hard", "very hard": "Hard",
+}
+
+
+def _canonical(value: Any, allowed: Tuple[str, ...], synonyms: Dict[str, str]) -> Any:
+    """The allowed value `value` spells (any case, or a synonym), else `value` unchanged."""
+    if not isinstance(value, str):
+        return value
+    key = value.strip().lower()
+    for option in allowed:
+        if option.lower() == key:
+            return option
+    return synonyms.get(key, value)
+
+# keyword -> (topic, principle). Longer keywords win over their substrings
+# because the alternation is ordered longest first.
+KEYWORDS: Dict[str, Tuple[str, str]] = {
+    # Mechanics
+    "inclined plane": ("Mechanics", "Newton's laws"),
+    "friction": ("Mechanics", "friction"),
+    "frictionless": ("Mechanics", "Newton's laws"),
+    "normal force": ("Mechanics", "Newton's laws"),
+    "acceleration": ("Mechanics", "kinematics"),
+    "projectile": ("Mechanics", "projectile motion"),
+    "momentum": ("Mechanics", "conservation of momentum"),
+    "collision": ("Mechanics", "conservation of momentum"),
+    "kinetic energy": ("Mechanics", "work-energy theorem"),
+    "potential energy": ("Mechanics", "conservation of energy"),
+    "work done": ("Mechanics", "work-energy theorem"),
+    "pulley": ("Mechanics", "Newton's laws"),
+    "tension": ("Mechanics", "Newton's laws"),
+    "moment of inertia": ("Rotational Mechanics", "moment of inertia"),
+    "torque": ("Rotational Mechanics", "torque"),
+    "angular momentum": ("Rotational Mechanics", "conservation of angular momentum"),
+    "angular velocity": ("Rotational Mechanics", "rotational kinematics"),
+    "rolling": ("Rotational Mechanics", "rolling motion"),
+    "gravitational": ("Gravitation", "Newton's law of gravitation"),
+    "orbit": ("Gravitation", "orbital motion"),
+    "escape velocity": ("Gravitation", "escape velocity"),
+    "satellite": ("Gravitation", "orbital motion"),
+    # Fluids and properties of matter
+    "pipe": ("Fluid Mechanics", "equation of continuity"),
+    "cross-section": ("Fluid Mechanics", "equation of continuity"),
+    "bernoulli": ("Fluid Mechanics", "Bernoulli's principle"),
+    "viscosity": ("Fluid Mechanics", "viscosity"),
+    "buoyant": ("Fluid Mechanics", "Archimedes' principle"),
+    "surface tension": ("Fluid Mechanics", "surface tension"),
+    "young's modulus": ("Properties of Matter", "elasticity"),
+    "stress": ("Properties of Matter", "elasticity"),
+    # Thermodynamics
+    "heat engine": ("Thermodynamics", "Carnot efficiency"),
+    "carnot": ("Thermodynamics", "Carnot efficiency"),
+    "reservoir": ("Thermodynamics", "second law of thermodynamics"),
+    "efficiency": ("Thermodynamics", "efficiency"),
+    "entropy": ("Thermodynamics", "entropy"),
+    "adiabatic": ("Thermodynamics", "adiabatic process"),
+    "isothermal": ("Thermodynamics", "isothermal process"),
+    "ideal gas": ("Thermodynamics", "ideal gas law"),
+    "specific heat": ("Thermodynamics", "calorimetry"),
+    "latent heat": ("Thermodynamics", "calorimetry"),
+    "thermal conductivity": ("Thermodynamics", "heat conduction"),
+    # Oscillations and waves
+    "simple harmonic motion": ("Oscillations", "simple harmonic motion"),
+    "shm": ("Oscillations", "simple harmonic motion"),
+    "amplitude": ("Oscillations", "simple harmonic motion"),
+    "pendulum": ("Oscillations", "simple pendulum"),
+    "spring constant": ("Oscillations", "Hooke's law"),
+    "resonance": ("Waves", "resonance"),
+    "standing wave": ("Waves", "standing waves"),
+    "doppler": ("Waves", "Doppler effect"),
+    "beats": ("Waves", "beats"),
+    "sound": ("Waves", "sound waves"),
+    # Electrostatics
+    "point charge": ("Electrostatics", "Coulomb's law"),
+    "charges": ("Electrostatics", "Coulomb's law"),
+    "electric field": ("Electrostatics", "electric field"),
+    "electric potential": ("Electrostatics", "electric potential"),
+    "gauss": ("Electrostatics", "Gauss's law"),
+    "capacitor": ("Electrostatics", "capacitance"),
+    "capacitance": ("Electrostatics", "capacitance"),
+    "dielectric": ("Electrostatics", "dielectrics"),
+    "energy stored": ("Electrostatics", "energy of a capacitor"),
+    # Current electricity
+    "resistance": ("Current Electricity", "Ohm's law"),
+    "resistor": ("Current Electricity", "Ohm's law"),
+    "battery": ("Current Electricity", "EMF and internal resistance"),
+    "kirchhoff": ("Current Electricity", "Kirchhoff's laws"),
+    "wheatstone": ("Current Electricity", "Wheatstone bridge"),
+    "potentiometer": ("Current Electricity", "potentiometer"),
+    # Magnetism and induction
+    "magnetic field": ("Electromagnetism", "magnetic field"),
+    "lorentz force": ("Electromagnetism", "Lorentz force"),
+    "solenoid": ("Electromagnetism", "Ampere's law"),
+    "emf": ("Electromagnetism", "electromagnetic induction"),
+    "induced": ("Electromagnetism", "Faraday's law"),
+    "flux": ("Electromagnetism", "Faraday's law"),
+    "inductance": ("Electromagnetism", "self-inductance"),
+    "conducting rod": ("Electromagnetism", "motional EMF"),
+    "alternating current": ("Electromagnetism", "AC circuits"),
+    "lcr": ("Electromagnetism", "AC circuits"),
+    # Optics
+    "refractive index": ("Optics", "Snell's law"),
+    "refraction": ("Optics", "Snell's law"),
+    "angle of incidence": ("Optics", "Snell's law"),
+    "total internal reflection": ("Optics", "total internal reflection"),
+    "critical angle": ("Optics", "total internal reflection"),
+    "lens": ("Optics", "lens formula"),
+    "mirror": ("Optics", "mirror formula"),
+    "focal length": ("Optics", "lens formula"),
+    "prism": ("Optics", "dispersion"),
+    "double-slit": ("Wave Optics", "Young's double-slit experiment"),
+    "double slit": ("Wave Optics", "Young's double-slit experiment"),
+    "fringe": ("Wave Optics", "interference"),
+    "interference": ("Wave Optics", "interference"),
+    "diffraction": ("Wave Optics", "diffraction"),
+    "polariz": ("Wave Optics", "polarization"),
+    # Modern physics
+    "photoelectric": ("Modern Physics", "photoelectric effect"),
+    "stopping potential": ("Modern Physics", "photoelectric effect"),
+    "work function": ("Modern Physics", "photoelectric effect"),
+    "threshold wavelength": ("Modern Physics", "photoelectric effect"),
+    "de broglie": ("Modern Physics", "matter waves"),
+    "bohr": ("Modern Physics", "Bohr model"),
+    "hydrogen atom": ("Modern Physics", "Bohr model"),
+    "half-life": ("Modern Physics", "radioactive decay"),
+    "radioactive": ("Modern Physics", "radioactive decay"),
+    "nucleus": ("Modern Physics", "nuclear physics"),
+    "binding energy": ("Modern Physics", "nuclear binding energy"),
+    "x-ray": ("Modern Physics", "X-rays"),
+    "semiconductor": ("Modern Physics", "semiconductors"),
+}
+
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in sorted(KEYWORDS, key=len, reverse=True)) + r")",
+    re.IGNORECASE,
+)
+
+# A number followed by a unit, e.g. "2 kg", "400 nm", "0.1 m²", "30°", "3 x 10^8 m/s"
+_QUANTITY_RE = re.compile(
+    r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:\s*[x×]\s*10\^?[-−]?\d+)?\s*"
+    r"(?:°C|°|%|Ω|"
+    r"(?:k|M|m|μ|u|n|c)?(?:m/s²|m/s\^2|m/s|rad/s|m²|m\^2|m³|m|g|s|N|J|eV|W|V|A|C|F|H|T|Hz|K|Pa|atm|mol|L|ohm|rad)"
+    r"(?![A-Za-z]))"
+)
+_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?")
+_SYMBOL_RE = re.compile(r"(?<![\w'])(?:[A-Za-z]|[+-]?\d*q)(?![\w'])|'[a-z]'")
+
+_DERIVE_RE = re.compile(r"\b(derive|show that|prove|obtain an expression|expression for)\b", re.IGNORECASE)
+_EXPLAIN_RE = re.compile(r"\b(explain|why|what happens|describe|state|define)\b", re.IGNORECASE)
+_COMPARE_RE = re.compile(r"\b(compare|analy[sz]e|justify|evaluate|which of|discuss)\b", re.IGNORECASE)
+_ASK_RE = re.compile(r"\b(find|calculate|determine|compute|estimate|obtain|derive|what is)\b([^.?]*)", re.IGNORECASE)
+_PART_RE = re.compile(r"\(\s*(?:[a-d]|i{1,3}|iv)\s*\)", re.IGNORECASE)
+_CHANGE_RE = re.compile(r"\b(inserted|removed|changed|doubled|halved|increased|decreased|change in)\b", re.IGNORECASE)
+
+
+class RuleBasedReader:
+    """
+    Deterministic Reader backend built from keyword and regex rules.
+
+    Produces the same fields as the Reader Agent with no LLM call: topic
+    and key principles from a physics keyword table, question type from
+    the given quantities and the verbs used, and complexity from the number
+    of given quantities, requested results ("Find X and Y", "(a)/(b)"),
+    principles involved and any change of configuration. The Reader Agent
+    uses it as a full backend, to fill gaps in trusted metadata, to repair
+    invalid LLM output, and in place of the LLM when a call fails.
+    """
+
+    def features(self, text: str) -> Dict[str, Any]:
+        """Raw signals extracted from the question text."""
+        matches = [m.lower() for m in _KEYWORD_RE.findall(text)]
+        quantities = _QUANTITY_RE.findall(text)
+        requests = _ASK_RE.findall(text)
+        asks = len(_PART_RE.findall(text))
+        for _, tail in requests:
+            asks += 1 + len(re.findall(r"\band\b|,", tail))
+        return {
+            "keywords": matches,
+            "quantities": len(quantities),
+            "numbers": len(_NUMBER_RE.findall(text)),
+            "symbols": len(_SYMBOL_RE.findall(text)),
+            "asks": max(asks, 1),
+            "solve": bool(requests),
+            "derive": bool(_DERIVE_RE.search(text)),
+            "explain": bool(_EXPLAIN_RE.search(text)),
+            "compare": bool(_COMPARE_RE.search(text)),
+            "change": bool(_CHANGE_RE.search(text)),
+        }
+
+    def analyze_text(self, text: str) -> Dict[str, Any]:
+        """
+        Analyze a question text.
+
+        Args:
+            text: Question text
+
+        Returns:
+            Dictionary with the Reader Agent's analysis fields
+        """
+        f = self.features(text)
+
+        topic_votes = Counter(KEYWORDS[k][0] for k in f["keywords"])
+        main_topic = topic_votes.most_common(1)[0][0] if topic_votes else "Physics"
+        principles = list(dict.fromkeys(KEYWORDS[k][1] for k in f["keywords"]))
+        sub_topics = list(dict.fromkeys(
+            KEYWORDS[k][1] for k in f["keywords"] if KEYWORDS[k][0] == main_topic
+        )) or ["general"]
+
+        if f["derive"]:
+            question_type = "derivation"
+        elif f["quantities"] or f["numbers"] >= 2 or (f["solve"] and f["symbols"] and not f["explain"]):
+            question_type = "numerical"
+        else:
+            question_type = "conceptual"
+
+        complexity = (
+            1
+            + min(f["quantities"], 5) * 0.6
+            + min(f["asks"], 4) * 0.9
+            + min(len(principles), 4) * 0.6
+            + (1.5 if f["derive"] else 0)
+            + (1.0 if f["change"] else 0)
+            + (0.5 if f["symbols"] >= 3 and not f["quantities"] else 0)
+        )
+        complexity_score = int(min(10, max(1, round(complexity))))
+
+        if f["derive"]:
+            bloom_level = "Create" if f["symbols"] >= 2 else "Analyze"
+        elif f["compare"] or f["change"] or (f["asks"] >= 2 and len(principles) >= 3):
+            bloom_level = "Analyze"
+        elif question_type == "numerical":
+            bloom_level = "Apply"
+        elif f["explain"]:
+            bloom_level = "Understand"
+        else:
+            bloom_level = "Remember"
+
+        difficulty = "Easy" if complexity_score <= 4 else "Medium" if complexity_score <= 7 else "Hard"
+
+        return {
+            "main_topic": main_topic,
+            "sub_topics": sub_topics,
+            "bloom_level": bloom_level,
+            "question_type": question_type,
+            "difficulty": difficulty,
+            "key_principles": principles or ["basic principles"],
+            "complexity_score": complexity_score,
+        }
+
+    def normalize(self, analysis: Dict[str, Any], fields: Optional[List[str]] = None):
+        """
+        Bring near-valid Reader values into the expected form, in place:
+        Bloom level and difficulty in any case or as a synonym ("Applying",
+        "moderate"), numeric strings for the complexity score, and a comma
+        separated string where a list is expected.
+        """
+        def wanted(field):
+            return field in analysis and (fields is None or field in fields)
+
+        if wanted("bloom_level"):
+            analysis["bloom_level"] = _canonical(analysis["bloom_level"], BLOOM_LEVELS, BLOOM_SYNONYMS)
+        if wanted("difficulty"):
+            analysis["difficulty"] = _canonical(analysis["difficulty"], DIFFICULTIES, DIFFICULTY_SYNONYMS)
+        for field in ("question_type", "main_topic"):
+            if wanted(field) and isinstance(analysis[field], str):
+                analysis[field] = analysis[field].strip()
+        if wanted("question_type") and isinstance(analysis["question_type"], str):
+            analysis["question_type"] = analysis["question_type"].lower()
+        for field in ("sub_topics", "key_principles"):
+            if wanted(field) and isinstance(analysis[field], str):
+                analysis[field] = [part.strip() for part in analysis[field].split(",") if part.strip()]
+        if wanted("complexity_score") and isinstance(analysis["complexity_score"], str):
+            try:
+                score = float(analysis["complexity_score"].strip())
+                analysis["complexity_score"] = int(score) if score.is_integer() else score
+            except ValueError:
+                pass
+
+    def repair(self, analysis: Dict[str, Any], text: str,
+               reference: Optional[Dict[str, Any]] = None,
+               fields: Optional[List[str]] = None) -> List[str]:
+        """
+        Replace missing or out-of-range Reader fields with rule values.
+        Values the model gave are normalized first (see normalize) and
+        kept unless they still cannot be used.
+
+        Args:
+            analysis: Reader output, fixed in place
+            text: Question text
+            reference: Precomputed analyze_text(text) result
+            fields: Only check these fields (default: all of them)
+
+        Returns:
+            Names of the fields that were replaced
+        """
+        self.normalize(analysis, fields)
+        reference = reference or self.analyze_text(text)
+        fixed = []
+        if analysis.get("bloom_level") not in BLOOM_LEVELS:
+            fixed.append("bloom_level")
+        if analysis.get("difficulty") not in DIFFICULTIES:
+            fixed.append("difficulty")
+        if not isinstance(analysis.get("question_type"), str) or not analysis.get("question_type"):
+            fixed.append("question_type")
+        if not isinstance(analysis.get("main_topic"), str) or not analysis.get("main_topic"):
+            fixed.append("main_topic")
+        for field in ("sub_topics", "key_principles"):
+            if not isinstance(analysis.get(field), list):
+                fixed.append(field)
+        try:
+            if not 1 <= float(analysis.get("complexity_score")) <= 10:
+                fixed.append("complexity_score")
+        except (TypeError, ValueError):
+            fixed.append("complexity_score")
+        if fields is not None:
+            fixed = [f for f in fixed if f in fields]
+
+        for field in fixed:
+            analysis[field] = reference[field]
+        if fixed:
+            logger.warning(f"Rule Reader replaced invalid Reader fields: {', '.join(fixed)}")
+        return fixed
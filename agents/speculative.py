@@ -0,0 +1,226 @@
+import bisect
+import heapq
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+import logging
+
+from .cascade import MAX_SCORE
+from .hedging import call_with_deadline
+from .judge_agent import CANDIDATES
+from .records import CompositeScore
+
+logger = logging.getLogger(__name__)
+
+# Highest estimated chance that an unscored question still changes the candidates
+MAX_RISK = 0.25
+
+# Judge calls one analysis may start speculatively (the first plus re-issues)
+MAX_ISSUES = 3
+
+
+def change_risk(composites: List[float], pending: int, pending_before: int = None,
+                max_score: float = MAX_SCORE, candidates: int = CANDIDATES) -> float:
+    """
+    Estimated chance that one of `pending` unscored questions enters the
+    top `candidates` of the scored ones.
+
+    Each unscored question is treated as one more draw from the same bank,
+    which beats the cut-off (the last candidate's composite) about as often
+    as the scored questions did. A draw equal to the cut-off only gets in
+    for questions listed before the last candidate, which win the tie.
+    Nothing gets in when even a perfect score falls short.
+
+    Args:
+        composites: Composite scores so far, sorted ascending
+        pending: Questions still being scored
+        pending_before: How many of them are listed before the last
+            candidate (default: all)
+        max_score: Best composite an unscored question could reach
+        candidates: Size of the Judge's candidate list
+
+    Returns:
+        Probability between 0 and 1
+    """
+    if pending == 0:
+        return 0.0
+    if len(composites) < candidates:
+        return 1.0
+    if pending_before is None:
+        pending_before = pending
+    cutoff = composites[-candidates]
+    if max_score < cutoff:
+        return 0.0
+    draws = len(composites) + 1
+    above = len(composites) - bisect.bisect_right(composites, cutoff)
+    at_or_above = len(composites) - bisect.bisect_left(composites, cutoff)
+    beat = (above + 1) / draws if max_score > cutoff else 0.0
+    stay = (1.0 - beat) ** (pending - pending_before) * (1.0 - at_or_above / draws) ** pending_before
+    return 1.0 - stay
+
+
+class SpeculativeJudge:
+    """
+    Starts the Judge Agent before scoring has finished.
+
+    The Judge prompt only contains the top CANDIDATES questions. Scored
+    questions are fed in as they finish. Once the estimated chance that an
+    unscored question still changes the candidates drops to max_risk, the
+    Judge is called in the background on the scores so far. A later
+    question that would rank above the speculation's last candidate makes
+    it stale: it is cancelled (or, if already running, its answer is ignored)
+    and re-issued when the candidates look stable again, at most
+    max_issues times. At the end, the speculative answer is only used if
+    the final prompt is identical to the speculated one, so the ranking is
+    the same as calling the Judge after scoring.
+
+    Not thread-safe: call update and resolve from one thread.
+    """
+
+    def __init__(self, judge, question_ids: List[Any], relevance_weight: float, depth_weight: float,
+                 deadlines: Optional[Dict[str, float]] = None, max_risk: float = MAX_RISK,
+                 max_issues: int = MAX_ISSUES, executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Args:
+            judge: JudgeAgent
+            question_ids: Ids of the questions being scored, in bank order
+            relevance_weight: Weight for relevance in final score (0-1)
+            depth_weight: Weight for depth in final score (0-1)
+            deadlines: Per-stage deadlines; "judge" limits each call
+            max_risk: Start the Judge when the estimated chance of a change is at most this
+            max_issues: Most speculative Judge calls
+            executor: Pool for the Judge calls; by default a private one
+        """
+        self.judge = judge
+        self.relevance_weight = relevance_weight
+        self.depth_weight = depth_weight
+        self.deadlines = deadlines or {}
+        self.max_risk = max_risk
+        self.max_issues = max_issues
+        self.max_score = MAX_SCORE * (relevance_weight + depth_weight)
+        self.pending = len(question_ids)
+        self.stats = {"issued": 0, "discarded": 0, "hits": 0, "misses": 0}
+
+        self._position = {question_id: i for i, question_id in enumerate(question_ids)}
+        self._items: Dict[Any, tuple] = {}
+        self._composites: List[float] = []
+        self._scored_positions: List[int] = []
+        # Min-heap of (composite, -position): the top of it is the last candidate
+        self._candidates: List[tuple] = []
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._future: Optional[Future] = None
+        self._prompt: Optional[str] = None
+        self._last_candidate: Optional[tuple] = None
+
+    def _partial(self):
+        items = sorted(self._items.values(), key=lambda item: self._position[item[0]["original_question"]["id"]])
+        return [i[0] for i in items], [i[1] for i in items], [i[2] for i in items]
+
+    def _discard(self):
+        self._future.cancel()
+        self._future = None
+        self._prompt = None
+        self.stats["discarded"] += 1
+
+    def _issue(self):
+        reader_analyses, relevance_scores, depth_scores = self._partial()
+        _, _, self._prompt = self.judge.candidate_prompt(
+            reader_analyses, relevance_scores, depth_scores, self.relevance_weight, self.depth_weight
+        )
+        self._last_candidate = self._candidates[0]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_issues, thread_name_prefix="speculative-judge")
+        self._future = self._executor.submit(
+            call_with_deadline, self.deadlines.get("judge"), self.judge.rank_questions,
+            reader_analyses, relevance_scores, depth_scores, self.relevance_weight, self.depth_weight
+        )
+        self.stats["issued"] += 1
+        logger.info(f"Speculative Judge started with {self.pending} questions unscored "
+                    f"(cut-off {self._last_candidate[0]:.2f})")
+
+    def _risk(self) -> float:
+        if len(self._candidates) < CANDIDATES:
+            return 1.0
+        # Unscored questions listed before the last candidate win ties with it;
+        # failed questions count as unscored, which only overstates the risk
+        last = -self._candidates[0][1]
+        pending_before = min(self.pending, last - bisect.bisect_left(self._scored_positions, last))
+        return change_risk(self._composites, self.pending, pending_before, self.max_score)
+
+    def update(self, scored_batch: List[Optional[tuple]]):
+        """
+        Add newly scored questions, then discard or start a speculation.
+
+        Args:
+            scored_batch: (analysis, relevance, depth) tuples; None for a failed question
+        """
+        stale = False
+        for item in scored_batch:
+            self.pending -= 1
+            if item is None:
+                continue
+            analysis, relevance, depth = item
+            question_id = analysis["original_question"]["id"]
+            self._items[question_id] = item
+            composite = CompositeScore(
+                question_id, relevance["overall_relevance_score"], depth["overall_depth_score"],
+                self.relevance_weight, self.depth_weight
+            ).composite_score
+            bisect.insort(self._composites, composite)
+            bisect.insort(self._scored_positions, self._position[question_id])
+            entry = (composite, -self._position[question_id])
+            heapq.heappush(self._candidates, entry)
+            if len(self._candidates) > CANDIDATES:
+                heapq.heappop(self._candidates)
+            stale = stale or self._last_candidate is None or entry > self._last_candidate
+
+        if self._future is not None:
+            if not stale:
+                return
+            logger.info("Speculative Judge discarded: a late question reached the candidates")
+            self._discard()
+        if self.pending > 0 and self.stats["issued"] < self.max_issues and self._risk() <= self.max_risk:
+            self._issue()
+
+    def resolve(self, reader_analyses: List[Dict[str, Any]], relevance_scores: List[Dict[str, Any]],
+                depth_scores: List[Dict[str, Any]]) -> Optional[Future]:
+        """
+        The speculative ranking, if it is valid for the final scores.
+
+        Returns:
+            Future of a JudgeAgent.rank_questions result whose composite
+            scores cover the whole bank, or None when the Judge has to be
+            called on the final scores
+        """
+        if self._future is None:
+            self.stats["misses"] += 1
+            return None
+        composite_scores, _, prompt = self.judge.candidate_prompt(
+            reader_analyses, relevance_scores, depth_scores, self.relevance_weight, self.depth_weight
+        )
+        if prompt != self._prompt:
+            self._discard()
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        result: Future = Future()
+
+        def finish(future: Future):
+            try:
+                ranking = future.result()
+            except Exception as e:
+                result.set_exception(e)
+                return
+            details = ranking.get("calculation_details")
+            if details is not None:
+                ranking = dict(ranking, calculation_details=dict(details, composite_scores=composite_scores))
+            result.set_result(ranking)
+
+        self._future.add_done_callback(finish)
+        return result
+
+    def close(self):
+        """Release the private pool; a running Judge call still completes."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
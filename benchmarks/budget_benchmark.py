@@ -0,0 +1,95 @@
+"""
+Plan and run a bank under shrinking token budgets, and compare planned
+with actual spend.
+
+Ranks a synthetic bank (the sample questions repeated with new ids) with
+the fake LLM: first without a budget, then at fractions of that run's
+tokens. Each run is planned with BudgetPlanner, its calls are charged to a
+UsageMeter, and the planner is calibrated after each run. Reports the
+strategies chosen, planned and actual tokens, and how many of the TOP 3
+match the unbudgeted run.
+
+    python benchmarks/budget_benchmark.py --count 200 --fractions 1.2 0.6 0.3 0.1 0.02
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(questions, agents, planner, budget, weight: float, concurrency: int):
+    from agents.budget import BudgetedPipeline
+    from agents.cascade import CascadePipeline
+    from agents.hedging import metered
+
+    plan = planner.plan(questions, budget, weight, 1.0 - weight)
+    meter = plan.meter()
+    reader, relevance, depth, judge = plan.agents(*agents)
+    process = BudgetedPipeline(CascadePipeline(reader, relevance, depth, weight, 1.0 - weight), plan, meter)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        reader_analyses, relevance_scores, depth_scores = map(list, zip(*executor.map(process, questions)))
+
+    with metered(meter):
+        if plan.judge:
+            ranking = judge.rank_questions(reader_analyses, relevance_scores, depth_scores, weight, 1.0 - weight)
+        else:
+            ranking = judge.rank_locally(reader_analyses, relevance_scores, depth_scores, weight, 1.0 - weight)
+        top = [q["question_id"] for q in ranking["top_3_questions"]]
+        analyses = {a["original_question"]["id"]: a for a in reader_analyses}
+        for scores, agent in ((relevance_scores, relevance), (depth_scores, depth)):
+            for result in scores:
+                if result["question_id"] in top:
+                    agent.explain(analyses[result["question_id"]], result)
+
+    planner.calibrate(meter)
+    return meter.report(plan), top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--fractions", type=float, nargs="+", default=[1.2, 0.6, 0.3, 0.1, 0.02],
+                        help="budgets as fractions of the unbudgeted run's tokens")
+    parser.add_argument("--reason-words", type=int, default=25, help="fake LLM words per justification")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    from agents.budget import Budget, BudgetPlanner
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.hedging import HedgedLLM
+    from agents.judge_agent import JudgeAgent
+    from agents.reader_agent import ReaderAgent
+    from agents.relevance_agent import RelevanceAgent
+
+    with open(os.path.join(ROOT, "data", "sample_questions.json")) as f:
+        sample = json.load(f)
+    questions = [dict(sample[i % len(sample)], id=i + 1,
+                      question_text=f"{sample[i % len(sample)]['question_text']} [{i}]")
+                 for i in range(args.count)]
+    llm = HedgedLLM(FakeLLM(reason_words=args.reason_words), hedge=False)
+    agents = (ReaderAgent(llm), RelevanceAgent(llm), DepthAgent(llm), JudgeAgent(llm))
+    planner = BudgetPlanner()
+    weight = 0.6
+
+    # Warm-up: calibrate the answer lengths, and measure the unbudgeted run
+    report, baseline = run(questions, agents, planner, Budget(max_tokens=10 ** 12), weight, args.concurrency)
+    full = report["actual"]["input_tokens"] + report["actual"]["output_tokens"]
+    print(f"{args.count} questions; unbudgeted run: {full} tokens, TOP 3 {baseline}")
+    print(f"{'budget':>9} {'planned':>9} {'actual':>9} {'within':>6} {'refused':>7} {'scored':>6} {'TOP 3':>5}  strategies")
+    for fraction in args.fractions:
+        budget = Budget(max_tokens=int(full * fraction))
+        report, top = run(questions, agents, planner, budget, weight, args.concurrency)
+        planned = report["planned"]["input_tokens"] + report["planned"]["output_tokens"]
+        actual = report["actual"]["input_tokens"] + report["actual"]["output_tokens"]
+        print(f"{budget.max_tokens:>9} {planned:>9} {actual:>9} {str(report['within_budget']):>6} "
+              f"{report['refused_calls']:>7} {report['scored_questions']:>6} "
+              f"{len(set(top) & set(baseline)):>3}/3  {', '.join(report['strategies']) or 'full'}")
+
+
+if __name__ == "__main__":
+    main()
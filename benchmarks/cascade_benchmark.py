@@ -0,0 +1,69 @@
+"""
+Measure how many Depth calls the early-exit cascade saves.
+
+Scores a synthetic bank with the fake LLM twice through the job queue,
+once with full scoring and once with CascadePipeline, and checks that
+both produce the same TOP 3.
+
+    python benchmarks/cascade_benchmark.py --questions 500 --weights 0.4 0.6 0.8
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.4, 0.6, 0.8])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    # Run from the repo root without shadowing the streamlit package
+    if sys.path and os.path.abspath(sys.path[0] or ".") == ROOT:
+        sys.path.pop(0)
+    sys.path.append(ROOT)
+
+    from agents.cascade import CascadePipeline
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.job_queue import JobQueue, agent_pipeline
+    from agents.reader_agent import ReaderAgent
+    from agents.records import compute_composite_scores
+    from agents.relevance_agent import RelevanceAgent
+
+    questions = [{"id": i, "question_text": f"Synthetic question {i}", "topic": "Physics",
+                  "tags": [], "bloom_level": "Apply"} for i in range(args.questions)]
+    depth_llm = FakeLLM()
+    reader, relevance, depth = ReaderAgent(FakeLLM()), RelevanceAgent(FakeLLM()), DepthAgent(depth_llm)
+    queue = JobQueue(agent_pipeline(reader, relevance, depth), num_workers=args.workers)
+
+    def top3(scored, weight):
+        ids = [a["original_question"]["id"] for a in scored["reader_analyses"]]
+        composites = compute_composite_scores(ids, scored["relevance_scores"], scored["depth_scores"],
+                                              weight, 1 - weight)
+        return [(c.question_id, round(c.composite_score, 6)) for c in composites[:3]]
+
+    print(f"questions={args.questions} workers={args.workers}")
+    for weight in args.weights:
+        depth_llm.calls = 0
+        job = queue.submit("bench", questions)
+        queue.wait(job)
+        full_calls = depth_llm.calls
+        expected = top3(queue.result(job), weight)
+
+        depth_llm.calls = 0
+        pipeline = CascadePipeline(reader, relevance, depth, weight, 1 - weight)
+        job = queue.submit("bench", questions, process=pipeline)
+        queue.wait(job)
+        got = top3(queue.result(job), weight)
+
+        print(f"  importance_weight={weight:.1f}  depth calls {full_calls} -> {depth_llm.calls} "
+              f"({100 * (1 - depth_llm.calls / full_calls):.0f}% saved)  same TOP 3: {got == expected}")
+    queue.shutdown()
+
+
+if __name__ == "__main__":
+    main()
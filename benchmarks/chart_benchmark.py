@@ -0,0 +1,48 @@
+"""
+Time the score charts for growing bank sizes.
+
+Builds the figures with charts.build_figures and serialises them to JSON
+(what Streamlit sends to the browser), with synthetic scores.
+
+    python benchmarks/chart_benchmark.py --sizes 10 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Run from the repo root without shadowing the streamlit package
+    if sys.path and os.path.abspath(sys.path[0] or ".") == ROOT:
+        sys.path.pop(0)
+    sys.path.append(ROOT)
+
+    from charts import build_figures
+
+    topics = [f"Topic {i}" for i in range(40)]
+    for size in args.sizes:
+        reader = [{"original_question": {"id": i, "topic": random.choice(topics)}} for i in range(size)]
+        relevance = [{"question_id": i, "overall_relevance_score": random.randint(1, 10)} for i in range(size)]
+        depth = [{"question_id": i, "overall_depth_score": random.randint(1, 10)} for i in range(size)]
+
+        timings = []
+        payload = 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            figures = build_figures(reader, relevance, depth)
+            payload = sum(len(f.to_json()) for f in figures)
+            timings.append(time.perf_counter() - start)
+        print(f"  {size:>7} questions  {1000 * min(timings):7.1f} ms  {len(figures)} figure(s)  {payload / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measure how sharded ranking scales with the number of worker processes.
+
+Submits a synthetic bank (the sample questions repeated with new ids) to a
+SQLite shard queue, starts N `python -m agents.distributed worker`
+processes on the fake LLM, and times the run from submission until every
+shard is done (after a warm-up run, so process start-up is not counted). The
+merged TOP 3 is checked against ranking the same results in one process.
+
+    python benchmarks/distributed_benchmark.py --count 2000 --workers 1 2 4 8 --latency 0.05
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(questions, workers: int, args) -> tuple:
+    from agents.distributed import Coordinator, ShardStore, SQLiteShardQueue
+    from agents.judge_agent import JudgeAgent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue_path, store_path = os.path.join(tmp, "queue.db"), os.path.join(tmp, "store")
+        coordinator = Coordinator(SQLiteShardQueue(queue_path), ShardStore(store_path))
+        env = dict(os.environ, JEE_FAKE_LLM="1", JEE_FAKE_LLM_LATENCY=str(args.latency),
+                   PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        command = [sys.executable, "-m", "agents.distributed", "--queue", queue_path, "--store", store_path,
+                   "worker", "--concurrency", str(args.concurrency), "--poll-interval", "0.05"]
+        processes = [subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL) for _ in range(workers)]
+        try:
+            # Warm-up: one small shard per worker, so start-up is not timed
+            coordinator.wait(coordinator.submit(questions[:workers * 2], shard_size=2), poll_interval=0.05)
+
+            start = time.perf_counter()
+            run_id = coordinator.submit(questions, shard_size=args.shard_size, by=args.by)
+            status = coordinator.wait(run_id, poll_interval=0.05)
+            elapsed = time.perf_counter() - start
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+        merged = tuple(q["question_id"] for q in coordinator.rank(run_id)["top_3_questions"])
+        results = list(coordinator.iter_results(run_id))
+        single = JudgeAgent(None).rank_locally(*(list(column) for column in zip(*results)))
+        single = tuple(q["question_id"] for q in single["top_3_questions"])
+    return elapsed, status, merged, single
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds per call")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions scored at once per worker")
+    parser.add_argument("--shard-size", type=int, default=100)
+    parser.add_argument("--by", choices=("id", "topic"), default="id")
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    with open(os.path.join(ROOT, "data", "sample_questions.json")) as f:
+        sample = json.load(f)
+    questions = [dict(sample[i % len(sample)], id=i + 1,
+                      question_text=f"{sample[i % len(sample)]['question_text']} [{i}]")
+                 for i in range(args.count)]
+
+    print(f"{args.count} questions, shards of {args.shard_size} by {args.by}, "
+          f"{args.concurrency} questions at once per worker, {args.latency}s per LLM call")
+    baseline = None
+    for workers in args.workers:
+        elapsed, status, merged, single = run(questions, workers, args)
+        baseline = baseline or elapsed * workers
+        print(f"{workers:>3} workers: {elapsed:7.2f}s  {args.count / elapsed:8.1f} questions/s  "
+              f"speed-up {baseline / elapsed:5.2f}x  "
+              f"efficiency {baseline / elapsed / workers:4.0%}  "
+              f"shards done {status['done']}/{status['total']}  same TOP 3: {merged == single}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measure time to the first Judge result with and without streaming.
+
+Ranks the scored sample questions with the Judge Agent through the fake
+LLM, which sleeps per output token like a real model: once with
+rank_questions (nothing to show until the whole answer is parsed) and once
+with stream_ranking, recording when the first ranked question, all three
+and the complete ranking arrived.
+
+    python benchmarks/judge_stream_benchmark.py --latency 0.3 --token-latency 0.004 --reason-words 60
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.004,
+                        help="Seconds per output token (0.004 is about 250 tokens/s)")
+    parser.add_argument("--reason-words", type=int, default=60, help="Words of reasoning per question")
+    parser.add_argument("--questions", default=os.path.join(ROOT, "data", "sample_questions.json"))
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.hedging import HedgedLLM
+    from agents.judge_agent import JudgeAgent
+    from agents.reader_agent import ReaderAgent
+    from agents.relevance_agent import RelevanceAgent
+
+    with open(args.questions) as f:
+        questions = json.load(f)
+    analyses = ReaderAgent(None, backend="rules").analyze_all_questions(questions)
+    relevance = [RelevanceAgent(FakeLLM()).score_question(a) for a in analyses]
+    depth = [DepthAgent(FakeLLM()).score_question(a) for a in analyses]
+    judge = JudgeAgent(HedgedLLM(FakeLLM(latency=args.latency, token_latency=args.token_latency,
+                                         reason_words=args.reason_words), hedge=False))
+
+    start = time.perf_counter()
+    ranking = judge.rank_questions(analyses, relevance, depth)
+    blocking = time.perf_counter() - start
+
+    first = all_three = None
+    start = time.perf_counter()
+    for streamed in judge.stream_ranking(analyses, relevance, depth):
+        count = len(streamed["top_3_questions"])
+        if first is None and count:
+            first = time.perf_counter() - start
+        if all_three is None and count == 3:
+            all_three = time.perf_counter() - start
+    total = time.perf_counter() - start
+
+    print(f"  rank_questions  first result {blocking:6.2f}s  complete {blocking:6.2f}s")
+    print(f"  stream_ranking  first result {first:6.2f}s  all three {all_three:6.2f}s  complete {total:6.2f}s")
+    print(f"  same ranking: {streamed == ranking}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time personalized TOP 3 rankings for many students over one scored bank.
+
+Builds agents.personalized.ScoredBank for a synthetic bank and ranks it for
+every student: with an importance weight each, and with ten per-criterion
+weights each. The first students are checked against
+compute_composite_scores.
+
+    python benchmarks/personalized_benchmark.py --questions 50000 --students 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50000)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--checks", type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    from agents.personalized import ScoredBank
+    from agents.records import RELEVANCE_CRITERIA, DEPTH_CRITERIA, compute_composite_scores
+
+    rng = random.Random(0)
+    ids = list(range(args.questions))
+    relevance, depth = [], []
+    for i in ids:
+        relevance.append({"question_id": i, "overall_relevance_score": round(rng.uniform(1, 10), 2),
+                          **{c: rng.randint(1, 10) for c in RELEVANCE_CRITERIA}})
+        depth.append({"question_id": i, "overall_depth_score": round(rng.uniform(1, 10), 2),
+                      **{c: rng.randint(1, 10) for c in DEPTH_CRITERIA}})
+
+    start = time.perf_counter()
+    bank = ScoredBank(ids, relevance, depth)
+    print(f"  bank of {args.questions} questions built in {time.perf_counter() - start:.2f}s")
+
+    importance = [rng.random() for _ in range(args.students)]
+    criteria = [[rng.random() for _ in range(10)] for _ in range(args.students)]
+    for name, weights in (("importance weight", importance), ("per-criterion weights", criteria)):
+        start = time.perf_counter()
+        top_ids, _ = bank.top_k(weights, 3)
+        elapsed = time.perf_counter() - start
+
+        mismatches = 0
+        for student in range(min(args.checks, args.students)):
+            if name == "importance weight":
+                weight = importance[student]
+                composites = compute_composite_scores(ids, relevance, depth, weight, 1 - weight)
+                expected = [c.question_id for c in composites[:3]]
+            else:
+                w = criteria[student]
+                totals = [sum(wc * r[c] for wc, c in zip(w[:5], RELEVANCE_CRITERIA))
+                          + sum(wc * d[c] for wc, c in zip(w[5:], DEPTH_CRITERIA))
+                          for r, d in zip(relevance, depth)]
+                expected = sorted(ids, key=lambda i: -totals[i])[:3]
+            mismatches += list(top_ids[student]) != expected
+        print(f"  {args.students} students, {name:<22} {elapsed:6.2f}s "
+              f"({1e6 * elapsed / args.students:6.1f} us/student)  mismatches {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
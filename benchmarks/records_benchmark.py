@@ -0,0 +1,77 @@
+"""
+Measure the memory a job holds per scored question, as agent result
+dictionaries or as the compact records the JobQueue keeps.
+
+Scores `--questions` generated questions with the fake LLM and reports the
+memory retained (tracemalloc) for their (analysis, relevance, depth)
+results in each form. The questions themselves are allocated beforehand
+and not counted; the dictionaries hold a reference to them, the records
+only their ids.
+
+    python benchmarks/records_benchmark.py --questions 10000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOPICS = ("Physics", "Chemistry", "Mathematics")
+TAGS = ("kinematics", "optics", "thermodynamics", "calculus", "algebra", "organic chemistry")
+
+
+def retained(keep):
+    """Bytes still allocated after keep() returns what it built."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = keep()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--reason-words", type=int, default=12, help="fake LLM words per justification")
+    args = parser.parse_args()
+
+    # Run from the repo root without shadowing the streamlit package
+    if sys.path and os.path.abspath(sys.path[0] or ".") == ROOT:
+        sys.path.pop(0)
+    sys.path.append(ROOT)
+    logging.disable(logging.INFO)
+
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.job_queue import agent_pipeline
+    from agents.reader_agent import ReaderAgent
+    from agents.records import compact_scored
+    from agents.relevance_agent import RelevanceAgent
+
+    rng = random.Random(0)
+    questions = [{
+        "id": i,
+        "question_text": f"Question {i}: a particle moves at {i} m/s; find its acceleration and kinetic energy.",
+        "topic": rng.choice(TOPICS),
+        "tags": rng.sample(TAGS, 2),
+        "bloom_level": "Apply",
+    } for i in range(args.questions)]
+    llm = FakeLLM(reason_words=args.reason_words)
+    process = agent_pipeline(ReaderAgent(llm), RelevanceAgent(llm), DepthAgent(llm))
+
+    process(questions[0])  # warm up the agents' lazy imports and prompt caches
+    as_dicts = retained(lambda: [process(q) for q in questions])
+    as_records = retained(lambda: [compact_scored(process(q), q) for q in questions])
+
+    print(f"questions={args.questions} reason_words={args.reason_words}")
+    print(f"  dictionaries {as_dicts / args.questions:8.0f} bytes/question")
+    print(f"  records      {as_records / args.questions:8.0f} bytes/question")
+
+
+if __name__ == "__main__":
+    main()
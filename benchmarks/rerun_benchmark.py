@@ -0,0 +1,104 @@
+"""
+Measure the cost of a Streamlit script rerun once results are on screen.
+
+Runs streamlit.py headlessly with streamlit.testing.AppTest, offline: picks
+the sample questions, clicks "Start AI Analysis" and then times plain
+reruns of the results page (what every widget interaction costs). The
+analysis itself is timed once. Pass --app to time another checkout, e.g.
+the code before caching was added:
+
+    git worktree add /tmp/baseline 598f396
+    python benchmarks/rerun_benchmark.py --runs 20 --app /tmp/baseline
+    python benchmarks/rerun_benchmark.py --runs 20
+
+Each checkout is measured in its own interpreter so their `agents`
+packages do not mix. Checkouts that predate JEE_FAKE_LLM get the same
+FakeLLM through langchain_groq.ChatGroq.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _offline_llm(latency: float):
+    """Replace ChatGroq with the repo's FakeLLM for checkouts without JEE_FAKE_LLM."""
+    import langchain_groq
+
+    spec = importlib.util.spec_from_file_location("_bench_fake_llm", os.path.join(ROOT, "agents", "fake_llm.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    langchain_groq.ChatGroq = lambda **kwargs: module.FakeLLM(latency=latency)
+
+
+def _click(app, label: str):
+    next(button for button in app.button if button.label == label).click()
+    app.run()
+
+
+def measure(app_dir: str, runs: int, latency: float):
+    """Time one analysis and `runs` reruns of its results page in `app_dir`."""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.setdefault("GROQ_API_KEY", "offline")
+    os.environ["JEE_FAKE_LLM"] = "1"
+    os.environ["JEE_FAKE_LLM_LATENCY"] = str(latency)
+    _offline_llm(latency)
+    # streamlit.py shadows the streamlit package if app_dir comes first
+    sys.path.append(app_dir)
+    os.chdir(app_dir)
+
+    app = AppTest.from_file(os.path.join(app_dir, "streamlit.py"), default_timeout=300)
+    app.run()
+    _click(app, "Use Sample Questions")
+    start = time.perf_counter()
+    _click(app, "Start AI Analysis")
+    analysis = (time.perf_counter() - start) * 1000
+    if app.exception or not app.session_state["analysis_complete"]:
+        raise RuntimeError(f"analysis did not complete in {app_dir}")
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"analysis": analysis, "reruns": timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.01, help="FakeLLM seconds per call")
+    parser.add_argument("--app", default=ROOT, help="checkout whose streamlit.py is measured")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    app_dir = os.path.abspath(args.app)
+
+    if args.worker:
+        print(json.dumps(measure(app_dir, args.runs, args.latency)))
+        return
+
+    # Run from the parent directory so streamlit.py cannot shadow the package
+    worker = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", "--app", app_dir,
+         "--runs", str(args.runs), "--latency", str(args.latency)],
+        cwd=os.path.dirname(app_dir), capture_output=True, text=True
+    )
+    if worker.returncode != 0:
+        sys.exit(worker.stderr)
+    result = json.loads(worker.stdout.strip().splitlines()[-1])
+    timings = result["reruns"]
+    print(f"app: {app_dir}")
+    print(f"analysis           {result['analysis']:8.1f} ms")
+    print(f"results rerun      mean {statistics.mean(timings):8.1f} ms   "
+          f"median {statistics.median(timings):8.1f} ms   max {max(timings):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure server memory for many sessions' results, kept per session or in
+the shared ResultStore.
+
+Simulates `--sessions` students each analyzing the sample set with the fake
+LLM at a sampling temperature, so their scores differ as a real model's
+would. Reports the memory retained (tracemalloc) when every session keeps
+its own results, as session state used to, when each session's results go
+into the store (identical records and the questions are shared), and when
+sessions reuse the stored analysis of the bank, as the app does. A last run
+caps the store at `--max-mb` to show eviction.
+
+    python benchmarks/result_store_benchmark.py --sessions 300 --max-mb 0.5
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def analyze(questions, agents):
+    reader, relevance, depth = agents
+    analyses = [reader.analyze_question(q) for q in questions]
+    return {
+        "reader_analyses": analyses,
+        "relevance_scores": [relevance.score_question(a) for a in analyses],
+        "depth_scores": [depth.score_question(a) for a in analyses],
+    }
+
+
+def retained(keep):
+    """Bytes still allocated after keep() returns what it built."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = keep()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--temperature", type=float, default=0.7, help="fake LLM sampling temperature")
+    parser.add_argument("--reason-words", type=int, default=25, help="fake LLM words per justification")
+    parser.add_argument("--max-mb", type=float, default=0.5, help="store size for the eviction run")
+    args = parser.parse_args()
+
+    # Run from the repo root without shadowing the streamlit package
+    if sys.path and os.path.abspath(sys.path[0] or ".") == ROOT:
+        sys.path.pop(0)
+    sys.path.append(ROOT)
+
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.reader_agent import ReaderAgent
+    from agents.relevance_agent import RelevanceAgent
+    from agents.result_store import ResultStore
+
+    with open(os.path.join(ROOT, "data", "sample_questions.json")) as f:
+        sample = json.load(f)
+    llm = FakeLLM(temperature=args.temperature, reason_words=args.reason_words)
+    agents = (ReaderAgent(llm), RelevanceAgent(llm), DepthAgent(llm))
+
+    def per_session():
+        return [analyze(sample, agents) for _ in range(args.sessions)]
+
+    def stored(store, share):
+        handles = []
+        for _ in range(args.sessions):
+            handle = store.find("sample") if share else None
+            if handle is None:
+                handle = store.put(analyze(sample, agents), bank="sample")
+            handles.append(handle)
+        return store, handles
+
+    print(f"{args.sessions} sessions analyzing the {len(sample)} sample questions")
+    print(f"{'layout':<28} {'retained':>12} {'per session':>12}  store figures")
+    rows = [("per-session state", per_session, None)]
+    for label, share, max_bytes in (("store, no reuse", False, None), ("store, reusing the bank", True, None),
+                                    (f"store capped at {args.max_mb} MB", False, int(args.max_mb * 1024 ** 2))):
+        store = ResultStore(max_bytes=max_bytes or 256 * 1024 ** 2)
+        rows.append((label, lambda store=store, share=share: stored(store, share), store))
+    for label, keep, store in rows:
+        used = retained(keep)
+        figures = ""
+        if store is not None:
+            stats = store.memory_stats()
+            figures = (f"{stats['entries']} results, {stats['records']} records, "
+                       f"{stats['stored_bytes'] / 1024:,.0f} KiB held of {stats['undeduplicated_bytes'] / 1024:,.0f} KiB, "
+                       f"{stats['evicted_lru']} evicted")
+        print(f"{label:<28} {used / 1024 ** 2:>9.2f} MB {used / args.sessions / 1024:>9.1f} KB  {figures}")
+
+
+if __name__ == "__main__":
+    main()
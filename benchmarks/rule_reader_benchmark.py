@@ -0,0 +1,49 @@
+"""
+Measure the rule-based Reader's throughput and agreement with curated metadata.
+
+Analyzes the sample questions (repeated to --count questions) on one core,
+and compares the rule topic and Bloom level with the questions' own fields.
+
+    python benchmarks/rule_reader_benchmark.py --count 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--questions", default=os.path.join(ROOT, "data", "sample_questions.json"))
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    from agents.rule_reader import RuleBasedReader
+
+    with open(args.questions) as f:
+        questions = json.load(f)
+    reader = RuleBasedReader()
+
+    topic_hits = bloom_hits = 0
+    for question in questions:
+        analysis = reader.analyze_text(question["question_text"])
+        topic_hits += analysis["main_topic"] == question.get("topic")
+        bloom_hits += analysis["bloom_level"] == question.get("bloom_level")
+        print(f"  Q{question['id']:<3} {analysis['main_topic']:<20} {analysis['bloom_level']:<10} "
+              f"{analysis['question_type']:<11} complexity {analysis['complexity_score']:>2}  {analysis['difficulty']}")
+    print(f"Topic agreement: {topic_hits}/{len(questions)}  Bloom agreement: {bloom_hits}/{len(questions)}")
+
+    texts = [questions[i % len(questions)]["question_text"] for i in range(args.count)]
+    start = time.perf_counter()
+    for text in texts:
+        reader.analyze_text(text)
+    elapsed = time.perf_counter() - start
+    print(f"{args.count} questions in {elapsed:.2f}s ({args.count / elapsed:,.0f} questions/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare TOP 3 stability of single-shot, uniform and adaptive sampling.
+
+Uses the fake LLM: at temperature 0.1 its scores are the "true" scores,
+and at a higher temperature each call adds noise. For each trial the
+bank is scored once with noise, then the same extra-call budget is spent
+either spread evenly over the bank or with AdaptiveSampler. Reports how
+often each method recovers the true TOP 3.
+
+    python benchmarks/sampling_benchmark.py --questions 30 --budget 20 --trials 50
+"""
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def top3(relevance_scores, depth_scores, weight):
+    from agents.records import compute_composite_scores
+    ids = [r["question_id"] for r in relevance_scores]
+    return {c.question_id for c in compute_composite_scores(ids, relevance_scores, depth_scores, weight, 1 - weight)[:3]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=20, help="extra calls per trial")
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--weight", type=float, default=0.6)
+    args = parser.parse_args()
+
+    # Run from the repo root without shadowing the streamlit package
+    if sys.path and os.path.abspath(sys.path[0] or ".") == ROOT:
+        sys.path.pop(0)
+    sys.path.append(ROOT)
+
+    from agents.adaptive import AdaptiveSampler, aggregate_samples
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.records import RELEVANCE_CRITERIA, DEPTH_CRITERIA
+    from agents.relevance_agent import RelevanceAgent
+
+    analyses = [{
+        "main_topic": "Physics", "sub_topics": [], "bloom_level": "Apply", "question_type": "numerical",
+        "difficulty": "Medium", "key_principles": [], "complexity_score": 5,
+        "original_question": {"id": i, "question_text": f"Question {i}", "topic": "Physics",
+                              "tags": [], "bloom_level": "Apply"},
+    } for i in range(args.questions)]
+
+    exact = RelevanceAgent(FakeLLM()), DepthAgent(FakeLLM())
+    noisy = (RelevanceAgent(FakeLLM(temperature=args.temperature)),
+             DepthAgent(FakeLLM(temperature=args.temperature)))
+    truth = top3([exact[0].score_question(a) for a in analyses],
+                 [exact[1].score_question(a) for a in analyses], args.weight)
+
+    hits = {"single-shot": 0, "uniform": 0, "adaptive": 0}
+    for _ in range(args.trials):
+        relevance = [noisy[0].score_question(a) for a in analyses]
+        depth = [noisy[1].score_question(a) for a in analyses]
+        hits["single-shot"] += top3(relevance, depth, args.weight) == truth
+
+        # Uniform: one extra relevance or depth sample for randomly chosen questions
+        extra = {i: ([relevance[i]], [depth[i]]) for i in range(args.questions)}
+        for i in random.sample(range(args.questions), min(args.budget // 2, args.questions)):
+            extra[i][0].append(noisy[0].score_question(analyses[i]))
+            extra[i][1].append(noisy[1].score_question(analyses[i]))
+        uniform_r = [aggregate_samples(extra[i][0], RELEVANCE_CRITERIA, "overall_relevance_score") for i in extra]
+        uniform_d = [aggregate_samples(extra[i][1], DEPTH_CRITERIA, "overall_depth_score") for i in extra]
+        hits["uniform"] += top3(uniform_r, uniform_d, args.weight) == truth
+
+        sampler = AdaptiveSampler(*noisy, budget=args.budget)
+        adaptive_r, adaptive_d, _ = sampler.refine(analyses, relevance, depth, args.weight, 1 - args.weight)
+        hits["adaptive"] += top3(adaptive_r, adaptive_d, args.weight) == truth
+
+    print(f"questions={args.questions} extra_budget={args.budget} temperature={args.temperature} trials={args.trials}")
+    for method, count in hits.items():
+        print(f"  {method:<12} exact TOP 3 in {count}/{args.trials} trials")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Time the TOP 3 schedule against re-sorting the bank on every slider move.
+
+Builds agents.parametric.build_schedule for synthetic banks, checks its
+lookups against compute_composite_scores at random weights, and compares
+lookup and re-sort times. Then checks small banks of whole-number scores,
+which tie often, against an exact brute-force ranking at every slider
+position from 0.0 to 1.0, endpoints included.
+
+    python benchmarks/schedule_benchmark.py --sizes 10 1000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from fractions import Fraction
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--checks", type=int, default=50)
+    parser.add_argument("--tie-banks", type=int, default=2000, help="small banks with tied scores to check")
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    from agents.parametric import build_schedule
+    from agents.records import compute_composite_scores
+
+    rng = random.Random(0)
+    for size in args.sizes:
+        ids = list(range(size))
+        # Averaged (adaptive) scores are not whole numbers, so use two decimals
+        relevance = [{"question_id": i, "overall_relevance_score": round(rng.uniform(1, 10), 2)} for i in ids]
+        depth = [{"question_id": i, "overall_depth_score": round(rng.uniform(1, 10), 2)} for i in ids]
+
+        start = time.perf_counter()
+        schedule = build_schedule(ids, relevance, depth)
+        build = time.perf_counter() - start
+
+        weights = [rng.random() for _ in range(args.checks)]
+        start = time.perf_counter()
+        for weight in weights:
+            schedule.lookup(weight)
+        lookup = (time.perf_counter() - start) / len(weights)
+
+        mismatches = 0
+        start = time.perf_counter()
+        for weight in weights:
+            composites = compute_composite_scores(ids, relevance, depth, weight, 1 - weight)
+            mismatches += tuple(c.question_id for c in composites[:3]) != schedule.lookup(weight)
+        resort = (time.perf_counter() - start) / len(weights)
+
+        print(f"  {size:>7} questions  build {1000 * build:8.1f} ms  {len(schedule.points) - 2:3} breakpoints  "
+              f"{schedule.candidates:4} candidates  {len(schedule.distinct_sets()):3} TOP 3 sets  "
+              f"lookup {1e6 * lookup:5.1f} us  re-sort {1000 * resort:7.1f} ms  mismatches {mismatches}")
+
+    # Exact ranking with bank order breaking ties; floats would turn some
+    # ties at interior weights into spurious differences
+    wrong_banks = wrong_lookups = 0
+    for _ in range(args.tie_banks):
+        ids = list(range(1, 11))
+        rng.shuffle(ids)
+        relevance = {i: rng.randint(1, 5) for i in ids}
+        depth = {i: rng.randint(1, 5) for i in ids}
+        schedule = build_schedule(
+            ids,
+            [{"question_id": i, "overall_relevance_score": r} for i, r in relevance.items()],
+            [{"question_id": i, "overall_depth_score": d} for i, d in depth.items()]
+        )
+        wrong = 0
+        for step in range(11):
+            weight = Fraction(step, 10)
+            expected = sorted(ids, key=lambda i: (-(weight * relevance[i] + (1 - weight) * depth[i]), ids.index(i)))
+            wrong += tuple(expected[:3]) != schedule.lookup(step / 10)
+        wrong_banks += wrong > 0
+        wrong_lookups += wrong
+    print(f"  tied scores: {wrong_banks} of {args.tie_banks} banks and {wrong_lookups} of "
+          f"{11 * args.tie_banks} slider positions differ from the brute-force TOP 3")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark the HTTP ranking service against a fake LLM.
+
+Sends concurrent /rank requests in-process (httpx ASGI transport, no
+network) and reports latency plus how many agent calls were actually made,
+which shows the effect of request coalescing and the result cache.
+
+    python benchmarks/service_benchmark.py --clients 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run(clients: int, latency: float, concurrency: int, distinct: int):
+    import httpx
+    from agents.fake_llm import FakeLLM
+    from service.app import create_app
+    from service.ranking_service import RankingService
+
+    with open(os.path.join(ROOT, "data", "sample_questions.json")) as f:
+        sample = json.load(f)
+
+    llm = FakeLLM(latency=latency)
+    service = RankingService(llm=llm, max_concurrency=concurrency)
+    app = create_app(service)
+
+    # distinct > 1 gives some clients different banks (shifted ids) so not every request coalesces
+    banks = []
+    for b in range(distinct):
+        banks.append([dict(q, id=q["id"] + 1000 * b) for q in sample])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i):
+            start = time.perf_counter()
+            response = await client.post("/rank", json={"questions": banks[i % distinct], "importance_weight": 0.6}, timeout=None)
+            response.raise_for_status()
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(one(i) for i in range(clients)))
+        wall = (time.perf_counter() - start) * 1000
+        stats = (await client.get("/stats")).json()
+
+    uncoalesced_calls = clients * (3 * len(sample) + 1)
+    print(f"clients={clients} distinct_banks={distinct} fake_latency={latency * 1000:.0f}ms concurrency={concurrency}")
+    print(f"  wall time        {wall:8.1f} ms")
+    print(f"  request latency  mean {statistics.mean(timings):8.1f} ms   max {max(timings):8.1f} ms")
+    print(f"  LLM calls        {llm.calls} (without coalescing/caching: {uncoalesced_calls})")
+    print(f"  coalesced waits  {stats['coalesced']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds per call")
+    parser.add_argument("--concurrency", type=int, default=16, help="agent thread pool size")
+    parser.add_argument("--distinct", type=int, default=2, help="number of distinct question banks")
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    asyncio.run(run(args.clients, args.latency, args.concurrency, args.distinct))
+
+
+if __name__ == "__main__":
+    main()
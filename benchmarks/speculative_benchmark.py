@@ -0,0 +1,66 @@
+"""
+Compare end-to-end ranking latency with and without the speculative Judge.
+
+Ranks a synthetic bank (the sample questions repeated with new ids) through
+RankingService and the fake LLM, with a fresh service per run so nothing
+is cached, and reports latency and how often the speculation was used.
+
+    python benchmarks/speculative_benchmark.py --count 200 --latency 0.2 --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run_once(questions, latency: float, token_latency: float, concurrency: int,
+                   speculative: bool, weight: float):
+    from agents.fake_llm import FakeLLM
+    from service.ranking_service import RankingService
+
+    service = RankingService(llm=FakeLLM(latency=latency, token_latency=token_latency),
+                             max_concurrency=concurrency, speculative=speculative)
+    try:
+        start = time.perf_counter()
+        ranking = await service.rank(questions, weight)
+        elapsed = time.perf_counter() - start
+    finally:
+        service.close()
+    top = tuple(q["question_id"] for q in ranking["top_3_questions"])
+    return elapsed, top, service.speculation_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds per call")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="fake LLM seconds per output token")
+    parser.add_argument("--concurrency", type=int, default=16, help="agent thread pool size")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    with open(os.path.join(ROOT, "data", "sample_questions.json")) as f:
+        sample = json.load(f)
+
+    for run in range(args.runs):
+        # Different texts per run give different scores, so each run is a new bank
+        questions = [dict(sample[i % len(sample)], id=i + 1,
+                          question_text=f"{sample[i % len(sample)]['question_text']} [{run}.{i}]")
+                     for i in range(args.count)]
+        weight = 0.6
+        baseline, top, _ = asyncio.run(run_once(questions, args.latency, args.token_latency,
+                                                args.concurrency, False, weight))
+        speculative, speculative_top, stats = asyncio.run(run_once(questions, args.latency, args.token_latency,
+                                                                   args.concurrency, True, weight))
+        print(f"  run {run}: {args.count} questions  without {baseline:6.2f}s  with {speculative:6.2f}s  "
+              f"saved {baseline - speculative:5.2f}s  issued {stats['issued']} discarded {stats['discarded']} "
+              f"{'hit' if stats['hits'] else 'miss'}  same TOP 3: {top == speculative_top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measure cold-start latency and report where import time goes.
+
+Each measurement runs in a fresh interpreter so nothing is cached in
+sys.modules. Reports wall time for importing the agents package and for a
+first bare-mode run of streamlit.py, then the slowest top-level imports
+from `python -X importtime`.
+
+    python benchmarks/startup_benchmark.py --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "streamlit.py")
+
+# streamlit.py shadows the streamlit package when the project directory comes
+# first on sys.path, so the current-directory entry is dropped and ROOT is
+# appended instead.
+TARGETS = {
+    "import agents": f"import sys; sys.path.pop(0); sys.path.append({ROOT!r}); import agents",
+    "first app run": (
+        f"import sys, os, runpy; sys.path.pop(0); sys.path.append({ROOT!r}); os.chdir({ROOT!r}); "
+        f"runpy.run_path({APP!r}, run_name='__main__')"
+    ),
+}
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    args = [sys.executable]
+    if importtime:
+        args += ["-X", "importtime"]
+    args += ["-c", code]
+    return subprocess.run(args, cwd=os.path.dirname(ROOT), capture_output=True, text=True)
+
+
+def measure(code: str, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = _run(code)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return timings
+
+
+def import_profile(code: str, top: int):
+    """Parse -X importtime output into (cumulative_us, self_us, module) for top-level imports."""
+    rows = []
+    for line in _run(code, importtime=True).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            continue  # nested import, already counted in its parent's cumulative time
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    print("Cold start (fresh interpreter per run)")
+    for label, code in TARGETS.items():
+        timings = measure(code, args.runs)
+        print(f"  {label:<16} mean {statistics.mean(timings):8.1f} ms   "
+              f"min {min(timings):8.1f} ms   max {max(timings):8.1f} ms")
+
+    for label, code in TARGETS.items():
+        print(f"\nSlowest top-level imports: {label}")
+        print(f"  {'cumulative':>12} {'self':>10}  module")
+        for cumulative_us, self_us, name in import_profile(code, args.top):
+            print(f"  {cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
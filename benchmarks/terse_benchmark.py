@@ -0,0 +1,63 @@
+"""
+Compare per-question scoring time with and without terse mode.
+
+Scores the sample questions with Relevance and Depth through the fake LLM,
+which sleeps per output token like a real model, once with full
+justifications and once scores-only, then explains the TOP 3 lazily.
+
+    python benchmarks/terse_benchmark.py --token-latency 0.004 --reason-words 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--token-latency", type=float, default=0.004,
+                        help="Seconds per output token (0.004 is about 250 tokens/s)")
+    parser.add_argument("--reason-words", type=int, default=30,
+                        help="Words per justification in full mode")
+    parser.add_argument("--questions", default=os.path.join(ROOT, "data", "sample_questions.json"))
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    from agents.depth_agent import DepthAgent
+    from agents.fake_llm import FakeLLM
+    from agents.reader_agent import ReaderAgent
+    from agents.records import compute_composite_scores
+    from agents.relevance_agent import RelevanceAgent
+
+    with open(args.questions) as f:
+        questions = json.load(f)
+    analyses = ReaderAgent(None, backend="rules").analyze_all_questions(questions)
+    llm = FakeLLM(token_latency=args.token_latency, reason_words=args.reason_words)
+
+    for terse in (False, True):
+        relevance, depth = RelevanceAgent(llm, terse), DepthAgent(llm, terse)
+        start = time.perf_counter()
+        relevance_scores = [relevance.score_question(a) for a in analyses]
+        depth_scores = [depth.score_question(a) for a in analyses]
+        scoring = time.perf_counter() - start
+
+        composites = compute_composite_scores([a["original_question"]["id"] for a in analyses],
+                                              relevance_scores, depth_scores, 0.6, 0.4)
+        top_ids = {c.question_id for c in composites[:3]}
+        start = time.perf_counter()
+        for analysis, r, d in zip(analyses, relevance_scores, depth_scores):
+            if analysis["original_question"]["id"] in top_ids:
+                relevance.explain(analysis, r)
+                depth.explain(analysis, d)
+        explaining = time.perf_counter() - start
+
+        per_question = 1000 * scoring / len(analyses)
+        print(f"{'terse' if terse else 'full ':<5}  scoring {per_question:7.1f} ms/question  "
+              f"explaining TOP 3 {1000 * explaining:7.1f} ms  total {scoring + explaining:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# Score charts for the Streamlit app.
+#
+# Small banks get one bar pair per question. Larger banks are summarised
+# so the figure size does not grow with the bank: a topic rollup plus a
+# WebGL scatter, or a binned heatmap once the scatter would be too heavy.
+
+from collections import Counter, defaultdict
+from typing import Dict, List, Any, Tuple
+
+RELEVANCE_COLOR = "#3498db"
+DEPTH_COLOR = "#e74c3c"
+
+# Up to this many questions each one gets its own bars
+BAR_LIMIT = 50
+# Up to this many questions the scatter shows every point
+SCATTER_LIMIT = 5000
+# Topics beyond this many (by question count) are merged into "Other"
+MAX_TOPICS = 25
+
+
+def chart_rows(reader_analyses: List[Dict[str, Any]],
+               relevance_scores: List[Dict[str, Any]],
+               depth_scores: List[Dict[str, Any]]) -> List[Tuple[Any, str, float, float]]:
+    """(question_id, topic, relevance, depth) for every fully scored question."""
+    relevance_by_id = {r["question_id"]: r["overall_relevance_score"] for r in relevance_scores}
+    depth_by_id = {d["question_id"]: d["overall_depth_score"] for d in depth_scores}
+    rows = []
+    for analysis in reader_analyses:
+        question = analysis["original_question"]
+        question_id = question["id"]
+        if question_id in relevance_by_id and question_id in depth_by_id:
+            rows.append((question_id, question.get("topic", "Unknown"),
+                         relevance_by_id[question_id], depth_by_id[question_id]))
+    return rows
+
+
+def _layout(fig, title: str, x_title: str, y_title: str):
+    fig.update_layout(
+        title=title,
+        height=450,
+        showlegend=True,
+        title_font_size=16,
+        xaxis_title=x_title,
+        yaxis_title=y_title,
+        legend_title_text="What We Measured",
+    )
+    return fig
+
+
+def question_bars(rows):
+    import plotly.graph_objects as go
+
+    labels = [f"Q{r[0]}" for r in rows]
+    fig = go.Figure([
+        go.Bar(name="Exam Likelihood", x=labels, y=[r[2] for r in rows], marker_color=RELEVANCE_COLOR),
+        go.Bar(name="Challenge Level", x=labels, y=[r[3] for r in rows], marker_color=DEPTH_COLOR),
+    ])
+    fig.update_layout(barmode="group")
+    return _layout(fig, "📊 Complete Analysis: All Questions Scored", "Questions", "AI Score (0-10)")
+
+
+def topic_rollup(rows):
+    """Mean scores per topic, largest topics first."""
+    import plotly.graph_objects as go
+
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    for _, topic, relevance, depth in rows:
+        entry = totals[topic]
+        entry[0] += 1
+        entry[1] += relevance
+        entry[2] += depth
+
+    ordered = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+    if len(ordered) > MAX_TOPICS:
+        other = [0, 0.0, 0.0]
+        for _, entry in ordered[MAX_TOPICS - 1:]:
+            other = [a + b for a, b in zip(other, entry)]
+        ordered = ordered[:MAX_TOPICS - 1] + [("Other", other)]
+
+    topics = [topic for topic, _ in ordered]
+    counts = [entry[0] for _, entry in ordered]
+    hover = "%{x}<br>%{y:.2f} average over %{customdata} questions<extra></extra>"
+    fig = go.Figure([
+        go.Bar(name="Exam Likelihood", x=topics, y=[e[1] / e[0] for _, e in ordered],
+               customdata=counts, hovertemplate=hover, marker_color=RELEVANCE_COLOR),
+        go.Bar(name="Challenge Level", x=topics, y=[e[2] / e[0] for _, e in ordered],
+               customdata=counts, hovertemplate=hover, marker_color=DEPTH_COLOR),
+    ])
+    fig.update_layout(barmode="group")
+    return _layout(fig, f"📊 Average Scores by Topic ({len(rows)} questions)", "Topic", "Average AI Score (0-10)")
+
+
+def score_scatter(rows):
+    """Every question as a WebGL point; small deterministic jitter separates equal scores."""
+    import plotly.graph_objects as go
+
+    def jitter(question_id, axis):
+        return ((hash((question_id, axis)) % 1000) / 1000 - 0.5) * 0.4
+
+    fig = go.Figure(go.Scattergl(
+        x=[r[2] + jitter(r[0], 0) for r in rows],
+        y=[r[3] + jitter(r[0], 1) for r in rows],
+        mode="markers",
+        text=[f"Q{r[0]} · {r[1]}" for r in rows],
+        hovertemplate="%{text}<extra></extra>",
+        marker=dict(size=5, opacity=0.5, color=RELEVANCE_COLOR),
+        name="Questions",
+    ))
+    return _layout(fig, "🔍 Every Question: Exam Likelihood vs Challenge Level",
+                   "Exam Likelihood (0-10)", "Challenge Level (0-10)")
+
+
+def score_heatmap(rows):
+    """Question counts in 1-point score bins, for banks too large to plot point by point."""
+    import plotly.graph_objects as go
+
+    counts = [[0] * 10 for _ in range(10)]
+    for (relevance, depth), count in Counter((int(r[2]), int(r[3])) for r in rows).items():
+        counts[min(9, max(0, depth - 1))][min(9, max(0, relevance - 1))] += count
+
+    fig = go.Figure(go.Heatmap(
+        z=counts, x=list(range(1, 11)), y=list(range(1, 11)), colorscale="Blues",
+        hovertemplate="Exam Likelihood %{x}, Challenge %{y}: %{z} questions<extra></extra>",
+    ))
+    return _layout(fig, "🔍 How Many Questions Scored Where",
+                   "Exam Likelihood (0-10)", "Challenge Level (0-10)")
+
+
+def build_figures(reader_analyses: List[Dict[str, Any]],
+                  relevance_scores: List[Dict[str, Any]],
+                  depth_scores: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Figures for the score overview, sized for the number of questions.
+
+    Args:
+        reader_analyses: Output from Reader Agent
+        relevance_scores: Output from Relevance Agent
+        depth_scores: Output from Depth Agent
+
+    Returns:
+        List of plotly figures to show in order
+    """
+    rows = chart_rows(reader_analyses, relevance_scores, depth_scores)
+    if len(rows) <= BAR_LIMIT:
+        return [question_bars(rows)]
+    if len(rows) <= SCATTER_LIMIT:
+        return [topic_rollup(rows), score_scatter(rows)]
+    return [topic_rollup(rows), score_heatmap(rows)]
@@ -0,0 +1,6 @@
+# HTTP ranking service around the agents package
+
+from .coalescing import SingleFlight, LRUCache
+from .ranking_service import RankingService
+
+__all__ = ['SingleFlight', 'LRUCache', 'RankingService']
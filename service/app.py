@@ -0,0 +1,133 @@
+"""
+HTTP ranking service.
+
+    uvicorn service.app:create_app --factory --port 8000
+
+Set JEE_FAKE_LLM=1 (and optionally JEE_FAKE_LLM_LATENCY=0.5) to run
+without a Groq key.
+"""
+import os
+from contextlib import asynccontextmanager
+from typing import List, Union
+
+from fastapi import FastAPI, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from .ranking_service import RankingService, validate_questions
+
+
+class Question(BaseModel):
+    id: int
+    question_text: str
+    topic: str
+    tags: List[str]
+    bloom_level: str
+
+
+class QuestionsRequest(BaseModel):
+    questions: List[Question]
+
+
+class RankRequest(QuestionsRequest):
+    importance_weight: float = Field(0.6, ge=0.0, le=1.0)
+    use_judge: bool = True
+
+
+class PersonalizedRequest(QuestionsRequest):
+    weights: List[Union[float, List[float]]]
+    top_k: int = Field(3, ge=1, le=50)
+
+
+class JobRequest(RankRequest):
+    priority: int = 0
+
+
+def _questions(request: QuestionsRequest):
+    questions = [q.model_dump() for q in request.questions]
+    is_valid, message = validate_questions(questions)
+    if not is_valid:
+        raise HTTPException(status_code=422, detail=message)
+    return questions
+
+
+def create_app(service: RankingService = None) -> FastAPI:
+    """
+    Build the FastAPI application.
+
+    Args:
+        service: Ranking service to expose (a new one is created by default)
+    """
+    if service is None:
+        service = RankingService(max_concurrency=int(os.getenv("JEE_MAX_CONCURRENCY", "8")))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        service.close()
+
+    app = FastAPI(title="JEE Question Ranking Service", lifespan=lifespan)
+    app.state.service = service
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return service.stats()
+
+    @app.post("/analyze")
+    async def analyze(request: QuestionsRequest):
+        return {"reader_analyses": await service.analyze(_questions(request))}
+
+    @app.post("/score")
+    async def score(request: QuestionsRequest):
+        return await service.score(_questions(request))
+
+    @app.post("/explain")
+    async def explain(request: QuestionsRequest):
+        return await service.explain(_questions(request))
+
+    @app.post("/rank")
+    async def rank(request: RankRequest):
+        return await service.rank(_questions(request), request.importance_weight, request.use_judge)
+
+    @app.post("/schedule")
+    async def schedule(request: QuestionsRequest):
+        return await service.schedule(_questions(request))
+
+    @app.post("/personalized")
+    async def personalized(request: PersonalizedRequest):
+        try:
+            return await service.personalized(_questions(request), request.weights, request.top_k)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    @app.post("/jobs", status_code=202)
+    async def submit_job(request: JobRequest, x_tenant: str = Header("anonymous")):
+        job_id = service.submit_job(_questions(request), request.importance_weight,
+                                    request.use_judge, x_tenant, request.priority)
+        return service.get_job(job_id)
+
+    def _owned_job(job_id: str, tenant: str):
+        # X-Tenant is trusted as sent, so this only isolates tenants when an
+        # authenticating proxy sets the header.
+        job = service.get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["tenant"] != tenant:
+            raise HTTPException(status_code=403, detail="Job belongs to another tenant")
+        return job
+
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str, x_tenant: str = Header("anonymous")):
+        return _owned_job(job_id, x_tenant)
+
+    @app.delete("/jobs/{job_id}")
+    async def cancel_job(job_id: str, x_tenant: str = Header("anonymous")):
+        _owned_job(job_id, x_tenant)
+        if not service.cancel_job(job_id):
+            raise HTTPException(status_code=404, detail="Job not found or already finished")
+        return service.get_job(job_id)
+
+    return app
@@ -0,0 +1,408 @@
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from agents.reader_agent import ReaderAgent
+from agents.relevance_agent import RelevanceAgent
+from agents.depth_agent import DepthAgent
+from agents.judge_agent import JudgeAgent
+from agents.hedging import STAGE_DEADLINES, call_with_deadline
+from agents.job_queue import JobQueue
+from agents.parametric import build_schedule
+from agents.personalized import ScoredBank
+from agents.prompts import TEMPLATES, template_stats
+from agents.records import DepthScore, QuestionAnalysis, RelevanceScore
+from agents.speculative import MAX_ISSUES, SpeculativeJudge
+from agents.router import AGENTS
+from agents.llm import create_agent_llms
+
+from .coalescing import LRUCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['id', 'question_text', 'topic', 'tags', 'bloom_level']
+
+# Per-question stage results are cached as compact records
+SCORE_RECORDS = {"relevance": RelevanceScore, "depth": DepthScore,
+                 "relevance_explain": RelevanceScore, "depth_explain": DepthScore}
+
+
+def question_key(question: Dict[str, Any]) -> str:
+    """Stable content hash of a question, used for caching and coalescing."""
+    payload = json.dumps(question, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def bank_key(questions: List[Dict[str, Any]]) -> str:
+    """Content hash of a whole question bank, in order."""
+    return hashlib.sha1("".join(question_key(q) for q in questions).encode()).hexdigest()
+
+
+def cacheable(stage: str, result: Dict[str, Any]) -> bool:
+    """
+    Whether a stage result may be cached: fallback and degraded results
+    are not, so the next request tries the model again, and neither is
+    an explanation that came back still terse (its call failed).
+    """
+    if result.get("degraded") or result.get("note") == "Fallback scoring used":
+        return False
+    return not (stage.endswith("_explain") and result.get("terse"))
+
+
+def validate_questions(questions: Any) -> Tuple[bool, str]:
+    """Validate a question list; same rules as the app, without the count limit."""
+    if not isinstance(questions, list) or not questions:
+        return False, "Request should contain a non-empty list of questions."
+
+    seen_ids = set()
+    for i, question in enumerate(questions, 1):
+        if not isinstance(question, dict):
+            return False, f"Question {i} should be an object/dictionary."
+        for field in REQUIRED_FIELDS:
+            if field not in question:
+                return False, f"Question {i} is missing required field: '{field}'"
+        if not isinstance(question['id'], int):
+            return False, f"Question {i}: 'id' should be a number."
+        if question['id'] in seen_ids:
+            return False, f"Question {i}: duplicate id {question['id']}."
+        seen_ids.add(question['id'])
+        if not isinstance(question['question_text'], str) or not question['question_text'].strip():
+            return False, f"Question {i}: 'question_text' should be a non-empty string."
+
+    return True, "Valid format!"
+
+
+class RankingService:
+    """
+    Async wrapper around the four agents for programmatic use.
+
+    Agent calls run on a bounded thread pool that shares one LLM client (and
+    so one HTTP connection pool). Per-question results are cached by content
+    hash, and concurrent requests for the same question, stage or ranking
+    are coalesced into a single in-flight computation. Background jobs go
+    through a fair-share JobQueue keyed by tenant.
+    """
+
+    def __init__(self, llm=None, max_concurrency: int = 8, cache_size: int = 10000,
+                 job_workers: int = 4, trust_metadata: Optional[bool] = None,
+                 terse: Optional[bool] = None, speculative: Optional[bool] = None):
+        # One shared model when given, otherwise per-agent models (routed
+        # when JEE_MODEL_ROUTES is set)
+        self.llms = {agent: llm for agent in AGENTS} if llm is not None else create_agent_llms()
+        if trust_metadata is None:
+            trust_metadata = os.getenv("JEE_TRUST_METADATA") == "1"
+        self.reader = ReaderAgent(self.llms["reader"], trust_metadata, self.llms["reader_fill"],
+                                  backend=os.getenv("JEE_READER", "llm"))
+        if terse is None:
+            terse = os.getenv("JEE_TERSE") == "1"
+        self.terse = terse
+        self.relevance = RelevanceAgent(self.llms["relevance"], terse)
+        self.depth = DepthAgent(self.llms["depth"], terse)
+        self.judge = JudgeAgent(self.llms["judge"])
+        self._template_keys = {stage: TEMPLATES[stage].key for stage in
+                               ("reader", "judge", "relevance_explain", "depth_explain")}
+        self._template_keys["relevance"] = self.relevance.prompt.key
+        self._template_keys["depth"] = self.depth.prompt.key
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent")
+        self._cache = LRUCache(cache_size)
+        self._flight = SingleFlight()
+        self.job_queue = JobQueue(self._score_question_sync, num_workers=job_workers)
+        self.agent_calls = 0
+
+        # Speculative Judge calls get their own threads so they do not queue
+        # behind the scoring calls they are meant to overlap
+        if speculative is None:
+            speculative = os.getenv("JEE_SPECULATIVE_JUDGE", "1") != "0"
+        self.speculative = speculative
+        self._speculation_executor = ThreadPoolExecutor(max_workers=MAX_ISSUES, thread_name_prefix="speculative-judge")
+        self.speculation_stats = {"issued": 0, "discarded": 0, "hits": 0, "misses": 0}
+
+    async def _call(self, stage: str, fn, *args):
+        """Run a blocking agent call on the shared pool within its stage deadline."""
+        self.agent_calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(call_with_deadline, STAGE_DEADLINES.get(stage), fn, *args)
+        )
+
+    def _key(self, stage: str, *parts) -> Tuple:
+        """Cache key for a stage; includes the prompt template version."""
+        return (stage, self._template_keys[stage]) + parts
+
+    def _cache_get(self, key: Tuple, *args):
+        """Cached stage result as a dictionary, or None."""
+        value = self._cache.get(key)
+        if value is None:
+            return None
+        if key[0] == "reader":
+            return value.to_dict(args[0])
+        return value.to_dict() if key[0] in SCORE_RECORDS else value
+
+    def _cache_put(self, key: Tuple, value, *args):
+        """Cache a stage result, as a record when the stage has one; the reader's args[0] is the question."""
+        if not cacheable(key[0], value):
+            return
+        if key[0] == "reader":
+            value = QuestionAnalysis.from_dict(value, args[0])
+        elif key[0] in SCORE_RECORDS:
+            value = SCORE_RECORDS[key[0]].from_dict(value)
+        self._cache.put(key, value)
+
+    async def _cached(self, key: Tuple, fn, *args):
+        result = self._cache_get(key, *args)
+        if result is not None:
+            return result
+
+        async def compute():
+            value = await self._call(key[0], fn, *args)
+            self._cache_put(key, value, *args)
+            return value
+
+        return await self._flight.do(key, compute)
+
+    async def analyze_question(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._cached(self._key("reader", question_key(question)),
+                                  self.reader.analyze_question, question)
+
+    async def score_question(self, question: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """Reader analysis followed by concurrent relevance and depth scoring."""
+        analysis = await self.analyze_question(question)
+        key = question_key(question)
+        relevance, depth = await asyncio.gather(
+            self._cached(self._key("relevance", key), self.relevance.score_question, analysis),
+            self._cached(self._key("depth", key), self.depth.score_question, analysis),
+        )
+        return analysis, relevance, depth
+
+    def _cached_sync(self, key: Tuple, fn, *args):
+        result = self._cache_get(key, *args)
+        if result is None:
+            self.agent_calls += 1
+            result = call_with_deadline(STAGE_DEADLINES.get(key[0]), fn, *args)
+            self._cache_put(key, result, *args)
+        return result
+
+    def _score_question_sync(self, question: Dict[str, Any]):
+        """Blocking version of score_question used by job queue workers."""
+        key = question_key(question)
+        analysis = self._cached_sync(self._key("reader", key), self.reader.analyze_question, question)
+        return (
+            analysis,
+            self._cached_sync(self._key("relevance", key), self.relevance.score_question, analysis),
+            self._cached_sync(self._key("depth", key), self.depth.score_question, analysis),
+        )
+
+    async def explain_question(self, question: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Relevance and depth results with justifications, generated on first request in terse mode."""
+        analysis, relevance, depth = await self.score_question(question)
+        if not (relevance.get("terse") or depth.get("terse")):
+            return relevance, depth
+        key = question_key(question)
+        return tuple(await asyncio.gather(
+            self._cached(self._key("relevance_explain", key), self.relevance.explain, analysis, relevance),
+            self._cached(self._key("depth_explain", key), self.depth.explain, analysis, depth),
+        ))
+
+    async def explain(self, questions: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Scores with justifications for the given questions.
+
+        Returns:
+            Dictionary with relevance_scores and depth_scores
+        """
+        results = await asyncio.gather(*(self.explain_question(q) for q in questions))
+        return {
+            "relevance_scores": [r[0] for r in results],
+            "depth_scores": [r[1] for r in results],
+        }
+
+    async def analyze(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*(self.analyze_question(q) for q in questions)))
+
+    async def score(self, questions: List[Dict[str, Any]], on_progress=None,
+                    on_result=None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Score every question.
+
+        Args:
+            questions: List of question dictionaries
+            on_progress: Optional callback invoked after each question is scored
+            on_result: Optional callback invoked with each question's
+                (analysis, relevance, depth) as it is scored
+
+        Returns:
+            Dictionary with reader_analyses, relevance_scores and depth_scores
+        """
+        async def scored(question):
+            result = await self.score_question(question)
+            if on_result:
+                on_result([result])
+            if on_progress:
+                on_progress()
+            return result
+
+        results = await asyncio.gather(*(scored(q) for q in questions))
+        return {
+            "reader_analyses": [r[0] for r in results],
+            "relevance_scores": [r[1] for r in results],
+            "depth_scores": [r[2] for r in results],
+        }
+
+    async def rank(self, questions: List[Dict[str, Any]], importance_weight: float = 0.6,
+                   use_judge: bool = True, on_progress=None) -> Dict[str, Any]:
+        """
+        Score all questions and select the TOP 3.
+
+        Args:
+            questions: List of question dictionaries
+            importance_weight: Weight for exam relevance; depth gets the rest
+            use_judge: Ask the Judge Agent for reasoning instead of ranking locally
+
+        Returns:
+            Ranking dictionary in the same shape as JudgeAgent.rank_questions.
+            In terse mode it also has "explanations": the TOP 3's scores
+            with justifications, the only ones generated
+        """
+        difficulty_weight = 1.0 - importance_weight
+        key = self._key("judge", bank_key(questions), round(importance_weight, 6))
+        speculation = None
+        if use_judge and self.speculative and self._cache.get(key) is None:
+            speculation = SpeculativeJudge(self.judge, [q["id"] for q in questions], importance_weight,
+                                           difficulty_weight, STAGE_DEADLINES,
+                                           executor=self._speculation_executor)
+        scored = await self.score(questions, on_progress, speculation.update if speculation else None)
+        args = (scored["reader_analyses"], scored["relevance_scores"], scored["depth_scores"],
+                importance_weight, difficulty_weight)
+
+        if not use_judge:
+            ranking = self.judge.rank_locally(*args)
+        elif speculation is None:
+            ranking = await self._cached(key, self.judge.rank_questions, *args)
+        else:
+            ranking = await self._speculative_ranking(key, speculation, args)
+
+        if self.terse:
+            top_ids = {q.get("question_id") for q in ranking.get("top_3_questions", [])}
+            ranking = dict(ranking, explanations=await self.explain([q for q in questions if q["id"] in top_ids]))
+        return ranking
+
+    async def _speculative_ranking(self, key: Tuple, speculation: SpeculativeJudge, args: Tuple):
+        """Judge ranking from the speculation when it is still valid, else a normal (cached) Judge call."""
+        async def compute():
+            future = speculation.resolve(*args[:3])
+            if future is None:
+                value = await self._call("judge", self.judge.rank_questions, *args)
+            else:
+                value = await asyncio.wrap_future(future)
+            if cacheable(key[0], value):
+                self._cache.put(key, value)
+            return value
+
+        try:
+            result = self._cache.get(key)
+            return result if result is not None else await self._flight.do(key, compute)
+        finally:
+            self.agent_calls += speculation.stats["issued"]
+            for name, count in speculation.stats.items():
+                self.speculation_stats[name] += count
+
+    async def schedule(self, questions: List[Dict[str, Any]], top_k: int = 3) -> Dict[str, Any]:
+        """
+        TOP K for every importance weight, so a client can move its own
+        slider without further requests.
+
+        Returns:
+            TopKSchedule.to_dict(): breakpoints and the TOP K on each interval
+        """
+        scored = await self.score(questions)
+        return build_schedule([q["id"] for q in questions], scored["relevance_scores"],
+                              scored["depth_scores"], top_k).to_dict()
+
+    async def personalized(self, questions: List[Dict[str, Any]], weights: List[Any],
+                           top_k: int = 3) -> Dict[str, Any]:
+        """
+        TOP K of one bank for many students at once. The bank is scored
+        (and cached) once; each student only costs a share of a matrix
+        product, with no further agent calls.
+
+        Args:
+            questions: List of question dictionaries
+            weights: Per student, an importance weight, a [relevance, depth]
+                pair, or ten per-criterion weights
+            top_k: Questions per student
+
+        Returns:
+            Dictionary with question_ids and scores, one row per student
+        """
+        key = ("bank", bank_key(questions))
+        bank = self._cache.get(key)
+        if bank is None:
+            scored = await self.score(questions)
+            bank = ScoredBank([q["id"] for q in questions], scored["relevance_scores"], scored["depth_scores"])
+            if all(cacheable("bank", r) for r in scored["relevance_scores"] + scored["depth_scores"]):
+                self._cache.put(key, bank)
+        loop = asyncio.get_running_loop()
+        ids, scores = await loop.run_in_executor(self._executor, bank.top_k, weights, top_k)
+        return {"question_ids": ids.tolist(), "scores": scores.tolist()}
+
+    def submit_job(self, questions: List[Dict[str, Any]], importance_weight: float = 0.6,
+                   use_judge: bool = True, tenant: str = "anonymous", priority: int = 0) -> str:
+        """
+        Queue a (large) bank for background ranking.
+
+        Args:
+            questions: List of question dictionaries
+            importance_weight: Weight for exam relevance; depth gets the rest
+            use_judge: Ask the Judge Agent for reasoning instead of ranking locally
+            tenant: Fair-share bucket, e.g. the calling user or LMS
+            priority: Higher runs first among the tenant's own jobs
+
+        Returns:
+            Job id
+        """
+        def finalize(scored):
+            rank = self.judge.rank_questions if use_judge else self.judge.rank_locally
+            return call_with_deadline(
+                STAGE_DEADLINES["judge"], rank,
+                scored["reader_analyses"], scored["relevance_scores"], scored["depth_scores"],
+                importance_weight, 1.0 - importance_weight
+            )
+
+        return self.job_queue.submit(tenant, questions, priority, finalize)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        status = self.job_queue.status(job_id)
+        if status is not None:
+            status["result"] = self.job_queue.result(job_id)
+        return status
+
+    def cancel_job(self, job_id: str) -> bool:
+        return self.job_queue.cancel(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "agent_calls": self.agent_calls,
+            "cache_size": len(self._cache),
+            "cache_hits": self._cache.hits,
+            "cache_misses": self._cache.misses,
+            "coalesced": self._flight.coalesced,
+            "speculative_judge": dict(self.speculation_stats),
+            "inflight": self._flight.inflight,
+            "job_queue": self.job_queue.stats(),
+            "prompts": template_stats(),
+            "models": {
+                agent: llm.llm.get_stats()
+                for agent, llm in self.llms.items() if hasattr(getattr(llm, "llm", None), "get_stats")
+            },
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._speculation_executor.shutdown(wait=False)
+        self.job_queue.shutdown()
@@ -1,23 +1,33 @@
 import streamlit as st
 import json
 import os
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from typing import Dict, List, Any
 import logging
 from dotenv import load_dotenv
 import time
+import uuid
 
 
 from agents.reader_agent import ReaderAgent
 from agents.relevance_agent import RelevanceAgent
 from agents.depth_agent import DepthAgent
 from agents.judge_agent import JudgeAgent
+from agents.records import DEPTH_CRITERIA, RELEVANCE_CRITERIA, compute_composite_scores, question_texts
+from agents.results_export import export_results_bytes
 
+from agents.llm import DEFAULT_MODEL, create_agent_llms
+from agents.job_queue import DONE, FINISHED, JobQueue, agent_pipeline
+from agents.hedging import STAGE_DEADLINES, call_with_deadline, deadline, metered
+from agents.budget import DOUBLE_CHECK, NO_DOUBLE_CHECK, Budget, BudgetPlanner, BudgetedPipeline
+from agents.adaptive import SAMPLING_TEMPERATURE, AdaptiveSampler
+from agents.cascade import CascadePipeline, unresolved_skips
+from agents.parametric import build_schedule
+from agents.speculative import SpeculativeJudge
+from agents.result_store import ResultStore
+from service.ranking_service import bank_key
 
-from langchain_groq import ChatGroq
-
+# plotly (via charts) and langchain_groq are imported where they are first
+# used (display_simple_chart / create_agent_llms) to keep cold start fast.
 
 
 try:
@@ -379,6 +389,208 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+SAMPLE_QUESTIONS_PATH = 'data/sample_questions.json'
+
+
+@st.cache_data(show_spinner=False)
+def load_sample_questions(path: str, modified_time: float) -> List[Dict[str, Any]]:
+    """Read the sample question file once; the modification time invalidates the cache."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@st.cache_resource(show_spinner=False)
+def create_agents(api_key: str, model: str):
+    """
+    Build the LLM clients and the four agents once per (API key, model).
+
+    The cached ChatGroq clients keep their HTTP connection pools alive across
+    reruns and sessions; changing the key or model creates new ones. Set
+    JEE_MODEL_ROUTES to give each agent its own model or provider, and
+    JEE_TRUST_METADATA=1 to take topic, tags and Bloom level from the
+    questions instead of re-deriving them. JEE_READER=rules analyzes
+    questions with the local rule-based Reader instead of the LLM.
+    JEE_TERSE=1 scores without justifications; they are generated only
+    for the TOP 3.
+    """
+    llms = create_agent_llms(api_key, model)
+    reader = ReaderAgent(llms["reader"], os.getenv('JEE_TRUST_METADATA') == '1', llms["reader_fill"],
+                         backend=os.getenv('JEE_READER', 'llm'))
+    terse = os.getenv('JEE_TERSE') == '1'
+    
+    return (reader, RelevanceAgent(llms["relevance"], terse),
+            DepthAgent(llms["depth"], terse), JudgeAgent(llms["judge"]))
+
+
+@st.cache_resource(show_spinner=False)
+def create_sampling_agents(api_key: str, model: str):
+    """Relevance and Depth agents at a higher temperature, for adaptive sampling."""
+    llms = create_agent_llms(api_key, model, temperature=SAMPLING_TEMPERATURE)
+    terse = os.getenv('JEE_TERSE') == '1'
+    return RelevanceAgent(llms["relevance"], terse), DepthAgent(llms["depth"], terse)
+
+
+@st.cache_resource(show_spinner=False)
+def create_budget_planner() -> BudgetPlanner:
+    """
+    Process-wide budget planner. Its expected answer lengths are calibrated
+    from every budgeted run, so later plans get closer to actual spend.
+    """
+    return BudgetPlanner()
+
+
+@st.cache_resource(show_spinner=False)
+def create_result_store() -> ResultStore:
+    """
+    Process-wide store for analysis results. Sessions keep only a handle to
+    theirs, so memory is bounded by JEE_RESULT_STORE_MB (default 256) and
+    JEE_RESULT_STORE_ENTRIES (default 1000) however many students are
+    connected, and results unused for JEE_RESULT_TTL seconds (default 6
+    hours) are dropped.
+    """
+    return ResultStore(
+        max_bytes=int(float(os.getenv('JEE_RESULT_STORE_MB', '256')) * 1024 * 1024),
+        max_entries=int(os.getenv('JEE_RESULT_STORE_ENTRIES', '1000')),
+        ttl=float(os.getenv('JEE_RESULT_TTL', str(6 * 3600)))
+    )
+
+
+def results_key(questions: List[Dict[str, Any]], model: str, adaptive: bool) -> str:
+    """
+    Key of a bank together with the settings that shape its scores.
+    Sessions analyzing the same bank with the same settings (the sample
+    set, say) share one stored result.
+    """
+    settings = [model, os.getenv('JEE_MODEL_ROUTES', ''), os.getenv('JEE_READER', 'llm'),
+                os.getenv('JEE_TRUST_METADATA') == '1', os.getenv('JEE_TERSE') == '1',
+                os.getenv('JEE_CASCADE', '1') != '0', adaptive]
+    return bank_key(questions) + json.dumps(settings)
+
+
+@st.cache_resource(show_spinner=False)
+def create_job_queue(api_key: str, model: str) -> JobQueue:
+    """
+    Process-wide queue shared by every session using this key and model.
+    Questions are scored one task at a time with fair sharing between
+    sessions, so one large upload cannot starve other users.
+    """
+    reader, relevance, depth, _ = create_agents(api_key, model)
+    return JobQueue(
+        agent_pipeline(reader, relevance, depth, STAGE_DEADLINES),
+        num_workers=int(os.getenv('JEE_QUEUE_WORKERS', '4'))
+    )
+
+
+class LiveLeaderboard:
+    """
+    Provisional ranking shown while questions are still being scored.
+    
+    Each leaderboard position has its own placeholder, and a position is
+    redrawn only when the question or scores in it change. An update
+    therefore touches at most `size` small elements, whatever the size of
+    the bank.
+    """
+    
+    def __init__(self, importance_weight: float, difficulty_weight: float, size: int = 10):
+        self.importance_weight = importance_weight
+        self.difficulty_weight = difficulty_weight
+        self.cursor = 0
+        self.rows = {}
+        
+        self.top3_slot = st.empty()
+        self.header_slot = st.empty()
+        self.slots = [st.empty() for _ in range(size)]
+        self.rendered = [None] * size
+        self.rendered_top3 = None
+    
+    def update(self, scored_batch):
+        """Add newly scored questions and redraw the positions that changed."""
+        self.cursor += len(scored_batch)
+        for item in scored_batch:
+            if item is None:
+                continue
+            analysis, relevance, depth = item
+            question = analysis["original_question"]
+            relevance_value = relevance["overall_relevance_score"]
+            depth_value = depth["overall_depth_score"]
+            self.rows[question["id"]] = (
+                question["id"], question.get("topic", ""), relevance_value, depth_value,
+                bool(depth.get("skipped")),
+                relevance_value * self.importance_weight + depth_value * self.difficulty_weight
+            )
+        
+        if not self.rows:
+            return
+        ranked = sorted(self.rows.values(), key=lambda r: r[5], reverse=True)
+        
+        top3 = tuple(r[0] for r in ranked[:3])
+        if top3 != self.rendered_top3:
+            self.top3_slot.markdown("#### 🏆 Provisional TOP 3: " + ", ".join(f"Q{q}" for q in top3))
+            self.header_slot.markdown(f"**Leaderboard so far** (best {len(self.slots)} questions scored)")
+            self.rendered_top3 = top3
+        
+        for position, (slot, row) in enumerate(zip(self.slots, ranked)):
+            question_id, topic, relevance_value, depth_value, skipped, composite = row
+            line = (
+                f"**{position + 1}.** Q{question_id} ({topic}) · Exam Likelihood **{relevance_value}** · "
+                f"Challenge **{depth_value}**{' (estimated)' if skipped else ''} · Score **{composite:.2f}**"
+            )
+            if line != self.rendered[position]:
+                slot.markdown(line)
+                self.rendered[position] = line
+    
+    def clear(self):
+        for slot in [self.top3_slot, self.header_slot] + self.slots:
+            slot.empty()
+
+
+def rank_badge(rank: int):
+    """Emoji, CSS class and label for a TOP 3 position."""
+    if rank == 1:
+        return "🥇", "rank-1", "1st Place"
+    if rank == 2:
+        return "🥈", "rank-2", "2nd Place"
+    if rank == 3:
+        return "🥉", "rank-3", "3rd Place"
+    return "🏅", "", f"{rank}th Place"
+
+
+class LiveJudgeRanking:
+    """
+    Judge ranking drawn while the Judge's answer streams in.
+    
+    Each rank has its own placeholder. A card appears as soon as the Judge
+    has named its question, showing the question's scores, and its
+    reasoning fills in as more of the answer arrives. A card is redrawn
+    only when its text changes.
+    """
+    
+    def __init__(self, size: int = 3):
+        self.slots = [st.empty() for _ in range(size)]
+        self.rendered = [None] * size
+    
+    def update(self, ranking):
+        cursor = " ▌" if ranking.get('partial') else ""
+        for position, (slot, question) in enumerate(zip(self.slots, ranking.get('top_3_questions', []))):
+            emoji, rank_class, rank_text = rank_badge(question.get('rank', position + 1))
+            card = f"""
+            <div class="rank-card {rank_class}">
+                <h3>{emoji} {rank_text} - Question {question.get('question_id', 'N/A')}</h3>
+                <p><strong>🤖 AI Score:</strong> {question.get('final_score', 0):.1f}/10 ·
+                   <strong>📈 Exam Frequency:</strong> {question.get('relevance_contribution', 0):.1f}/10 ·
+                   <strong>🧠 Challenge Level:</strong> {question.get('depth_contribution', 0):.1f}/10</p>
+                <p><strong>Why this made the TOP 3:</strong> {question.get('selection_reasoning', '')}{cursor}</p>
+            </div>
+            """
+            if card != self.rendered[position]:
+                slot.markdown(card, unsafe_allow_html=True)
+                self.rendered[position] = card
+    
+    def clear(self):
+        for slot in self.slots:
+            slot.empty()
+
+
 class SimpleJEEAnalyzer:
     
     def __init__(self):
@@ -389,24 +601,36 @@ class SimpleJEEAnalyzer:
         """Initialize session state variables."""
         if 'analysis_complete' not in st.session_state:
             st.session_state.analysis_complete = False
-        if 'reader_analyses' not in st.session_state:
-            st.session_state.reader_analyses = []
-        if 'relevance_scores' not in st.session_state:
-            st.session_state.relevance_scores = []
-        if 'depth_scores' not in st.session_state:
-            st.session_state.depth_scores = []
-        if 'final_ranking' not in st.session_state:
-            st.session_state.final_ranking = {}
+        if 'result_handle' not in st.session_state:
+            # Scores, rankings and charts live in the shared result store;
+            # the session keeps only the handle to its results
+            st.session_state.result_handle = None
+        if 'ranking_weight' not in st.session_state:
+            # Importance weight of the ranking shown, and of the last Judge ranking
+            st.session_state.ranking_weight = None
+        if 'judge_weight' not in st.session_state:
+            st.session_state.judge_weight = None
         if 'current_questions' not in st.session_state:
             st.session_state.current_questions = []
         if 'question_source' not in st.session_state:
             st.session_state.question_source = "sample"
+        if 'budget_run' not in st.session_state:
+            # (BudgetPlan, UsageMeter) of the last budgeted run
+            st.session_state.budget_run = None
+        if 'tenant_id' not in st.session_state:
+            st.session_state.tenant_id = uuid.uuid4().hex
+        if st.session_state.get('active_job'):
+            # The previous run was interrupted mid-analysis; stop paying for it
+            job_queue, job_id = st.session_state.active_job
+            job_queue.cancel(job_id)
+        st.session_state.active_job = None
     
     def load_questions(self):
         """Load sample questions from JSON file."""
         try:
-            with open('data/sample_questions.json', 'r') as f:
-                self.sample_questions = json.load(f)
+            self.sample_questions = load_sample_questions(
+                SAMPLE_QUESTIONS_PATH, os.path.getmtime(SAMPLE_QUESTIONS_PATH)
+            )
         except (FileNotFoundError, json.JSONDecodeError) as e:
             st.warning("""
             ⚠️ **Sample questions file not found.** 
@@ -570,125 +794,221 @@ class SimpleJEEAnalyzer:
                 st.session_state.analysis_complete = False
                 st.rerun()
     
-    def initialize_agents(self):
-        """Initialize AI agents."""
-        try:
-            # Try to get API key from environment variables or Streamlit secrets
-            api_key = os.getenv('GROQ_API_KEY')
-            
-            # If not found in environment, try Streamlit secrets
-            if not api_key:
-                try:
-                    api_key = st.secrets["GROQ_API_KEY"]
-                except:
-                    pass
+    def get_llm_settings(self):
+        """Return (api_key, model), or (None, None) after showing setup help."""
+        # Try to get API key from environment variables or Streamlit secrets
+        api_key = os.getenv('GROQ_API_KEY')
+        
+        # If not found in environment, try Streamlit secrets
+        if not api_key:
+            try:
+                api_key = st.secrets["GROQ_API_KEY"]
+            except:
+                pass
+        
+        if not api_key:
+            st.error("""
+            🔑 **API Key Required!**
             
-            if not api_key:
-                st.error("""
-                🔑 **API Key Required!**
-                
-                To use this app, you need to provide a GROQ API key. Here's how:
-                
-                **For Local Development:**
-                - Create a `.env` file in your project folder
-                - Add: `GROQ_API_KEY=your_api_key_here`
-                
-                **For Streamlit Cloud Deployment:**
-                - Go to your app settings on Streamlit Cloud
-                - Add `GROQ_API_KEY` in the Secrets section
-                - Format: `GROQ_API_KEY = "your_api_key_here"`
-                
-                **Get a free API key:** Visit [console.groq.com](https://console.groq.com) to get your free API key.
-                """)
-                return None, None, None, None
+            To use this app, you need to provide a GROQ API key. Here's how:
             
-            llm = ChatGroq(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",  
-                temperature=0.1,
-                groq_api_key=api_key,
-                max_retries=2,
-                request_timeout=30
-            )
+            **For Local Development:**
+            - Create a `.env` file in your project folder
+            - Add: `GROQ_API_KEY=your_api_key_here`
             
-            reader = ReaderAgent(llm)
-            relevance = RelevanceAgent(llm)
-            depth = DepthAgent(llm)
-            judge = JudgeAgent(llm)
+            **For Streamlit Cloud Deployment:**
+            - Go to your app settings on Streamlit Cloud
+            - Add `GROQ_API_KEY` in the Secrets section
+            - Format: `GROQ_API_KEY = "your_api_key_here"`
             
-            return reader, relevance, depth, judge
+            **Get a free API key:** Visit [console.groq.com](https://console.groq.com) to get your free API key.
+            """)
+            return None, None
+        
+        return api_key, os.getenv('GROQ_MODEL', DEFAULT_MODEL)
+    
+    def initialize_agents(self):
+        """Initialize AI agents."""
+        api_key, model = self.get_llm_settings()
+        if not api_key:
+            return None, None, None, None
+        
+        try:
+            return create_agents(api_key, model)
             
         except Exception as e:
             st.error(f"Failed to initialize AI system: {str(e)}")
             return None, None, None, None
     
-    def run_analysis(self, importance_weight: float, difficulty_weight: float):
-        """Run the analysis with simple progress tracking."""
-        reader, relevance, depth, judge = self.initialize_agents()
+    def run_analysis(self, importance_weight: float, difficulty_weight: float, adaptive: bool = False):
+        """
+        Run the analysis with simple progress tracking.
+        
+        With `adaptive` on, questions close to the TOP 3 cutoff are scored
+        a few more times and their scores averaged (JEE_ADAPTIVE_BUDGET
+        extra calls at most).
         
-        if not all([reader, relevance, depth, judge]):
+        When JEE_BUDGET_TOKENS or JEE_BUDGET_COST is set, the run is planned
+        to fit that budget first, degrading the analysis as needed, and
+        every AI call is charged against it.
+        """
+        api_key, model = self.get_llm_settings()
+        if not api_key:
+            return
+        
+        try:
+            reader, relevance, depth, judge = create_agents(api_key, model)
+            job_queue = create_job_queue(api_key, model)
+        except Exception as e:
+            st.error(f"Failed to initialize AI system: {str(e)}")
             return
         
         progress_bar = st.progress(0)
         status_text = st.empty()
+        leaderboard = LiveLeaderboard(importance_weight, difficulty_weight)
+        speculation = None
+        budget = Budget.from_env()
+        plan = meter = None
+        st.session_state.budget_run = None
         
         try:
             # Use current questions (either sample or uploaded)
             questions_to_analyze = st.session_state.current_questions
             
-            # Step 1: Analyze questions
-            status_text.markdown("### Step 1: Reading and understanding each question...")
-            time.sleep(1)
-            progress_bar.progress(25)
-            
-            reader_analyses = []
-            for question in questions_to_analyze:
-                analysis = reader.analyze_question(question)
-                reader_analyses.append(analysis)
-            
-            st.session_state.reader_analyses = reader_analyses
-            
-            # Step 2: Score for exam importance
-            status_text.markdown("### Step 2: Checking how likely each question is to appear in JEE...")
-            time.sleep(1)
-            progress_bar.progress(50)
-            
-            relevance_scores = []
-            for analysis in reader_analyses:
-                score = relevance.score_question(analysis)
-                relevance_scores.append(score)
-            
-            st.session_state.relevance_scores = relevance_scores
-            
-            # Step 3: Score for difficulty
-            status_text.markdown("### Step 3: Measuring how challenging each question is...")
-            time.sleep(1)
-            progress_bar.progress(75)
-            
-            depth_scores = []
-            for analysis in reader_analyses:
-                score = depth.score_question(analysis)
-                depth_scores.append(score)
+            if budget is not None:
+                # Choose the cheapest degradations that fit the budget
+                plan = create_budget_planner().plan(
+                    questions_to_analyze, budget, importance_weight, difficulty_weight,
+                    trust_metadata=reader.trust_metadata, rules_reader=reader.backend == "rules",
+                    terse=relevance.terse,
+                    double_check_calls=int(os.getenv('JEE_ADAPTIVE_BUDGET', '20')) if adaptive else 0
+                )
+                meter = plan.meter()
+                reader, relevance, depth, judge = plan.agents(reader, relevance, depth, judge)
+                adaptive = adaptive and NO_DOUBLE_CHECK not in plan.strategies
+                st.session_state.budget_run = (plan, meter)
             
-            st.session_state.depth_scores = depth_scores
+            # Steps 1-3: Read each question and score it for exam importance and
+            # difficulty. Questions are tasks on the shared queue, so other
+            # users' analyses are interleaved fairly with this one. The cascade
+            # skips Depth for questions that cannot reach the TOP 3. A bank
+            # another session has already analyzed with the same settings is
+            # not scored again; budgeted runs always score their own.
+            store = create_result_store()
+            bank = None
+            if plan is None and os.getenv('JEE_SHARE_RESULTS', '1') != '0':
+                bank = results_key(questions_to_analyze, model, adaptive)
+            handle = store.find(bank) if bank is not None else None
+            if handle is not None:
+                status_text.markdown("### Steps 1-3: These questions were analyzed recently, reusing the scores...")
+                progress_bar.progress(85)
+                st.session_state.result_handle = handle
+                # Its cascade may have skipped questions that reach the TOP 3 at these weights
+                self.score_skipped_depths(importance_weight, difficulty_weight)
+            else:
+                process = None
+                if os.getenv('JEE_CASCADE', '1') != '0':
+                    process = CascadePipeline(reader, relevance, depth, importance_weight,
+                                              difficulty_weight, deadlines=STAGE_DEADLINES)
+                if plan is not None:
+                    process = BudgetedPipeline(
+                        process or agent_pipeline(reader, relevance, depth, STAGE_DEADLINES),
+                        plan, meter, reader.trust_metadata
+                    )
+                job_id = job_queue.submit(st.session_state.tenant_id, questions_to_analyze, process=process)
+                st.session_state.active_job = (job_queue, job_id)
+                
+                # Start the Judge once the last scores are unlikely to change its
+                # candidates; adaptive sampling changes scores afterwards, and a
+                # wasted speculative call would eat into the budget
+                if not adaptive and plan is None and os.getenv('JEE_SPECULATIVE_JUDGE', '1') != '0':
+                    speculation = SpeculativeJudge(judge, [q['id'] for q in questions_to_analyze],
+                                                   importance_weight, difficulty_weight, deadlines=STAGE_DEADLINES)
+                
+                while True:
+                    job = job_queue.status(job_id)
+                    progress_bar.progress(int(85 * job['completed'] / max(job['total'], 1)))
+                    status_text.markdown(
+                        f"### Steps 1-3: Reading each question and checking how important and challenging it is... "
+                        f"({job['completed']}/{job['total']})"
+                    )
+                    batch = job_queue.completed_results(job_id, leaderboard.cursor)
+                    leaderboard.update(batch)
+                    if speculation is not None:
+                        speculation.update(batch)
+                    if job['status'] in FINISHED:
+                        break
+                    time.sleep(0.5)
+                
+                st.session_state.active_job = None
+                if job['status'] != DONE:
+                    raise RuntimeError(job['error'] or f"analysis {job['status']}")
+                
+                scored = job_queue.result(job_id)
+                reader_analyses = scored["reader_analyses"]
+                relevance_scores = scored["relevance_scores"]
+                depth_scores = scored["depth_scores"]
+                
+                if adaptive:
+                    status_text.markdown("### Double-checking the questions closest to the TOP 3...")
+                    progress_bar.progress(87)
+                    sampler = AdaptiveSampler(
+                        *create_sampling_agents(api_key, model),
+                        budget=int(os.getenv('JEE_ADAPTIVE_BUDGET', '20'))
+                    )
+                    with metered(meter, DOUBLE_CHECK):
+                        relevance_scores, depth_scores, _ = sampler.refine(
+                            reader_analyses, relevance_scores, depth_scores,
+                            importance_weight, difficulty_weight
+                        )
+                
+                st.session_state.result_handle = store.put({
+                    "reader_analyses": reader_analyses,
+                    "relevance_scores": relevance_scores,
+                    "depth_scores": depth_scores,
+                }, bank=bank)
+            results = self.results()
+            reader_analyses = results["reader_analyses"]
+            relevance_scores = results["relevance_scores"]
+            depth_scores = results["depth_scores"]
             
             # Step 4: Make final decision
             status_text.markdown("### Step 4: Choosing the TOP 3 most important questions...")
             time.sleep(1)
             progress_bar.progress(90)
             
-            try:
-                final_ranking = judge.rank_questions(
-                    reader_analyses, relevance_scores, depth_scores,
-                    importance_weight, difficulty_weight
-                )
-            except:
-                # Simple fallback if AI fails
-                final_ranking = self.create_simple_ranking(
-                    reader_analyses, relevance_scores, depth_scores,
-                    importance_weight, difficulty_weight
-                )
+            # The Judge's decision for identical scores and weights is reused too
+            final_ranking = store.ranking(st.session_state.result_handle, ("judge", importance_weight))
+            if final_ranking is None:
+                try:
+                    speculative = None
+                    if speculation is not None:
+                        speculative = speculation.resolve(reader_analyses, relevance_scores, depth_scores)
+                    if speculative is not None:
+                        final_ranking = speculative.result()
+                    elif plan is not None and not plan.judge:
+                        # The budget has no room for the Judge
+                        final_ranking = self.create_simple_ranking(
+                            reader_analyses, relevance_scores, depth_scores,
+                            importance_weight, difficulty_weight
+                        )
+                    else:
+                        leaderboard.clear()
+                        with metered(meter):
+                            final_ranking = self.stream_judge_ranking(
+                                judge, reader_analyses, relevance_scores, depth_scores,
+                                importance_weight, difficulty_weight
+                            )
+                except:
+                    # Simple fallback if AI fails
+                    final_ranking = self.create_simple_ranking(
+                        reader_analyses, relevance_scores, depth_scores,
+                        importance_weight, difficulty_weight
+                    )
             
-            st.session_state.final_ranking = final_ranking
+            self.set_judge_ranking(final_ranking, importance_weight)
+            if meter is not None:
+                create_budget_planner().calibrate(meter)
             
             progress_bar.progress(100)
             status_text.markdown("### ✅ Done! Your TOP 3 questions are ready!")
@@ -697,36 +1017,268 @@ class SimpleJEEAnalyzer:
             time.sleep(2)
             progress_bar.empty()
             status_text.empty()
+            leaderboard.clear()
             
         except Exception as e:
             st.error(f"❌ Something went wrong: {str(e)}")
             progress_bar.empty()
             status_text.empty()
+            leaderboard.clear()
+        finally:
+            if speculation is not None:
+                speculation.close()
     
-    def create_simple_ranking(self, reader_analyses, relevance_scores, depth_scores, importance_weight, difficulty_weight):
-        """Create a simple ranking when complex AI fails."""
-        scores = []
+    def stream_judge_ranking(self, judge, reader_analyses, relevance_scores, depth_scores,
+                             importance_weight, difficulty_weight):
+        """
+        Call the Judge Agent, drawing its ranking while the answer streams in.
         
-        for i, reader_analysis in enumerate(reader_analyses):
-            question_id = reader_analysis["original_question"]["id"]
-            
-            relevance_score = next((r for r in relevance_scores if r["question_id"] == question_id), None)
-            depth_score = next((d for d in depth_scores if d["question_id"] == question_id), None)
-            
-            if relevance_score and depth_score:
-                importance_val = relevance_score["overall_relevance_score"]
-                difficulty_val = depth_score["overall_depth_score"]
-                final_score = (importance_val * importance_weight) + (difficulty_val * difficulty_weight)
-                
-                scores.append({
-                    "question_id": question_id,
-                    "question_text": reader_analysis["original_question"]["question_text"],
-                    "final_score": final_score,
-                    "importance_score": importance_val,
-                    "difficulty_score": difficulty_val
-                })
+        Returns:
+            The complete ranking, as from judge.rank_questions
+        """
+        view = LiveJudgeRanking()
+        ranking = None
+        try:
+            with deadline(STAGE_DEADLINES["judge"]):
+                for ranking in judge.stream_ranking(reader_analyses, relevance_scores, depth_scores,
+                                                    importance_weight, difficulty_weight):
+                    view.update(ranking)
+        finally:
+            view.clear()
+        return ranking
+    
+    @staticmethod
+    def results() -> Dict[str, List[Dict[str, Any]]]:
+        """
+        This session's scored results from the shared store (read-only);
+        empty lists when there are none.
+        """
+        results = create_result_store().get(st.session_state.result_handle)
+        if results is None:
+            return {"reader_analyses": [], "relevance_scores": [], "depth_scores": []}
+        return results
+    
+    @staticmethod
+    def update_results(**changes):
+        """Store a copy of this session's results with some lists replaced, keeping its rankings."""
+        store = create_result_store()
+        handle = st.session_state.result_handle
+        results = store.get(handle)
+        if results is None:
+            return
+        results.update(changes)
+        st.session_state.result_handle = store.put(results, parent=handle)
+    
+    @staticmethod
+    def final_ranking() -> Dict[str, Any]:
+        """The ranking shown for the current weight."""
+        weight = st.session_state.ranking_weight
+        kind = "judge" if weight == st.session_state.judge_weight else "local"
+        return create_result_store().ranking(st.session_state.result_handle, (kind, weight)) or {}
+    
+    def check_results(self):
+        """Go back to before the analysis if the store has evicted this session's results."""
+        if st.session_state.analysis_complete and \
+                create_result_store().get(st.session_state.result_handle) is None:
+            st.session_state.analysis_complete = False
+            st.warning("Your results were cleared from the server after a while unused. Please run the analysis again.")
+    
+    def set_judge_ranking(self, ranking, importance_weight):
+        """
+        Store a Judge ranking as the displayed ranking, and under its TOP 3
+        set so its reasoning is reused whenever the slider returns to a set
+        the Judge has already explained.
+        """
+        store = create_result_store()
+        store.put_ranking(st.session_state.result_handle, ("judge", importance_weight), ranking)
+        store.put_ranking(st.session_state.result_handle, self.top_question_ids(ranking), ranking)
+        st.session_state.judge_weight = importance_weight
+        st.session_state.ranking_weight = importance_weight
+    
+    @staticmethod
+    def budget_meter():
+        """Meter of the last budgeted run, which follow-up AI calls are charged to, or None."""
+        budget_run = st.session_state.budget_run
+        return budget_run[1] if budget_run else None
+    
+    @staticmethod
+    def top_question_ids(ranking):
+        """Set of question ids in a ranking's TOP 3."""
+        return frozenset(q.get('question_id') for q in ranking.get('top_3_questions', []))
+    
+    @staticmethod
+    def overall_scores(results):
+        """(question id, relevance, depth) in reader order: all the schedule depends on."""
+        relevance_by_id = {r["question_id"]: r.get("overall_relevance_score") for r in results["relevance_scores"]}
+        depth_by_id = {d["question_id"]: d.get("overall_depth_score") for d in results["depth_scores"]}
+        return [(q, relevance_by_id.get(q), depth_by_id.get(q)) for q in question_texts(results["reader_analyses"])]
+    
+    def top_k_schedule(self):
+        """TOP 3 for every slider position, built once per set of scores."""
+        return create_result_store().derived(
+            st.session_state.result_handle, "topk_schedule",
+            lambda results: build_schedule(
+                list(question_texts(results["reader_analyses"])),
+                results["relevance_scores"],
+                results["depth_scores"]
+            ),
+            depends=self.overall_scores
+        )
+    
+    def rerank_locally(self, importance_weight, difficulty_weight):
+        """
+        Re-rank from the stored sub-scores. The TOP 3 is looked up in the
+        precomputed schedule, so no agent is called and the bank is not
+        re-sorted; Judge reasoning is reused when the Judge has already
+        ranked the same TOP 3 set.
+        """
+        if importance_weight != st.session_state.judge_weight:
+            self.score_skipped_depths(importance_weight, difficulty_weight)
+            results = self.results()
+            ranking = self.create_simple_ranking(
+                results["reader_analyses"],
+                results["relevance_scores"],
+                results["depth_scores"],
+                importance_weight, difficulty_weight,
+                top_ids=self.top_k_schedule().lookup(importance_weight)
+            )
+            store = create_result_store()
+            judge_ranking = store.ranking(st.session_state.result_handle, self.top_question_ids(ranking))
+            if judge_ranking:
+                judged = {q.get('question_id'): q for q in judge_ranking.get('top_3_questions', [])}
+                for question in ranking['top_3_questions']:
+                    reasoning = judged[question['question_id']].get('selection_reasoning')
+                    if reasoning:
+                        question['selection_reasoning'] = reasoning
+                ranking['overall_analysis'] = judge_ranking.get('overall_analysis', ranking['overall_analysis'])
+            store.put_ranking(st.session_state.result_handle, ("local", importance_weight), ranking)
         
-        scores.sort(key=lambda x: x["final_score"], reverse=True)
+        st.session_state.ranking_weight = importance_weight
+    
+    def score_skipped_depths(self, importance_weight, difficulty_weight):
+        """
+        Get real Depth scores for questions the cascade skipped that could
+        reach the TOP 3 at the new weights, so the local ranking stays exact.
+        """
+        results = self.results()
+        pending = unresolved_skips(
+            results["relevance_scores"], results["depth_scores"],
+            importance_weight, difficulty_weight
+        )
+        if not pending:
+            return
+        
+        _, _, depth_agent, _ = self.initialize_agents()
+        if depth_agent is None:
+            return
+        
+        analyses = {a["original_question"]["id"]: a for a in results["reader_analyses"]}
+        with st.spinner(f"Scoring challenge level for {len(pending)} more question(s)..."), \
+                metered(self.budget_meter()):
+            rescored = {
+                q: call_with_deadline(STAGE_DEADLINES["depth"], depth_agent.score_question, analyses[q])
+                for q in pending
+            }
+        self.update_results(depth_scores=[
+            rescored.get(d["question_id"], d) for d in results["depth_scores"]
+        ])
+    
+    def refresh_judge_reasoning(self, importance_weight, difficulty_weight):
+        """Ask the Judge Agent for fresh reasoning on the current weights."""
+        _, _, _, judge = self.initialize_agents()
+        if judge is None:
+            return
+        
+        results = self.results()
+        with st.spinner("Asking the AI to explain the new TOP 3..."), metered(self.budget_meter()):
+            try:
+                ranking = self.stream_judge_ranking(
+                    judge,
+                    results["reader_analyses"],
+                    results["relevance_scores"],
+                    results["depth_scores"],
+                    importance_weight, difficulty_weight
+                )
+            except Exception as e:
+                st.error(f"❌ Something went wrong: {str(e)}")
+                return
+        
+        self.set_judge_ranking(ranking, importance_weight)
+    
+    def display_reasoning_refresh(self, importance_weight, difficulty_weight):
+        """Offer a Judge call only when the Judge has not explained this TOP 3 set yet."""
+        top_ids = self.top_question_ids(self.final_ranking())
+        if create_result_store().ranking(st.session_state.result_handle, top_ids) is not None:
+            return
+        
+        st.info("Your TOP 3 was updated instantly from the saved scores. The explanations below are quick summaries.")
+        if st.button("✨ Get Fresh AI Reasoning", use_container_width=True):
+            self.refresh_judge_reasoning(importance_weight, difficulty_weight)
+            st.rerun()
+    
+    def explain_top_questions(self, retry: bool = False):
+        """
+        Generate justifications for TOP 3 questions scored in terse mode.
+        Each question is explained once; the result replaces its stored scores.
+        A result whose explanation failed is marked "explain_failed" and only
+        tried again when `retry` is set (the "Try again" button), not on
+        every rerun.
+        """
+        results = self.results()
+        top_ids = self.top_question_ids(self.final_ranking())
+        pending = [
+            q for q in top_ids
+            if any(r["question_id"] == q and r.get("terse") and (retry or not r.get("explain_failed"))
+                   for r in results["relevance_scores"] + results["depth_scores"])
+        ]
+        if not pending:
+            return
+        
+        _, relevance_agent, depth_agent, _ = self.initialize_agents()
+        if relevance_agent is None:
+            return
+        
+        def explain(agent, stage, result):
+            explained = call_with_deadline(STAGE_DEADLINES[stage], agent.explain,
+                                           analyses[result["question_id"]], result)
+            if explained.get("terse"):
+                return dict(explained, explain_failed=True)
+            explained.pop("explain_failed", None)
+            return explained
+        
+        analyses = {a["original_question"]["id"]: a for a in results["reader_analyses"]}
+        explained = {}
+        with st.spinner("Writing up why the TOP 3 scored the way they did..."), metered(self.budget_meter()):
+            for name, agent, stage in (("relevance_scores", relevance_agent, "relevance_explain"),
+                                       ("depth_scores", depth_agent, "depth_explain")):
+                explained[name] = [
+                    explain(agent, stage, r)
+                    if r["question_id"] in pending and r.get("terse") and (retry or not r.get("explain_failed"))
+                    else r
+                    for r in results[name]
+                ]
+        self.update_results(**explained)
+    
+    def create_simple_ranking(self, reader_analyses, relevance_scores, depth_scores, importance_weight, difficulty_weight,
+                              top_ids=None):
+        """
+        Create a simple ranking when complex AI fails. `top_ids` (from the
+        TOP 3 schedule) limits scoring to those questions, in that order.
+        """
+        texts = question_texts(reader_analyses)
+        composites = compute_composite_scores(
+            list(texts) if top_ids is None else list(top_ids), relevance_scores, depth_scores,
+            importance_weight, difficulty_weight
+        )
+        if top_ids is not None:
+            composites.sort(key=lambda c: top_ids.index(c.question_id))
+        scores = [{
+            "question_id": c.question_id,
+            "question_text": texts[c.question_id],
+            "final_score": c.composite_score,
+            "importance_score": c.relevance_score,
+            "difficulty_score": c.depth_score
+        } for c in composites]
         top_3 = scores[:3]
         
         return {
@@ -741,7 +1293,7 @@ class SimpleJEEAnalyzer:
                     "selection_reasoning": f"This question earned rank #{i+1} due to its high exam importance score of {q['importance_score']:.1f}/10 and optimal difficulty level of {q['difficulty_score']:.1f}/10. {'This represents a high-priority JEE topic that appears frequently in exams.' if q['importance_score'] > 7 else 'This covers important JEE concepts worth practicing.'} The difficulty level {'provides appropriate challenge for JEE preparation' if q['difficulty_score'] > 6 else 'makes it accessible for building foundational understanding'}. Combined score: {q['final_score']:.2f}/10."
                 } for i, q in enumerate(top_3)
             ],
-            "overall_analysis": f"AI has analyzed all {len(scores)} questions based on their importance for JEE exam success and appropriate difficulty level for effective learning.",
+            "overall_analysis": f"AI has analyzed all {len(texts)} questions based on their importance for JEE exam success and appropriate difficulty level for effective learning.",
             "methodology": f"Questions were evaluated using a weighted scoring system: {importance_weight*100:.0f}% exam importance (topic frequency, syllabus relevance) and {difficulty_weight*100:.0f}% difficulty level (conceptual depth, problem complexity)."
         }
     
@@ -788,29 +1340,15 @@ class SimpleJEEAnalyzer:
         </div>
         """, unsafe_allow_html=True)
         
-        ranking = st.session_state.final_ranking
+        self.explain_top_questions()
+        ranking = self.final_ranking()
+        results = self.results()
         top_questions = ranking.get('top_3_questions', [])
+        relevance_by_id = {r["question_id"]: r for r in results["relevance_scores"]}
+        depth_by_id = {d["question_id"]: d for d in results["depth_scores"]}
         
         for question in top_questions:
-            rank = question.get('rank', 0)
-            
-            # Choose emoji and color based on rank
-            if rank == 1:
-                emoji = "🥇"
-                rank_class = "rank-1"
-                rank_text = "1st Place"
-            elif rank == 2:
-                emoji = "🥈"
-                rank_class = "rank-2"
-                rank_text = "2nd Place"
-            elif rank == 3:
-                emoji = "🥉"
-                rank_class = "rank-3"
-                rank_text = "3rd Place"
-            else:
-                emoji = "🏅"
-                rank_class = ""
-                rank_text = f"{rank}th Place"
+            emoji, rank_class, rank_text = rank_badge(question.get('rank', 0))
             
             st.markdown(f"""
             <div class="rank-card {rank_class}">
@@ -842,8 +1380,29 @@ class SimpleJEEAnalyzer:
                 st.markdown(f"**📈 Exam Frequency:** {importance_score:.1f}/10")
                 st.markdown(f"**🧠 Challenge Level:** {difficulty_score:.1f}/10")
             
+            with st.expander("🔎 How each score was decided"):
+                for title, result, criteria, reason_key in (
+                    ("📈 Exam Importance", relevance_by_id.get(question.get('question_id'), {}),
+                     RELEVANCE_CRITERIA, "justification"),
+                    ("🧠 Challenge Level", depth_by_id.get(question.get('question_id'), {}),
+                     DEPTH_CRITERIA, "explanation"),
+                ):
+                    st.markdown(f"**{title}**")
+                    if result.get("explain_failed"):
+                        st.caption("The AI could not explain these scores this time.")
+                    for criterion in criteria:
+                        entry = result.get(criterion)
+                        if isinstance(entry, dict):
+                            label = criterion.replace('_', ' ').capitalize()
+                            st.markdown(f"- **{label}:** {entry.get('score', 0)}/10. {entry.get(reason_key, '')}")
+            
             st.markdown("---")
         
+        if any(r.get("explain_failed") for r in results["relevance_scores"] + results["depth_scores"]):
+            if st.button("🔁 Try Explaining the TOP 3 Again", use_container_width=True):
+                self.explain_top_questions(retry=True)
+                st.rerun()
+        
         # Show simple summary
         st.markdown("### 📊 AI Analysis Summary")
         
@@ -862,6 +1421,40 @@ class SimpleJEEAnalyzer:
             <p>{methodology}</p>
         </div>
         """, unsafe_allow_html=True)
+
+        
+        self.display_budget_report()
+    
+    def display_budget_report(self):
+        """Planned against actual AI usage of the last budgeted run."""
+        if not st.session_state.budget_run:
+            return
+        
+        plan, meter = st.session_state.budget_run
+        report = meter.report(plan)
+        with st.expander("💰 AI usage: planned vs actual"):
+            budget, actual = report['budget'], report['actual']
+            limits = [f"{budget['max_tokens']:,} tokens" if budget['max_tokens'] else None,
+                      f"${budget['max_cost']:.4f}" if budget['max_cost'] else None]
+            st.markdown(f"**Budget:** {' / '.join(limit for limit in limits if limit)}. "
+                        f"**Used:** {actual['input_tokens'] + actual['output_tokens']:,} tokens "
+                        f"(${actual['cost']:.4f}), "
+                        f"{'within budget' if report['within_budget'] else 'over budget'}.")
+            if report['strategies']:
+                steps = ', '.join(strategy.replace('_', ' ') for strategy in report['strategies'])
+                st.markdown(f"**To fit the budget:** {steps}. "
+                            f"The AI scored {report['scored_questions']} of {report['questions']} questions.")
+            if report['refused_calls']:
+                st.markdown(f"**Calls skipped to stay within budget:** {report['refused_calls']}")
+            
+            rows = ["| Stage | Planned calls | Actual calls | Planned tokens | Actual tokens |",
+                    "|---|---|---|---|---|"]
+            for stage, usage in list(report['stages'].items()) + [("total", report)]:
+                planned, actual = usage['planned'], usage['actual']
+                rows.append(f"| {stage.replace('_', ' ')} | {planned['calls']} | {actual['calls']} | "
+                            f"{planned['input_tokens'] + planned['output_tokens']:,} | "
+                            f"{actual['input_tokens'] + actual['output_tokens']:,} |")
+            st.markdown("\n".join(rows))
     
     def display_simple_chart(self):
         """Display a simple chart showing all question scores."""
@@ -880,45 +1473,41 @@ class SimpleJEEAnalyzer:
         </div>
         """, unsafe_allow_html=True)
         
-        # Prepare data for chart
-        chart_data = []
-        for analysis in st.session_state.reader_analyses:
-            question_id = analysis["original_question"]["id"]
-            question_text = analysis["original_question"]["question_text"]
-            topic = analysis["original_question"]["topic"]
-            
-            relevance_score = next((r for r in st.session_state.relevance_scores if r["question_id"] == question_id), None)
-            depth_score = next((d for d in st.session_state.depth_scores if d["question_id"] == question_id), None)
-            
-            if relevance_score and depth_score:
-                chart_data.append({
-                    "Question": f"Q{question_id}",
-                    "Exam Likelihood": relevance_score["overall_relevance_score"],
-                    "Challenge Level": depth_score["overall_depth_score"],
-                    "Topic": topic
-                })
+        # Figures are built once per set of plotted scores, and shared by
+        # every session and updated result (e.g. with explanations) showing them
+        def rows(results):
+            from charts import chart_rows
+            return chart_rows(results["reader_analyses"], results["relevance_scores"], results["depth_scores"])
         
-        df = pd.DataFrame(chart_data)
+        def build(results):
+            from charts import build_figures
+            return build_figures(
+                results["reader_analyses"],
+                results["relevance_scores"],
+                results["depth_scores"]
+            )
         
-        # Create simple bar chart with better colors
-        fig = px.bar(
-            df, 
-            x="Question", 
-            y=["Exam Likelihood", "Challenge Level"],
-            title="📊 Complete Analysis: All Questions Scored",
-            labels={"value": "AI Score (0-10)", "variable": "What We Measured"},
-            color_discrete_map={"Exam Likelihood": "#3498db", "Challenge Level": "#e74c3c"}
-        )
-        fig.update_layout(
-            height=450, 
-            showlegend=True,
-            title_font_size=16,
-            xaxis_title="Questions",
-            yaxis_title="AI Score (0-10)"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        for fig in create_result_store().derived(st.session_state.result_handle, "charts", build, depends=rows) or []:
+            st.plotly_chart(fig, use_container_width=True)
         st.markdown("💡 Higher bars mean higher scores")
     
+    def display_store_stats(self):
+        """Result store memory figures for operators, in the sidebar (JEE_SHOW_STORE_STATS=1)."""
+        if os.getenv('JEE_SHOW_STORE_STATS') != '1':
+            return
+        
+        stats = create_result_store().memory_stats()
+        with st.sidebar.expander("🗄️ Result store", expanded=True):
+            st.markdown(f"**Held:** {stats['stored_bytes'] / 1024:,.1f} KiB of {stats['max_bytes'] / 1024 ** 2:,.0f} MiB "
+                        f"in {stats['entries']} results ({stats['records']} records, "
+                        f"{stats['derived']} charts and schedules of {stats['derived_bytes'] / 1024:,.1f} KiB)")
+            st.markdown(f"**Without sharing:** {stats['undeduplicated_bytes'] / 1024:,.1f} KiB "
+                        f"(saved {stats['saved_bytes'] / 1024:,.1f} KiB)")
+            st.markdown(f"**Reused:** {stats['shared']} analyses of a stored bank; "
+                        f"{stats['deduplicated']} of {stats['puts']} stored results were already held")
+            st.markdown(f"**Lookups:** {stats['hits']} hits, {stats['misses']} misses")
+            st.markdown(f"**Evicted:** {stats['evicted_lru']} for space, {stats['evicted_ttl']} unused")
+    
     # Replace the beginning of the run method (around line 970) with this:
     def run(self):
         """Main application flow."""
@@ -1014,14 +1603,23 @@ class SimpleJEEAnalyzer:
             </div>
             """, unsafe_allow_html=True)
             
+            adaptive = st.checkbox(
+                "Double-check close calls",
+                help="Re-score questions that are near the TOP 3 cutoff a few more times and average the results. Uses a few extra AI calls."
+            )
+            
+            self.check_results()
             if st.button("Start AI Analysis", type="primary", use_container_width=True):
-                self.run_analysis(importance_weight, difficulty_weight)
+                self.run_analysis(importance_weight, difficulty_weight, adaptive)
+            elif st.session_state.analysis_complete and st.session_state.ranking_weight != importance_weight:
+                self.rerank_locally(importance_weight, difficulty_weight)
             
             # Show questions
             self.display_questions()
             
             # Show results
             if st.session_state.analysis_complete:
+                self.display_reasoning_refresh(importance_weight, difficulty_weight)
                 self.display_simple_results()
                 self.display_simple_chart()
                 
@@ -1034,10 +1632,11 @@ class SimpleJEEAnalyzer:
                 with col1:
                     st.markdown("#### 💾 Save Your Results")
                     if st.button("📥 Download My TOP 3", use_container_width=True):
+                        ranking = self.final_ranking()
                         results = {
-                            "top_3_questions": st.session_state.final_ranking.get('top_3_questions', []),
-                            "analysis_summary": st.session_state.final_ranking.get('overall_analysis', ''),
-                            "methodology": st.session_state.final_ranking.get('methodology', ''),
+                            "top_3_questions": ranking.get('top_3_questions', []),
+                            "analysis_summary": ranking.get('overall_analysis', ''),
+                            "methodology": ranking.get('methodology', ''),
                             "question_source": st.session_state.question_source,
                             "settings_used": {
                                 "exam_focus": importance_weight,
@@ -1051,21 +1650,41 @@ class SimpleJEEAnalyzer:
                             file_name=f"my_jee_top3_questions.json",
                             mime="application/json"
                         )
+                    
+                    if st.button("📦 Download Full Results (Parquet)", use_container_width=True):
+                        results = self.results()
+                        full_results = export_results_bytes(
+                            results["reader_analyses"],
+                            results["relevance_scores"],
+                            results["depth_scores"],
+                            importance_weight, difficulty_weight,
+                            question_source=st.session_state.question_source
+                        )
+                        
+                        st.download_button(
+                            label="💾 Download Parquet",
+                            data=full_results,
+                            file_name="jee_full_results.parquet",
+                            mime="application/octet-stream"
+                        )
                 
                 with col2:
                     st.markdown("#### 🔄 Try Different Settings")
                     if st.button("🔁 Analyze Again", use_container_width=True):
                         st.session_state.analysis_complete = False
-                        st.session_state.reader_analyses = []
-                        st.session_state.relevance_scores = []
-                        st.session_state.depth_scores = []
-                        st.session_state.final_ranking = {}
+                        st.session_state.result_handle = None
+                        st.session_state.judge_weight = None
+                        st.session_state.ranking_weight = None
                         st.rerun()
+        
+        self.display_store_stats()
 
 def main():
     """Main entry point."""
+    start = time.perf_counter()
     app = SimpleJEEAnalyzer()
     app.run()
+    logger.info(f"Script rerun took {(time.perf_counter() - start) * 1000:.1f} ms")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file